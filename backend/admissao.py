@@ -0,0 +1,339 @@
+"""Controle de admissão: limita o que um cliente pode pedir antes de chegar aos handlers.
+
+Três camadas, nesta ordem:
+
+1. Taxa por cliente (token bucket): cada usuário autenticado ganha
+   ADMISSAO_TAXA requisições por segundo, com rajadas de até ADMISSAO_RAJADA.
+   Só conta como usuário um token com assinatura e validade conferidas; sem
+   isso (e sempre no login e nos cadastros) a chave é o IP, para um token
+   inventado por requisição não escapar do limite. Atrás de proxy, o IP é o
+   do `X-Forwarded-For` quando a conexão vem de ADMISSAO_PROXIES. Os
+   downloads de mídia (endereçadas pelo conteúdo, pedidas por <img>/<video>
+   sem token) não passam pela taxa. Excedeu: 429 com `Retry-After`.
+2. Concorrência por classe de rota: as listagens e a exportação ("caras")
+   têm ADMISSAO_CARAS vagas por processo; os downloads de mídia e o stream
+   de eventos ("longas", que ficam abertas enquanto o cliente lê),
+   ADMISSAO_LONGAS; o resto ("baratas"), ADMISSAO_BARATAS. Sem vaga, a
+   requisição espera na fila da classe.
+3. Descarte de carga: quem espera mais que ADMISSAO_ESPERA_MS pela vaga
+   recebe 503 com `Retry-After`, em vez de aumentar a latência de todos.
+
+Backends do token bucket (ADMISSAO_BACKEND):
+    memoria  baldes no próprio processo (padrão; com N workers o limite efetivo é N vezes maior)
+    redis    baldes compartilhados entre os workers (REDIS_URL); se o Redis
+             falhar a requisição é admitida
+
+As vagas de concorrência são sempre por processo: elas protegem o event loop
+e o pool de conexões do próprio worker.
+"""
+import asyncio
+import ipaddress
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+
+from auth import sujeito_token
+from cache import RedisBackend, REDIS_URL
+from metricas import Contador, Medidor, Histograma
+
+logger = logging.getLogger(__name__)
+
+ADMISSAO_ATIVA = os.getenv("ADMISSAO_ATIVA", "1") == "1"
+ADMISSAO_BACKEND = os.getenv("ADMISSAO_BACKEND", "memoria")
+ADMISSAO_TAXA = float(os.getenv("ADMISSAO_TAXA", "20"))
+ADMISSAO_RAJADA = float(os.getenv("ADMISSAO_RAJADA", "40"))
+ADMISSAO_CARAS = int(os.getenv("ADMISSAO_CARAS", "8"))
+ADMISSAO_BARATAS = int(os.getenv("ADMISSAO_BARATAS", "64"))
+ADMISSAO_LONGAS = int(os.getenv("ADMISSAO_LONGAS", "512"))
+ADMISSAO_ESPERA_MS = float(os.getenv("ADMISSAO_ESPERA_MS", "250"))
+# Proxies reversos confiáveis (IPs ou redes, separados por vírgula): só deles o
+# X-Forwarded-For é aceito
+ADMISSAO_PROXIES = [
+    ipaddress.ip_network(rede.strip(), strict=False)
+    for rede in os.getenv("ADMISSAO_PROXIES", "").split(",") if rede.strip()
+]
+# Clientes distintos lembrados por processo (backend memoria)
+ADMISSAO_CLIENTES_MAX = int(os.getenv("ADMISSAO_CLIENTES_MAX", "10000"))
+
+CARA = "cara"
+BARATA = "barata"
+LONGA = "longa"
+
+# Listagens de até 1000 documentos, sincronização e exportação (só GET)
+ROTAS_CARAS = [re.compile(padrao) for padrao in (
+    r"^/api/personal/[^/]+/(alunos|treinos|atribuicoes|exportar)$",
+    r"^/api/alunos/[^/]+/(atribuicoes|execucoes|agenda)$",
+    r"^/api/atribuicoes/[^/]+/execucoes$",
+    r"^/api/usuarios/[^/]+/medidas$",
+    r"^/api/sync$",
+)]
+# Respostas que seguram a vaga pelo tempo da transferência (só GET): não
+# podem ocupar as vagas das baratas
+ROTAS_LONGAS = [re.compile(padrao) for padrao in (
+    r"^/api/midias/[^/]+$",
+    r"^/api/eventos$",
+)]
+# Conteúdo imutável e público: só as vagas das longas, sem taxa por cliente
+ROTAS_SEM_TAXA = [re.compile(r"^/api/midias/[^/]+$")]
+# Sem token (ou com um token qualquer): o balde é sempre o do IP
+ROTAS_PUBLICAS = {"/api/auth/login", "/api/auth/cadastro/personal", "/api/auth/cadastro/aluno"}
+# Fora do controle: sondas
+ROTAS_LIVRES = {"/api/health", "/api/metrics"}
+
+rejeicoes = Contador(
+    "strongify_admissao_rejeicoes_total", "Requisições rejeitadas pelo controle de admissão", ("motivo", "classe")
+)
+espera_segundos = Histograma(
+    "strongify_admissao_espera_segundos", "Tempo na fila por uma vaga de concorrência", ("classe",)
+)
+em_uso_caras = Medidor("strongify_admissao_vagas_caras_em_uso", "Vagas de rotas caras em uso")
+em_uso_baratas = Medidor("strongify_admissao_vagas_baratas_em_uso", "Vagas de rotas baratas em uso")
+em_uso_longas = Medidor("strongify_admissao_vagas_longas_em_uso", "Vagas de mídias e eventos em uso")
+
+METRICAS = [rejeicoes, espera_segundos, em_uso_caras, em_uso_baratas, em_uso_longas]
+
+
+def classificar(metodo: str, caminho: str) -> str:
+    if metodo == "GET" and any(padrao.match(caminho) for padrao in ROTAS_CARAS):
+        return CARA
+    if metodo == "GET" and any(padrao.match(caminho) for padrao in ROTAS_LONGAS):
+        return LONGA
+    return BARATA
+
+
+def _confiavel(ip: str, proxies) -> bool:
+    try:
+        endereco = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(endereco in rede for rede in proxies)
+
+
+def ip_cliente(scope, proxies=None) -> str:
+    """IP de quem fez a requisição: o da conexão ou, vindo de um proxy
+    confiável, o último endereço do X-Forwarded-For que não é de proxy."""
+    proxies = ADMISSAO_PROXIES if proxies is None else proxies
+    cliente = scope.get("client")
+    ip = cliente[0] if cliente else "desconhecido"
+    if not proxies or not _confiavel(ip, proxies):
+        return ip
+    encaminhado = [
+        valor.decode("latin-1") for nome, valor in scope.get("headers", []) if nome == b"x-forwarded-for"
+    ]
+    # Da direita para a esquerda: cada proxy acrescenta quem se conectou a ele
+    for endereco in reversed([e.strip() for e in ",".join(encaminhado).split(",") if e.strip()]):
+        if not _confiavel(endereco, proxies):
+            return endereco
+        ip = endereco
+    return ip
+
+
+def identificar(scope) -> str:
+    """Chave do cliente: o usuário de um token válido ou, sem ele, o IP."""
+    if scope["path"] not in ROTAS_PUBLICAS:
+        for nome, valor in scope.get("headers", []):
+            if nome == b"authorization" and valor.startswith(b"Bearer "):
+                usuario = sujeito_token(valor[7:].decode("latin-1"))
+                if usuario:
+                    return "u:" + usuario
+                break
+    return "ip:" + ip_cliente(scope)
+
+
+def limitado_por_taxa(metodo: str, caminho: str) -> bool:
+    return not (metodo == "GET" and any(padrao.match(caminho) for padrao in ROTAS_SEM_TAXA))
+
+
+# ==================== TOKEN BUCKET ====================
+
+class BaldesMemoria:
+    """Token buckets no processo, com descarte LRU dos clientes inativos."""
+
+    def __init__(self, taxa: float = ADMISSAO_TAXA, rajada: float = ADMISSAO_RAJADA, maximo: int = ADMISSAO_CLIENTES_MAX):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.maximo = maximo
+        self._baldes = OrderedDict()  # chave -> (fichas, instante)
+
+    async def consumir(self, chave: str, agora: float = None) -> float:
+        """0 se a requisição pode passar; senão, segundos até haver uma ficha."""
+        agora = time.monotonic() if agora is None else agora
+        fichas, instante = self._baldes.pop(chave, (self.rajada, agora))
+        fichas = min(self.rajada, fichas + (agora - instante) * self.taxa)
+
+        espera = 0.0
+        if fichas >= 1:
+            fichas -= 1
+        else:
+            espera = (1 - fichas) / self.taxa
+
+        self._baldes[chave] = (fichas, agora)
+        while len(self._baldes) > self.maximo:
+            self._baldes.popitem(last=False)
+        return espera
+
+
+# Mesmo algoritmo em Lua, atômico no Redis; o relógio é o do Redis (comum a todos os workers)
+SCRIPT_BALDE = """
+local agora = redis.call('TIME')
+agora = tonumber(agora[1]) + tonumber(agora[2]) / 1000000
+local taxa, rajada = tonumber(ARGV[1]), tonumber(ARGV[2])
+local balde = redis.call('HMGET', KEYS[1], 'fichas', 'instante')
+local fichas = tonumber(balde[1]) or rajada
+local instante = tonumber(balde[2]) or agora
+fichas = math.min(rajada, fichas + math.max(0, agora - instante) * taxa)
+local espera = 0
+if fichas >= 1 then
+  fichas = fichas - 1
+else
+  espera = (1 - fichas) / taxa
+end
+redis.call('HSET', KEYS[1], 'fichas', tostring(fichas), 'instante', tostring(agora))
+redis.call('EXPIRE', KEYS[1], math.ceil(rajada / taxa) + 1)
+return tostring(espera)
+"""
+
+
+class BaldesRedis:
+    """Token buckets compartilhados entre os workers."""
+
+    def __init__(self, url: str = REDIS_URL, taxa: float = ADMISSAO_TAXA, rajada: float = ADMISSAO_RAJADA):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.redis = RedisBackend(url)
+
+    async def consumir(self, chave: str, agora: float = None) -> float:
+        resposta = await self.redis.comando(
+            "EVAL", SCRIPT_BALDE, 1, f"strongify:admissao:{chave}", self.taxa, self.rajada
+        )
+        # Sem Redis não há como saber: admite (como o cache, nunca derruba a requisição)
+        return float(resposta) if resposta is not None else 0.0
+
+
+def criar_baldes(nome: str = ADMISSAO_BACKEND):
+    if nome == "redis":
+        return BaldesRedis()
+    return BaldesMemoria()
+
+
+# ==================== CONCORRÊNCIA ====================
+
+class Vagas:
+    """Semáforo com fila FIFO e espera máxima; a vaga liberada passa direto ao primeiro da fila."""
+
+    def __init__(self, limite: int, medidor: Medidor):
+        self.limite = limite
+        self.em_uso = 0
+        self.medidor = medidor
+        self._fila = deque()
+
+    async def entrar(self, espera_max: float) -> bool:
+        if self.em_uso < self.limite and not self._fila:
+            self._ocupar()
+            return True
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._fila.append(futuro)
+        try:
+            await asyncio.wait_for(asyncio.shield(futuro), espera_max)
+            return True
+        except asyncio.TimeoutError:
+            # A vaga pode ter chegado junto com o fim do prazo
+            if futuro.done() and not futuro.cancelled():
+                return True
+            self._desistir(futuro)
+            return False
+        except BaseException:
+            # Cliente desconectou na fila: devolve a vaga se ela já tinha sido passada
+            if futuro.done() and not futuro.cancelled():
+                self.sair()
+            else:
+                self._desistir(futuro)
+            raise
+
+    def _desistir(self, futuro):
+        futuro.cancel()
+        self._fila.remove(futuro)
+
+    def _ocupar(self):
+        self.em_uso += 1
+        self.medidor.inc()
+
+    def sair(self):
+        while self._fila:
+            futuro = self._fila.popleft()
+            if not futuro.done():
+                futuro.set_result(True)  # a vaga continua ocupada, agora por outro
+                return
+        self.em_uso -= 1
+        self.medidor.dec()
+
+
+# ==================== MIDDLEWARE ====================
+
+async def _rejeitar(send, status: int, detalhe: str, retry_after: float):
+    corpo = json.dumps({"detail": detalhe}, ensure_ascii=False).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corpo)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": corpo})
+
+
+class AdmissaoMiddleware:
+    """Middleware ASGI com o controle de admissão descrito no módulo."""
+
+    def __init__(self, app, baldes=None, caras: int = ADMISSAO_CARAS, baratas: int = ADMISSAO_BARATAS,
+                 longas: int = ADMISSAO_LONGAS, espera_ms: float = ADMISSAO_ESPERA_MS, ativa: bool = ADMISSAO_ATIVA):
+        self.app = app
+        self.ativa = ativa
+        self.baldes = baldes or criar_baldes()
+        self.vagas = {
+            CARA: Vagas(caras, em_uso_caras),
+            BARATA: Vagas(baratas, em_uso_baratas),
+            LONGA: Vagas(longas, em_uso_longas),
+        }
+        self.espera = espera_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if (
+            not self.ativa
+            or scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in ROTAS_LIVRES
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        classe = classificar(scope["method"], scope["path"])
+
+        espera = 0
+        if limitado_por_taxa(scope["method"], scope["path"]):
+            espera = await self.baldes.consumir(identificar(scope))
+        if espera > 0:
+            rejeicoes.inc("taxa", classe)
+            await _rejeitar(send, 429, "Muitas requisições; tente novamente em instantes", espera)
+            return
+
+        vagas = self.vagas[classe]
+        inicio = time.perf_counter()
+        if not await vagas.entrar(self.espera):
+            espera_segundos.observar(time.perf_counter() - inicio, classe)
+            rejeicoes.inc("sobrecarga", classe)
+            await _rejeitar(send, 503, "Servidor sobrecarregado; tente novamente em instantes", 1)
+            return
+        espera_segundos.observar(time.perf_counter() - inicio, classe)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            vagas.sair()
@@ -0,0 +1,184 @@
+from fastapi import HTTPException, Header
+from datetime import datetime, timedelta, timezone
+import os
+import logging
+import secrets
+import uuid
+
+import jwt
+
+from cache import LRUTTLCache
+from database import usuarios_collection, tokens_revogados_collection
+from eventos import barramento, publicar
+
+logger = logging.getLogger(__name__)
+
+# 'jwt' gera tokens assinados e com expiração (funciona com vários workers);
+# 'memoria' mantém o comportamento antigo de tokens opacos no processo.
+TOKEN_MODE = os.getenv("TOKEN_MODE", "jwt")
+
+JWT_SECRET = os.getenv("JWT_SECRET")
+if not JWT_SECRET:
+    JWT_SECRET = secrets.token_urlsafe(32)
+    if TOKEN_MODE == "jwt":
+        logger.warning("JWT_SECRET não definido: usando segredo aleatório, tokens não valem entre workers")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_EXPIRACAO_MINUTOS = int(os.getenv("JWT_EXPIRACAO_MINUTOS", str(60 * 24)))
+
+# Apenas os campos que os handlers precisam para autorizar a requisição.
+# Nada de avatar ou historicoMedidas aqui.
+USUARIO_SLIM_PROJECAO = {
+    "_id": 0,
+    "id": 1,
+    "tipo": 1,
+    "nome": 1,
+    "email": 1,
+    "codigoPersonal": 1,
+}
+
+# USER_CACHE_MAX=0 ou USER_CACHE_TTL=0 desativam o cache. O cache é por
+# processo: uma mudança no usuário chega aos outros workers em até USER_CACHE_TTL
+user_cache = LRUTTLCache(
+    maxsize=int(os.getenv("USER_CACHE_MAX", "4096")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+)
+
+# Tokens opacos (TOKEN_MODE=memoria)
+active_tokens = {}
+
+# jti -> expiração dos tokens JWT revogados vistos por este processo. A fonte
+# é a coleção `tokens_revogados` (TTL na expiração), comum a todos os workers;
+# o logout também avisa os outros workers pelo barramento de eventos
+revoked_tokens = {}
+
+# jtis já conferidos na coleção e não revogados: a requisição comum não vai ao
+# banco. Sem o barramento entre workers (EVENTOS_BACKEND=memoria com vários
+# workers), um logout feito em outro worker vale aqui em até REVOGACAO_CACHE_TTL
+tokens_verificados = LRUTTLCache(
+    maxsize=int(os.getenv("REVOGACAO_CACHE_MAX", "100000")),
+    ttl=float(os.getenv("REVOGACAO_CACHE_TTL", "30")),
+)
+
+EVENTO_REVOGACAO = "token.revogado"
+
+
+def _marcar_revogado(jti: str, exp: float):
+    agora = datetime.now(timezone.utc).timestamp()
+    # Limpa revogações que já expiraram naturalmente
+    for antigo, expiracao in list(revoked_tokens.items()):
+        if expiracao < agora:
+            revoked_tokens.pop(antigo, None)
+    revoked_tokens[jti] = exp
+    tokens_verificados.delete(jti)
+
+
+barramento.ouvir(EVENTO_REVOGACAO, lambda dados: _marcar_revogado(dados["jti"], dados["exp"]))
+
+
+def generate_token(usuario: dict) -> str:
+    if TOKEN_MODE != "jwt":
+        token = secrets.token_urlsafe(32)
+        active_tokens[token] = usuario['id']
+        return token
+
+    agora = datetime.now(timezone.utc)
+    claims = {
+        "sub": usuario['id'],
+        "tipo": usuario['tipo'],
+        "jti": uuid.uuid4().hex,
+        "iat": agora,
+        "exp": agora + timedelta(minutes=JWT_EXPIRACAO_MINUTOS),
+    }
+    return jwt.encode(claims, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+def decode_token(token: str) -> dict:
+    if TOKEN_MODE != "jwt":
+        user_id = active_tokens.get(token)
+        if not user_id:
+            raise HTTPException(status_code=401, detail="Token inválido")
+        return {"sub": user_id}
+
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expirado")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    return claims
+
+
+async def token_revogado(claims: dict) -> bool:
+    """Se o token foi revogado por logout em qualquer worker."""
+    jti = claims.get("jti")
+    if not jti:
+        return False
+    if jti in revoked_tokens:
+        return True
+    if tokens_verificados.get(jti):
+        return False
+    revogado = await tokens_revogados_collection.find_one({"_id": jti}, {"_id": 1})
+    if revogado:
+        _marcar_revogado(jti, claims.get("exp", 0))
+        return True
+    tokens_verificados.set(jti, True)
+    return False
+
+
+def sujeito_token(token: str):
+    """`sub` de um token autêntico e dentro da validade, sem consultar revogações; None se não for."""
+    if TOKEN_MODE != "jwt":
+        return active_tokens.get(token)
+    try:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM]).get("sub")
+    except jwt.InvalidTokenError:
+        return None
+
+
+async def revoke_token(token: str):
+    if TOKEN_MODE != "jwt":
+        active_tokens.pop(token, None)
+        return
+
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        return
+
+    _marcar_revogado(claims["jti"], claims["exp"])
+    # O índice TTL apaga a revogação quando o token expiraria de qualquer forma
+    await tokens_revogados_collection.update_one(
+        {"_id": claims["jti"]},
+        {"$setOnInsert": {"expiraEm": datetime.fromtimestamp(claims["exp"], timezone.utc)}},
+        upsert=True,
+    )
+    # Sem escopos: não vai a nenhuma conexão, só aos outros workers
+    await publicar(EVENTO_REVOGACAO, {"jti": claims["jti"], "exp": claims["exp"]}, [])
+
+
+def invalidar_usuario(user_id: str):
+    user_cache.delete(user_id)
+
+
+async def get_current_user(authorization: str = Header(None)):
+    if not authorization or not authorization.startswith('Bearer '):
+        raise HTTPException(status_code=401, detail="Não autorizado")
+
+    token = authorization.replace('Bearer ', '')
+    claims = decode_token(token)
+    if await token_revogado(claims):
+        raise HTTPException(status_code=401, detail="Token inválido")
+    user_id = claims["sub"]
+
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await usuarios_collection.find_one({"id": user_id}, USUARIO_SLIM_PROJECAO)
+        if not user:
+            raise HTTPException(status_code=401, detail="Usuário não encontrado")
+        user_cache.set(user_id, user)
+
+    if "tipo" in claims and claims["tipo"] != user['tipo']:
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    return user
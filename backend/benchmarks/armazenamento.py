@@ -0,0 +1,123 @@
+"""Compara os formatos de armazenamento das execuções (documentos x buckets).
+
+Pré-requisitos (na pasta backend/):
+    python -m benchmarks.dados --limpar     # massa de dados em `execucoes`
+    python execucoes.py migrar              # mesma massa em `execucoes_buckets`
+
+Uso:
+    python -m benchmarks.armazenamento [--alunos 50] [--repeticoes 5] [--saida arquivo.json]
+
+Para cada formato mede o tamanho das coleções e índices (collStats) e a
+latência de: primeira página do aluno (limit 20), página por atribuição e
+leitura completa do histórico do aluno.
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from database import db
+from execucoes import ARMAZENAMENTOS
+from benchmarks.dados import RESULTADOS_DIR
+from benchmarks.relatorio import PERCENTIS, percentil, salvar
+
+LIMITE_PAGINA = 20
+
+
+async def tamanho(nome_colecao: str) -> dict:
+    stats = await db.command("collStats", nome_colecao)
+    return {
+        "documentos": stats.get("count", 0),
+        "tamanhoDados": stats.get("size", 0),
+        "tamanhoArmazenado": stats.get("storageSize", 0),
+        "tamanhoIndices": stats.get("totalIndexSize", 0),
+    }
+
+
+async def _cronometrar(funcao, repeticoes: int) -> list:
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await funcao()
+        amostras.append((time.perf_counter() - inicio) * 1000)
+    return amostras
+
+
+def _resumo(amostras: list) -> dict:
+    return {
+        "amostras": len(amostras),
+        "media": round(sum(amostras) / len(amostras), 3) if amostras else 0.0,
+        **{f"p{p}": round(percentil(amostras, p), 3) for p in PERCENTIS},
+    }
+
+
+async def medir_formato(repositorio, alunos: list, atribuicoes: list, repeticoes: int) -> dict:
+    operacoes = {"primeiraPagina": [], "paginaAtribuicao": [], "historicoCompleto": []}
+
+    for id_aluno in alunos:
+        async def primeira_pagina():
+            await repositorio.pagina({"idAluno": id_aluno}, limit=LIMITE_PAGINA)
+
+        async def historico_completo():
+            async for _ in repositorio.iterar({"idAluno": id_aluno}):
+                pass
+
+        operacoes["primeiraPagina"] += await _cronometrar(primeira_pagina, repeticoes)
+        operacoes["historicoCompleto"] += await _cronometrar(historico_completo, repeticoes)
+
+    for id_atribuicao in atribuicoes:
+        async def pagina_atribuicao():
+            await repositorio.pagina({"idAtribuicao": id_atribuicao}, limit=LIMITE_PAGINA)
+
+        operacoes["paginaAtribuicao"] += await _cronometrar(pagina_atribuicao, repeticoes)
+
+    return {
+        "colecao": await tamanho(repositorio.collection.name),
+        "latencia": {nome: _resumo(amostras) for nome, amostras in operacoes.items()},
+    }
+
+
+async def executar(n_alunos: int, repeticoes: int) -> dict:
+    alunos = await db.execucoes.distinct("idAluno")
+    alunos = sorted(alunos)[:n_alunos]
+    atribuicoes = sorted(await db.execucoes.distinct("idAtribuicao", {"idAluno": {"$in": alunos}}))
+
+    formatos = {}
+    for nome, classe in ARMAZENAMENTOS.items():
+        formatos[nome] = await medir_formato(classe(), alunos, atribuicoes, repeticoes)
+
+    return {
+        "geradoEm": datetime.now().isoformat(),
+        "configuracao": {"alunos": len(alunos), "atribuicoes": len(atribuicoes), "repeticoes": repeticoes},
+        "formatos": formatos,
+    }
+
+
+def imprimir(relatorio: dict):
+    formatos = relatorio["formatos"]
+    nomes = list(formatos)
+    print(f"{'':<28}" + "".join(f"{n:>16}" for n in nomes))
+    for campo in ("documentos", "tamanhoDados", "tamanhoIndices"):
+        print(f"{campo:<28}" + "".join(f"{formatos[n]['colecao'][campo]:>16}" for n in nomes))
+    for operacao in formatos[nomes[0]]["latencia"]:
+        for p in ("p50", "p95", "p99"):
+            valores = "".join(f"{formatos[n]['latencia'][operacao][p]:>14.2f}ms" for n in nomes)
+            print(f"{operacao + ' ' + p:<28}{valores}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alunos", type=int, default=50)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--saida")
+    args = parser.parse_args()
+
+    relatorio = asyncio.run(executar(args.alunos, args.repeticoes))
+    imprimir(relatorio)
+    saida = args.saida or RESULTADOS_DIR / f"armazenamento-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    print(f"\nRelatório gravado em {salvar(relatorio, saida)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Driver de carga assíncrono que reproduz os fluxos reais dos usuários.
+
+Cada usuário virtual repete, até o fim da duração, um dos fluxos:
+    aluno     login → /usuarios/me → agenda → estatísticas → abrir treino
+              → registrar execução → histórico de execuções → logout
+    personal  login → resumo → alunos → treinos → abrir treino
+              → execuções de um aluno → logout
+
+As credenciais vêm do manifesto gravado por `benchmarks.dados`. O servidor
+pode estar rodando à parte (--url) ou ser carregado no próprio processo
+(--local), sem rede no meio.
+
+O controle de admissão (admissao.py) limitaria o driver, não o servidor: todos
+os usuários virtuais saem do mesmo IP. Com --local ele é desligado
+(ADMISSAO_ATIVA=0, se não definido); com --url, suba o servidor com
+ADMISSAO_ATIVA=0. Se vierem respostas 429, o relatório avisa.
+
+Uso (na pasta backend/):
+    python -m benchmarks.carga --url http://localhost:8001 --usuarios 50 --duracao 60
+    python -m benchmarks.carga --local --usuarios 20 --duracao 30 --saida benchmarks/resultados/base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.dados import MANIFESTO_PADRAO, RESULTADOS_DIR
+from benchmarks.relatorio import Coletor, salvar, imprimir
+
+
+class UsuarioVirtual:
+    def __init__(self, cliente: httpx.AsyncClient, coletor: Coletor, rng: random.Random, pausa: float):
+        self.cliente = cliente
+        self.coletor = coletor
+        self.rng = rng
+        self.pausa = pausa
+        self.token = None
+
+    async def requisicao(self, metodo: str, rota: str, url: str, **kwargs):
+        """Executa uma requisição e registra a latência agrupada por `rota` (o template do endpoint)."""
+        headers = kwargs.pop("headers", {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.cliente.request(metodo, url, headers=headers, **kwargs)
+            status = resposta.status_code
+        except httpx.HTTPError:
+            resposta, status = None, 0
+        self.coletor.registrar(f"{metodo} {rota}", status, time.perf_counter() - inicio)
+
+        if self.pausa:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.pausa))
+        if resposta is None or status >= 400:
+            return None
+        return resposta.json() if resposta.content else None
+
+    async def login(self, email: str, senha: str, tipo: str):
+        dados = await self.requisicao(
+            "POST", "/api/auth/login", "/api/auth/login",
+            json={"email": email, "senha": senha, "tipo": tipo},
+        )
+        if not dados:
+            return None
+        self.token = dados["token"]
+        return dados["usuario"]
+
+    async def logout(self):
+        await self.requisicao("POST", "/api/auth/logout", "/api/auth/logout")
+        self.token = None
+
+    async def fluxo_aluno(self, email: str, senha: str):
+        usuario = await self.login(email, senha, "aluno")
+        if not usuario:
+            return False
+        id_aluno = usuario["id"]
+
+        await self.requisicao("GET", "/api/usuarios/me", "/api/usuarios/me")
+        agenda = await self.requisicao("GET", "/api/alunos/{id}/agenda", f"/api/alunos/{id_aluno}/agenda")
+        await self.requisicao("GET", "/api/alunos/{id}/estatisticas", f"/api/alunos/{id_aluno}/estatisticas")
+
+        if agenda:
+            atribuicao = self.rng.choice(agenda)
+            treino = await self.requisicao(
+                "GET", "/api/treinos/{id}", f"/api/treinos/{atribuicao['idTreino']}"
+            )
+            if treino:
+                agora = datetime.now(timezone.utc).isoformat()
+                exercicios = [
+                    {
+                        "idExercicio": ex["id"],
+                        "serie": serie,
+                        "repeticoesFeit": self.rng.randint(6, 15),
+                        "cargaUtilizada": ex.get("carga"),
+                        "observacoes": "",
+                        "dataConclusao": agora,
+                    }
+                    for ex in treino["exercicios"]
+                    for serie in range(1, ex["series"] + 1)
+                ]
+                await self.requisicao(
+                    "POST", "/api/execucoes", "/api/execucoes",
+                    json={
+                        "idAtribuicao": atribuicao["id"],
+                        "duracao": treino["duracao"],
+                        "exercicios": exercicios,
+                    },
+                )
+
+        await self.requisicao(
+            "GET", "/api/alunos/{id}/execucoes", f"/api/alunos/{id_aluno}/execucoes", params={"limit": 20}
+        )
+        await self.logout()
+        return True
+
+    async def fluxo_personal(self, email: str, senha: str):
+        usuario = await self.login(email, senha, "personal")
+        if not usuario:
+            return False
+        id_personal = usuario["id"]
+
+        await self.requisicao("GET", "/api/personal/{id}/resumo", f"/api/personal/{id_personal}/resumo")
+        alunos = await self.requisicao(
+            "GET", "/api/personal/{id}/alunos", f"/api/personal/{id_personal}/alunos", params={"limit": 50}
+        )
+        treinos = await self.requisicao("GET", "/api/personal/{id}/treinos", f"/api/personal/{id_personal}/treinos")
+
+        if treinos:
+            treino = self.rng.choice(treinos)
+            await self.requisicao("GET", "/api/treinos/{id}", f"/api/treinos/{treino['id']}")
+        if alunos:
+            aluno = self.rng.choice(alunos)
+            await self.requisicao(
+                "GET", "/api/alunos/{id}/execucoes", f"/api/alunos/{aluno['id']}/execucoes", params={"limit": 20}
+            )
+
+        await self.logout()
+        return True
+
+
+async def _executar_usuario(cliente, coletor, manifesto, args, indice: int, fim: float):
+    rng = random.Random(f"{args.semente}:{indice}")
+    usuario = UsuarioVirtual(cliente, coletor, rng, args.pausa)
+    while time.monotonic() < fim:
+        if manifesto["personais"] and rng.random() < args.proporcao_personal:
+            ok = await usuario.fluxo_personal(rng.choice(manifesto["personais"]), manifesto["senha"])
+            nome = "personal"
+        else:
+            ok = await usuario.fluxo_aluno(rng.choice(manifesto["alunos"]), manifesto["senha"])
+            nome = "aluno"
+        if ok:
+            coletor.fluxo_concluido(nome)
+
+
+def _criar_cliente(args) -> httpx.AsyncClient:
+    limites = httpx.Limits(max_connections=args.usuarios, max_keepalive_connections=args.usuarios)
+    if args.local:
+        # Lido na importação do app
+        os.environ.setdefault("ADMISSAO_ATIVA", "0")
+        from server import app
+        transporte = httpx.ASGITransport(app=app)
+        return httpx.AsyncClient(transport=transporte, base_url="http://benchmark", timeout=args.timeout)
+    return httpx.AsyncClient(base_url=args.url, limits=limites, timeout=args.timeout)
+
+
+async def executar(args) -> dict:
+    manifesto = json.loads(Path(args.manifesto).read_text(encoding="utf-8"))
+    if not manifesto["alunos"]:
+        raise SystemExit("O manifesto não tem alunos; gere os dados com `python -m benchmarks.dados`")
+
+    coletor = Coletor()
+    coletor.ativo = False
+    async with _criar_cliente(args) as cliente:
+        inicio = time.monotonic()
+        fim = inicio + args.aquecimento + args.duracao
+        tarefas = [
+            asyncio.create_task(_executar_usuario(cliente, coletor, manifesto, args, i, fim))
+            for i in range(args.usuarios)
+        ]
+
+        await asyncio.sleep(args.aquecimento)
+        coletor.ativo = True
+        inicio_medicao = time.monotonic()
+        await asyncio.gather(*tarefas)
+        duracao = time.monotonic() - inicio_medicao
+
+    rejeitadas = sum(status.get("429", 0) for status in coletor.status.values())
+    configuracao = {
+        "alvo": "local" if args.local else args.url,
+        "usuarios": args.usuarios,
+        "duracao": args.duracao,
+        "aquecimento": args.aquecimento,
+        "pausa": args.pausa,
+        "proporcaoPersonal": args.proporcao_personal,
+        "semente": args.semente,
+        "rejeicoesAdmissao": rejeitadas,
+        "dataset": {k: manifesto.get(k) for k in ("banco", "semente", "parametros", "totais")},
+    }
+    return coletor.gerar(duracao, configuracao)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    alvo = parser.add_mutually_exclusive_group()
+    alvo.add_argument("--url", default="http://localhost:8001", help="servidor já em execução")
+    alvo.add_argument("--local", action="store_true", help="carrega o app no próprio processo")
+    parser.add_argument("--usuarios", type=int, default=20, help="usuários virtuais simultâneos")
+    parser.add_argument("--duracao", type=float, default=30, help="segundos de medição")
+    parser.add_argument("--aquecimento", type=float, default=5, help="segundos iniciais descartados")
+    parser.add_argument("--pausa", type=float, default=0, help="pausa média entre passos (segundos)")
+    parser.add_argument("--proporcao-personal", type=float, default=0.2, help="fração dos fluxos feitos por personais")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--manifesto", default=str(MANIFESTO_PADRAO))
+    parser.add_argument("--saida", help="arquivo JSON do relatório (padrão: resultados/carga-<data>.json)")
+    args = parser.parse_args()
+
+    relatorio = asyncio.run(executar(args))
+    saida = args.saida or RESULTADOS_DIR / f"carga-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    imprimir(relatorio)
+    rejeitadas = relatorio["configuracao"]["rejeicoesAdmissao"]
+    if rejeitadas:
+        print(
+            f"\nAVISO: {rejeitadas} respostas 429 do controle de admissão; os números medem o limite por "
+            "cliente, não o servidor. Rode o servidor com ADMISSAO_ATIVA=0.",
+            file=sys.stderr,
+        )
+    print(f"\nRelatório gravado em {salvar(relatorio, saida)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""Gerador de massa de dados reprodutível para os benchmarks.
+
+Popula o MongoDB configurado em `database.py` (MONGO_URL/DB_NAME) com
+personais, alunos, catálogos de exercícios, treinos, atribuições e execuções. Com a mesma semente os
+documentos gerados são sempre os mesmos (as datas são relativas ao momento
+da geração), então duas rodadas do benchmark partem do mesmo estado.
+
+Uso (na pasta backend/, de preferência com DB_NAME apontando para um banco
+só de benchmark):
+    python -m benchmarks.dados --limpar
+    python -m benchmarks.dados --personais 20 --alunos 40 --execucoes 200 --semente 7 --limpar
+
+Ao final é gravado um manifesto (padrão `benchmarks/resultados/dataset.json`)
+com as contagens e as credenciais usadas pelo driver de carga.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from database import (
+    db,
+    usuarios_collection,
+    treinos_collection,
+    atribuicoes_collection,
+    execucoes_collection,
+    execucoes_buckets_collection,
+    execucoes_chaves_collection,
+    estatisticas_aluno_collection,
+    estatisticas_personal_collection,
+    medidas_collection,
+    progressao_exercicios_collection,
+    contadores_collection,
+    remocoes_collection,
+    exercicios_collection,
+    tarefas_collection,
+)
+from indexes import ensure_indexes
+from estatisticas import reconstruir_estatisticas
+from medidas import documento_medida
+from busca import campos_busca
+from catalogo import documento_catalogo, referencia_treino
+from senhas import pwd_context
+
+logger = logging.getLogger(__name__)
+
+RESULTADOS_DIR = Path(__file__).parent / "resultados"
+MANIFESTO_PADRAO = RESULTADOS_DIR / "dataset.json"
+
+SENHA = "benchmark123"
+DOMINIO = "bench.strongify.dev"
+LOTE_INSERCAO = 1000
+
+DIAS_SEMANA = ["segunda", "terca", "quarta", "quinta", "sexta", "sabado", "domingo"]
+TIPOS_TREINO = ["Hipertrofia", "Força", "Resistência", "Emagrecimento", "Funcional"]
+NIVEIS = ["Iniciante", "Intermediário", "Avançado"]
+OBJETIVOS = ["Hipertrofia", "Emagrecimento", "Condicionamento", "Saúde"]
+EXERCICIOS = [
+    "Supino reto", "Supino inclinado", "Crucifixo", "Agachamento livre", "Leg press",
+    "Cadeira extensora", "Mesa flexora", "Stiff", "Remada curvada", "Puxada frontal",
+    "Desenvolvimento", "Elevação lateral", "Rosca direta", "Tríceps testa", "Prancha",
+]
+
+
+def email_personal(i: int) -> str:
+    return f"personal{i}@{DOMINIO}"
+
+
+def email_aluno(i: int, j: int) -> str:
+    return f"aluno{i}.{j}@{DOMINIO}"
+
+
+def _iso(data: datetime) -> str:
+    return data.isoformat()
+
+
+class Gerador:
+    """Gera os documentos de forma determinística a partir da semente."""
+
+    def __init__(self, semente: int, agora: datetime):
+        self.rng = random.Random(semente)
+        self.agora = agora
+        # Um único hash para todos os usuários: o bcrypt aqui só atrasaria a geração
+        self.senha_hash = pwd_context.hash(SENHA)
+
+    def data_passada(self, dias: int) -> datetime:
+        return self.agora - timedelta(seconds=self.rng.randint(0, dias * 86400))
+
+    def personal(self, i: int) -> dict:
+        criacao = _iso(self.data_passada(365))
+        return {
+            "id": f"PTB{i:05d}",
+            "tipo": "personal",
+            "nome": f"Personal {i}",
+            "email": email_personal(i),
+            "senha": self.senha_hash,
+            "especializacao": self.rng.choice(TIPOS_TREINO),
+            "avatar": None,
+            "dataCriacao": criacao,
+            "dataUltimaEdicao": criacao,
+        }
+
+    def aluno(self, i: int, j: int, id_personal: str) -> dict:
+        criacao = self.data_passada(180)
+        peso = round(self.rng.uniform(50, 110), 1)
+        altura = round(self.rng.uniform(1.5, 1.95), 2)
+        aluno = {
+            "id": f"ALNB{i:05d}{j:04d}",
+            "tipo": "aluno",
+            "nome": f"Aluno {i}.{j}",
+            "email": email_aluno(i, j),
+            "senha": self.senha_hash,
+            "codigoPersonal": id_personal,
+            "idade": self.rng.randint(16, 70),
+            "peso": peso,
+            "altura": altura,
+            "sexo": self.rng.choice(["M", "F"]),
+            "objetivo": self.rng.choice(OBJETIVOS),
+            "restricoes": "",
+            "avatar": None,
+            "dataCriacao": _iso(criacao),
+            "dataUltimaEdicao": _iso(criacao),
+        }
+        return {**aluno, **campos_busca(aluno)}
+
+    def medidas(self, aluno: dict) -> list:
+        criacao = datetime.fromisoformat(aluno["dataCriacao"])
+        return [
+            documento_medida(
+                aluno["id"],
+                round(aluno["peso"] + self.rng.uniform(-3, 3), 1),
+                aluno["altura"],
+                _iso(criacao + timedelta(days=30 * k)),
+            )
+            for k in range(self.rng.randint(1, 6))
+        ]
+
+    def catalogo(self, i: int, id_personal: str) -> list:
+        criacao = _iso(self.data_passada(365))
+        return [
+            documento_catalogo(id_personal, {"nome": nome}, criacao, id=f"EXCB{i:05d}{n:02d}")
+            for n, nome in enumerate(EXERCICIOS)
+        ]
+
+    def treino(self, i: int, k: int, id_personal: str, catalogo: list) -> dict:
+        criacao = _iso(self.data_passada(365))
+        exercicios = [
+            referencia_treino({
+                "id": f"EXB{i:05d}{k:03d}{n:02d}",
+                "series": self.rng.randint(3, 5),
+                "repeticoes": self.rng.choice(["8-12", "10", "12-15", "6-8"]),
+                "carga": float(self.rng.randint(5, 120)),
+                "descanso": self.rng.choice([45, 60, 90, 120]),
+            }, entrada["id"])
+            for n, entrada in enumerate(self.rng.sample(catalogo, self.rng.randint(4, 10)))
+        ]
+        return {
+            "id": f"TRENB{i:05d}{k:03d}",
+            "idPersonal": id_personal,
+            "nome": f"Treino {k + 1}",
+            "descricao": f"Treino gerado para benchmark ({i}.{k})",
+            "tipo": self.rng.choice(TIPOS_TREINO),
+            "duracao": self.rng.choice([30, 45, 60, 75, 90]),
+            "nivel": self.rng.choice(NIVEIS),
+            "observacoes": None,
+            "exercicios": exercicios,
+            "dataCriacao": criacao,
+            "dataUltimaEdicao": criacao,
+        }
+
+    def atribuicao(self, aluno: dict, treino: dict, n: int) -> dict:
+        inicio = self.data_passada(120)
+        return {
+            "id": f"ATRB{aluno['id']}{n:02d}",
+            "idAluno": aluno["id"],
+            "idTreino": treino["id"],
+            "idPersonal": treino["idPersonal"],
+            "dataInicio": inicio.date().isoformat(),
+            "dataFim": None,
+            "diasSemana": sorted(self.rng.sample(DIAS_SEMANA, self.rng.randint(1, 4)), key=DIAS_SEMANA.index),
+            "status": "ativo" if self.rng.random() < 0.85 else "inativo",
+            "dataCriacao": _iso(inicio),
+        }
+
+    def execucao(self, aluno: dict, atribuicao: dict, treino: dict, n: int) -> dict:
+        data = self.data_passada(180)
+        exercicios = [
+            {
+                "idExercicio": ex["id"],
+                "serie": serie,
+                "repeticoesFeit": self.rng.randint(6, 15),
+                "cargaUtilizada": ex["carga"],
+                "observacoes": "",
+                "dataConclusao": _iso(data),
+            }
+            for ex in treino["exercicios"]
+            for serie in range(1, ex["series"] + 1)
+        ]
+        return {
+            "id": f"EXECB{aluno['id']}{n:05d}",
+            "idAluno": aluno["id"],
+            "idAtribuicao": atribuicao["id"],
+            "dataExecucao": _iso(data),
+            "duracao": max(10, treino["duracao"] + self.rng.randint(-15, 15)),
+            "exercicios": exercicios,
+        }
+
+
+async def _inserir(collection, docs: list):
+    for i in range(0, len(docs), LOTE_INSERCAO):
+        await collection.insert_many(docs[i:i + LOTE_INSERCAO], ordered=False)
+
+
+async def limpar():
+    for collection in (
+        usuarios_collection,
+        treinos_collection,
+        atribuicoes_collection,
+        execucoes_collection,
+        execucoes_buckets_collection,
+        execucoes_chaves_collection,
+        estatisticas_aluno_collection,
+        estatisticas_personal_collection,
+        progressao_exercicios_collection,
+        contadores_collection,
+        remocoes_collection,
+        exercicios_collection,
+        tarefas_collection,
+    ):
+        await collection.delete_many({})
+    # Time-series: mais simples recriar do que apagar documento a documento
+    await medidas_collection.drop()
+
+
+async def gerar(
+    personais: int = 5,
+    alunos: int = 20,
+    treinos: int = 10,
+    atribuicoes: int = 3,
+    execucoes: int = 50,
+    semente: int = 42,
+) -> dict:
+    """Gera e insere a massa de dados. As contagens de alunos, treinos,
+    atribuições e execuções são por personal, por personal, por aluno e por
+    aluno, respectivamente. Retorna o manifesto."""
+    agora = datetime.now(timezone.utc).replace(microsecond=0)
+    gerador = Gerador(semente, agora)
+    totais = {"personais": 0, "alunos": 0, "medidas": 0, "treinos": 0, "atribuicoes": 0, "execucoes": 0}
+
+    for i in range(personais):
+        personal = gerador.personal(i)
+        catalogo = gerador.catalogo(i, personal["id"])
+        lista_treinos = [gerador.treino(i, k, personal["id"], catalogo) for k in range(treinos)]
+        lista_alunos, lista_medidas, lista_atribuicoes, lista_execucoes = [], [], [], []
+
+        for j in range(alunos):
+            aluno = gerador.aluno(i, j, personal["id"])
+            lista_alunos.append(aluno)
+            lista_medidas.extend(gerador.medidas(aluno))
+            if not lista_treinos:
+                continue
+            minhas = [
+                gerador.atribuicao(aluno, treino, n)
+                for n, treino in enumerate(gerador.rng.sample(lista_treinos, min(atribuicoes, len(lista_treinos))))
+            ]
+            lista_atribuicoes.extend(minhas)
+            if not minhas:
+                continue
+            treinos_por_id = {t["id"]: t for t in lista_treinos}
+            for n in range(execucoes):
+                atribuicao = gerador.rng.choice(minhas)
+                lista_execucoes.append(
+                    gerador.execucao(aluno, atribuicao, treinos_por_id[atribuicao["idTreino"]], n)
+                )
+
+        await _inserir(usuarios_collection, [personal] + lista_alunos)
+        for collection, docs in (
+            (medidas_collection, lista_medidas),
+            (exercicios_collection, catalogo),
+            (treinos_collection, lista_treinos),
+            (atribuicoes_collection, lista_atribuicoes),
+            (execucoes_collection, lista_execucoes),
+        ):
+            if docs:
+                await _inserir(collection, docs)
+
+        totais["personais"] += 1
+        totais["alunos"] += len(lista_alunos)
+        totais["medidas"] += len(lista_medidas)
+        totais["treinos"] += len(lista_treinos)
+        totais["atribuicoes"] += len(lista_atribuicoes)
+        totais["execucoes"] += len(lista_execucoes)
+        logger.info("Personal %d/%d gerado", i + 1, personais)
+
+    await reconstruir_estatisticas()
+
+    return {
+        "banco": db.name,
+        "semente": semente,
+        "geradoEm": agora.isoformat(),
+        "parametros": {
+            "personais": personais,
+            "alunosPorPersonal": alunos,
+            "treinosPorPersonal": treinos,
+            "atribuicoesPorAluno": atribuicoes,
+            "execucoesPorAluno": execucoes,
+        },
+        "totais": totais,
+        "senha": SENHA,
+        "personais": [email_personal(i) for i in range(personais)],
+        "alunos": [email_aluno(i, j) for i in range(personais) for j in range(alunos)],
+    }
+
+
+async def main(args):
+    if args.limpar:
+        logger.info("Limpando as coleções do banco '%s'", db.name)
+        await limpar()
+    await ensure_indexes()
+
+    manifesto = await gerar(
+        personais=args.personais,
+        alunos=args.alunos,
+        treinos=args.treinos,
+        atribuicoes=args.atribuicoes,
+        execucoes=args.execucoes,
+        semente=args.semente,
+    )
+
+    destino = Path(args.manifesto)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(json.dumps(manifesto, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(json.dumps(manifesto["totais"]))
+    print(f"Manifesto gravado em {destino}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--personais", type=int, default=5)
+    parser.add_argument("--alunos", type=int, default=20, help="alunos por personal")
+    parser.add_argument("--treinos", type=int, default=10, help="treinos por personal")
+    parser.add_argument("--atribuicoes", type=int, default=3, help="atribuições por aluno")
+    parser.add_argument("--execucoes", type=int, default=50, help="execuções por aluno")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--limpar", action="store_true", help="apaga os documentos existentes antes de gerar")
+    parser.add_argument("--manifesto", default=str(MANIFESTO_PADRAO))
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,183 @@
+"""Relatório de carga: vazão e latência p50/p95/p99 por endpoint.
+
+O relatório é um JSON, então duas rodadas podem ser comparadas:
+    python -m benchmarks.relatorio comparar base.json novo.json
+    python -m benchmarks.relatorio comparar base.json novo.json --tolerancia 0.15
+
+A comparação marca como regressão um endpoint cujo p95 subiu ou cuja vazão
+caiu mais que a tolerância (padrão 10%), e sai com código 1 se houver alguma.
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+PERCENTIS = (50, 95, 99)
+TOLERANCIA_PADRAO = 0.10
+
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil com interpolação linear entre as amostras ordenadas."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    inferior = math.floor(posicao)
+    superior = math.ceil(posicao)
+    if inferior == superior:
+        return ordenados[inferior]
+    fracao = posicao - inferior
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * fracao
+
+
+class Coletor:
+    """Acumula as amostras (endpoint, status, latência) do driver de carga.
+
+    Enquanto `ativo` for falso (aquecimento) as amostras são descartadas.
+    """
+
+    def __init__(self):
+        self.ativo = True
+        self.latencias = defaultdict(list)
+        self.erros = defaultdict(int)
+        self.status = defaultdict(lambda: defaultdict(int))
+        self.fluxos = defaultdict(int)
+
+    def registrar(self, endpoint: str, status: int, segundos: float):
+        if not self.ativo:
+            return
+        self.latencias[endpoint].append(segundos * 1000)
+        self.status[endpoint][str(status)] += 1
+        if status >= 400 or status == 0:
+            self.erros[endpoint] += 1
+
+    def fluxo_concluido(self, nome: str):
+        if self.ativo:
+            self.fluxos[nome] += 1
+
+    def gerar(self, duracao: float, configuracao: dict) -> dict:
+        endpoints = {}
+        for endpoint in sorted(self.latencias):
+            amostras = self.latencias[endpoint]
+            endpoints[endpoint] = {
+                "requisicoes": len(amostras),
+                "erros": self.erros[endpoint],
+                "status": dict(self.status[endpoint]),
+                "vazao": round(len(amostras) / duracao, 2) if duracao else 0.0,
+                "media": round(sum(amostras) / len(amostras), 2),
+                **{f"p{p}": round(percentil(amostras, p), 2) for p in PERCENTIS},
+                "max": round(max(amostras), 2),
+            }
+
+        total = sum(len(a) for a in self.latencias.values())
+        return {
+            "geradoEm": datetime.now(timezone.utc).isoformat(),
+            "ambiente": {"python": platform.python_version(), "plataforma": platform.platform()},
+            "configuracao": configuracao,
+            "duracao": round(duracao, 2),
+            "totais": {
+                "requisicoes": total,
+                "erros": sum(self.erros.values()),
+                "vazao": round(total / duracao, 2) if duracao else 0.0,
+                "fluxos": dict(self.fluxos),
+            },
+            "endpoints": endpoints,
+        }
+
+
+def salvar(relatorio: dict, caminho) -> Path:
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False), encoding="utf-8")
+    return caminho
+
+
+def carregar(caminho) -> dict:
+    return json.loads(Path(caminho).read_text(encoding="utf-8"))
+
+
+def _variacao(antes: float, depois: float) -> float:
+    if not antes:
+        return 0.0
+    return (depois - antes) / antes
+
+
+def comparar(base: dict, novo: dict, tolerancia: float = TOLERANCIA_PADRAO) -> list:
+    """Compara dois relatórios endpoint a endpoint.
+
+    Retorna uma linha por endpoint presente nos dois, com as variações
+    relativas e a flag `regressao`.
+    """
+    linhas = []
+    for endpoint, antes in base["endpoints"].items():
+        depois = novo["endpoints"].get(endpoint)
+        if depois is None:
+            continue
+        linha = {
+            "endpoint": endpoint,
+            **{f"p{p}": _variacao(antes[f"p{p}"], depois[f"p{p}"]) for p in PERCENTIS},
+            "vazao": _variacao(antes["vazao"], depois["vazao"]),
+            "erros": depois["erros"] - antes["erros"],
+        }
+        linha["regressao"] = (
+            linha["p95"] > tolerancia
+            or linha["vazao"] < -tolerancia
+            or (depois["erros"] > 0 and antes["erros"] == 0)
+        )
+        linhas.append(linha)
+    return linhas
+
+
+def imprimir(relatorio: dict):
+    print(f"{'endpoint':<48}{'req':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'erros':>7}   (ms)")
+    for endpoint, dados in relatorio["endpoints"].items():
+        print(
+            f"{endpoint:<48}{dados['requisicoes']:>8}{dados['vazao']:>9.1f}"
+            f"{dados['p50']:>9.1f}{dados['p95']:>9.1f}{dados['p99']:>9.1f}{dados['erros']:>7}"
+        )
+    totais = relatorio["totais"]
+    print(f"\nTotal: {totais['requisicoes']} requisições, {totais['vazao']:.1f} req/s, {totais['erros']} erros")
+
+
+def imprimir_comparacao(linhas: list):
+    print(f"{'endpoint':<48}{'p50':>9}{'p95':>9}{'p99':>9}{'req/s':>9}")
+    for linha in linhas:
+        marca = "  << REGRESSÃO" if linha["regressao"] else ""
+        print(
+            f"{linha['endpoint']:<48}{linha['p50']:>+9.1%}{linha['p95']:>+9.1%}"
+            f"{linha['p99']:>+9.1%}{linha['vazao']:>+9.1%}{marca}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    mostrar = sub.add_parser("mostrar", help="imprime um relatório")
+    mostrar.add_argument("relatorio")
+
+    diff = sub.add_parser("comparar", help="compara dois relatórios e aponta regressões")
+    diff.add_argument("base")
+    diff.add_argument("novo")
+    diff.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO)
+
+    args = parser.parse_args()
+    if args.comando == "mostrar":
+        imprimir(carregar(args.relatorio))
+        return
+
+    linhas = comparar(carregar(args.base), carregar(args.novo), args.tolerancia)
+    imprimir_comparacao(linhas)
+    regressoes = [l["endpoint"] for l in linhas if l["regressao"]]
+    if regressoes:
+        print(f"\n{len(regressoes)} endpoint(s) com regressão acima de {args.tolerancia:.0%}")
+        sys.exit(1)
+    print("\nNenhuma regressão")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Micro-benchmark de serialização das respostas, por modelo de `models.py`.
+
+Compara o custo por documento de três caminhos:
+    padrao   Modelo(**doc) no handler + revalidação pelo response_model + json da stdlib
+    validar  uma validação por documento + orjson (RESPOSTA_RAPIDA=validar)
+    direto   documento projetado do Mongo direto para orjson (RESPOSTA_RAPIDA=direto)
+
+Uso (na pasta backend/):
+    python -m benchmarks.serializacao [--docs 500] [--repeticoes 5]
+"""
+import argparse
+import json
+import time
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+from models import (
+    HistoricoMedida,
+    UsuarioResponse,
+    Exercicio,
+    TreinoResponse,
+    AtribuicaoResponse,
+    AgendaItem,
+    ExecucaoResponse,
+    PeriodoProgresso,
+    ProgressoResponse,
+    EstatisticasResponse,
+    AlunoResumo,
+)
+
+DATA = "2026-10-17T12:00:00.123456+00:00"
+
+
+def _medida(i):
+    return {"data": DATA, "peso": 70.0 + i % 10, "altura": 1.75}
+
+
+def _exercicio(i):
+    return {
+        "id": f"EX{i}",
+        "nome": "Supino reto",
+        "series": 4,
+        "repeticoes": "8-12",
+        "carga": 40.0,
+        "descanso": 90,
+        "observacoes": "Controlar a descida",
+        "videoUrl": None,
+        "videoLocal": f"/api/midias/{'a' * 64}",
+    }
+
+
+def _usuario(i):
+    return {
+        "id": f"ALN{i}",
+        "nome": f"Aluno {i}",
+        "email": f"aluno{i}@exemplo.com",
+        "tipo": "aluno",
+        "avatar": None,
+        "dataCriacao": DATA,
+        "codigoPersonal": "PT1",
+        "idade": 30,
+        "peso": 72.5,
+        "altura": 1.75,
+        "sexo": "M",
+        "objetivo": "Hipertrofia",
+        "restricoes": "",
+    }
+
+
+def _treino(i):
+    return {
+        "id": f"TREN{i}",
+        "idPersonal": "PT1",
+        "nome": f"Treino {i}",
+        "descricao": "Treino de peito e tríceps",
+        "tipo": "Hipertrofia",
+        "duracao": 60,
+        "nivel": "Intermediário",
+        "observacoes": None,
+        "exercicios": [_exercicio(j) for j in range(8)],
+        "dataCriacao": DATA,
+        "dataUltimaEdicao": DATA,
+    }
+
+
+def _atribuicao(i):
+    return {
+        "id": f"ATRB{i}",
+        "idAluno": "ALN1",
+        "idTreino": f"TREN{i}",
+        "idPersonal": "PT1",
+        "dataInicio": "2026-10-01",
+        "dataFim": None,
+        "diasSemana": ["segunda", "quarta", "sexta"],
+        "status": "ativo",
+        "dataCriacao": DATA,
+    }
+
+
+def _execucao(i):
+    return {
+        "id": f"EXEC{i}",
+        "idAluno": "ALN1",
+        "idAtribuicao": "ATRB1",
+        "dataExecucao": DATA,
+        "duracao": 55,
+        "exercicios": [
+            {"idExercicio": f"EX{j}", "serie": s, "repeticoesFeit": 10, "cargaUtilizada": 40.0,
+             "observacoes": "", "dataConclusao": DATA}
+            for j in range(8) for s in range(1, 5)
+        ],
+    }
+
+
+def _periodo(i):
+    return {"inicio": DATA, "fim": DATA, "treinos": 3, "tempoTotal": 150}
+
+
+def _progresso(i):
+    return {
+        "totalTreinos": 120, "tempoTotal": 6000, "mediaTempoTreino": 50, "ultimaSemana": 3,
+        "ultimaExecucao": DATA, "granularidade": "semana", "periodos": [_periodo(j) for j in range(4)],
+    }
+
+
+def _estatisticas(i):
+    return {
+        "totalTreinos": 120, "tempoTotal": 6000, "mediaTempoTreino": 50, "ultimaExecucao": DATA,
+        "semanas": [_periodo(j) for j in range(12)], "meses": [_periodo(j) for j in range(12)],
+    }
+
+
+def _aluno_resumo(i):
+    return {"id": f"ALN{i}", "nome": f"Aluno {i}", "avatar": None, "peso": 72.5, "altura": 1.75}
+
+
+MODELOS = [
+    (HistoricoMedida, _medida),
+    (Exercicio, _exercicio),
+    (UsuarioResponse, _usuario),
+    (TreinoResponse, _treino),
+    (AtribuicaoResponse, _atribuicao),
+    (AgendaItem, lambda i: {**_atribuicao(i), "treino": _treino(i)}),
+    (ExecucaoResponse, _execucao),
+    (PeriodoProgresso, _periodo),
+    (ProgressoResponse, _progresso),
+    (EstatisticasResponse, _estatisticas),
+    (AlunoResumo, _aluno_resumo),
+]
+
+
+def caminho_padrao(modelo, adapter, docs):
+    # O handler cria os modelos; o FastAPI faz dump, valida pelo response_model,
+    # serializa e codifica com json.dumps
+    objetos = [modelo(**doc) for doc in docs]
+    conteudo = [obj.model_dump() for obj in objetos]
+    validado = adapter.validate_python(conteudo)
+    saida = adapter.dump_python(validado, mode="json")
+    return json.dumps(saida, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def caminho_validar(modelo, adapter, docs):
+    validar = modelo.model_validate
+    return orjson.dumps([validar(doc).model_dump(mode="json") for doc in docs])
+
+
+def caminho_direto(modelo, adapter, docs):
+    return orjson.dumps(docs)
+
+
+CAMINHOS = [("padrao", caminho_padrao), ("validar", caminho_validar), ("direto", caminho_direto)]
+
+
+def medir(funcao, modelo, adapter, docs, repeticoes):
+    funcao(modelo, adapter, docs)  # aquecimento
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(modelo, adapter, docs)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor / len(docs) * 1e6  # µs por documento
+
+
+def executar(n_docs: int = 500, repeticoes: int = 5):
+    resultados = {}
+    for modelo, fabrica in MODELOS:
+        adapter = TypeAdapter(List[modelo])
+        docs = [fabrica(i) for i in range(n_docs)]
+        resultados[modelo.__name__] = {
+            nome: round(medir(funcao, modelo, adapter, docs, repeticoes), 2)
+            for nome, funcao in CAMINHOS
+        }
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="imprime o resultado em JSON")
+    args = parser.parse_args()
+
+    resultados = executar(args.docs, args.repeticoes)
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+        return
+
+    print(f"{'modelo':<22}{'padrao':>12}{'validar':>12}{'direto':>12}   µs/documento")
+    for nome, tempos in resultados.items():
+        ganho = tempos["padrao"] / tempos["validar"] if tempos["validar"] else 0
+        print(
+            f"{nome:<22}{tempos['padrao']:>12.2f}{tempos['validar']:>12.2f}{tempos['direto']:>12.2f}"
+            f"   ({ganho:.1f}x com validar)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Busca de alunos do personal por nome/email, sem acento e por prefixo.
+
+Cada usuário guarda campos derivados, recalculados em toda escrita de nome,
+email ou objetivo:
+
+    nomeBusca      nome normalizado (ordenação dos resultados)
+    chavesBusca    palavras normalizadas do nome e do email, além do email inteiro
+    objetivoBusca  objetivo normalizado
+
+Normalizar = remover acentos e caixa. A busca casa cada palavra digitada como
+prefixo de alguma chave (regex ancorada, que usa o índice multikey), então
+"jo sil" encontra "João da Silva"; uma busca com "@" é prefixo do email.
+
+Uso:
+    python busca.py indexar   # preenche os campos de busca dos usuários existentes
+"""
+import asyncio
+import logging
+import re
+import sys
+import unicodedata
+from typing import Optional
+
+from pymongo import ASCENDING, UpdateOne
+
+from database import usuarios_collection, atribuicoes_collection
+from paginacao import buscar_pagina
+
+logger = logging.getLogger(__name__)
+
+LIMITE_BUSCA = 50
+MAX_PALAVRAS = 5
+
+# Sempre termina em "id" para o cursor ser único
+ORDEM_BUSCA = [("nomeBusca", ASCENDING), ("id", ASCENDING)]
+
+CAMPOS_ORIGEM = ("nome", "email", "objetivo")
+
+
+def normalizar(texto: Optional[str]) -> str:
+    """Minúsculas, sem acentos e com espaços simples."""
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acento.casefold().split())
+
+
+def _palavras(texto: str) -> list:
+    return [p for p in re.split(r"[\W_]+", texto) if p]
+
+
+def campos_busca(usuario: dict) -> dict:
+    nome = normalizar(usuario.get("nome"))
+    email = normalizar(usuario.get("email"))
+    chaves = set(_palavras(nome))
+    if email:
+        chaves.add(email)
+        chaves.update(_palavras(email.split("@")[0]))
+    return {
+        "nomeBusca": nome,
+        "chavesBusca": sorted(chaves),
+        "objetivoBusca": normalizar(usuario.get("objetivo")),
+    }
+
+
+async def atualizar_campos_busca(id: str, dados: dict):
+    """Acrescenta a `dados` (um $set) os campos de busca, se ele altera nome, email ou objetivo."""
+    if not any(campo in dados for campo in CAMPOS_ORIGEM):
+        return
+    atual = await usuarios_collection.find_one({"id": id}, {"_id": 0, **{c: 1 for c in CAMPOS_ORIGEM}}) or {}
+    dados.update(campos_busca({**atual, **dados}))
+
+
+def filtro_busca(id_personal: str, q: Optional[str] = None, objetivo: Optional[str] = None) -> dict:
+    filtro = {"tipo": "aluno", "codigoPersonal": id_personal}
+
+    q = normalizar(q)
+    # Com "@" a busca é pelo email inteiro; senão, palavra por palavra
+    palavras = [q.replace(" ", "")] if "@" in q else _palavras(q)[:MAX_PALAVRAS]
+    if palavras:
+        filtro["chavesBusca"] = {"$all": [re.compile("^" + re.escape(p)) for p in palavras]}
+
+    objetivo = normalizar(objetivo)
+    if objetivo:
+        filtro["objetivoBusca"] = re.compile("^" + re.escape(objetivo))
+    return filtro
+
+
+async def buscar_alunos(
+    id_personal: str,
+    projecao: dict,
+    q: Optional[str] = None,
+    objetivo: Optional[str] = None,
+    ativo: Optional[bool] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """Retorna (alunos, cursor da próxima página ou None), cada aluno com `ativo`."""
+    # Coberto pelo índice idPersonal_status_idAluno
+    ativos = set(await atribuicoes_collection.distinct("idAluno", {"idPersonal": id_personal, "status": "ativo"}))
+
+    filtro = filtro_busca(id_personal, q, objetivo)
+    if ativo is not None:
+        filtro["id"] = {"$in" if ativo else "$nin": list(ativos)}
+
+    # O cursor precisa dos campos de ordenação, mesmo que a resposta não os tenha
+    docs, proximo = await buscar_pagina(
+        usuarios_collection,
+        filtro,
+        {**projecao, **{campo: 1 for campo, _ in ORDEM_BUSCA}},
+        ORDEM_BUSCA,
+        after,
+        limit or LIMITE_BUSCA,
+    )
+    for doc in docs:
+        doc.pop("nomeBusca", None)
+        doc["ativo"] = doc["id"] in ativos
+    return docs, proximo
+
+
+async def indexar_usuarios(tamanho_lote: int = 500):
+    """Preenche os campos de busca de todos os usuários (pode ser executada de novo)."""
+    total = 0
+    operacoes = []
+    async for usuario in usuarios_collection.find(
+        {}, {"_id": 0, "id": 1, **{c: 1 for c in CAMPOS_ORIGEM}}, batch_size=tamanho_lote
+    ):
+        operacoes.append(UpdateOne({"id": usuario["id"]}, {"$set": campos_busca(usuario)}))
+        if len(operacoes) >= tamanho_lote:
+            await usuarios_collection.bulk_write(operacoes, ordered=False)
+            total += len(operacoes)
+            operacoes = []
+    if operacoes:
+        await usuarios_collection.bulk_write(operacoes, ordered=False)
+        total += len(operacoes)
+
+    logger.info("Campos de busca preenchidos em %d usuários", total)
+    return {"usuarios": total}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["indexar"]:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(indexar_usuarios())
@@ -0,0 +1,274 @@
+"""Cache de leitura para treinos e usuários.
+
+Backends (CACHE_BACKEND):
+    memoria  LRU + TTL no próprio processo (padrão)
+    redis    qualquer servidor que fale o protocolo do Redis (REDIS_URL)
+    nenhum   desativa o cache
+
+Os handlers leem pelo cache e invalidam as chaves nas escritas. Os
+contadores de acerto/erro ficam em `estatisticas_caches()`.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_MAX = int(os.getenv("CACHE_MAX", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class LRUTTLCache:
+    """Cache em memória do processo com expiração (TTL) e descarte LRU.
+
+    Com `maxsize` ou `ttl` igual a zero o cache fica desativado e
+    `get` sempre retorna `None`.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._dados = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def ativo(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, chave):
+        if not self.ativo:
+            return None
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                self.misses += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def set(self, chave, valor):
+        if not self.ativo:
+            return
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + self.ttl, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.maxsize:
+                self._dados.popitem(last=False)
+
+    def delete(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def clear(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+# ==================== BACKENDS ====================
+
+class MemoriaBackend:
+    def __init__(self, maxsize: int = CACHE_MAX, ttl: float = CACHE_TTL):
+        self._cache = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, chave: str):
+        return self._cache.get(chave)
+
+    async def set(self, chave: str, valor):
+        self._cache.set(chave, valor)
+
+    async def delete(self, *chaves: str):
+        for chave in chaves:
+            self._cache.delete(chave)
+
+    def tamanho(self):
+        return len(self._cache)
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend:
+    """Cliente mínimo do protocolo RESP: apenas GET, SET ... EX e DEL.
+
+    Uma conexão por processo, com as chamadas serializadas. Falhas de rede
+    são tratadas como ausência no cache para nunca derrubar a requisição.
+    """
+
+    def __init__(self, url: str = REDIS_URL, ttl: float = CACHE_TTL, timeout: float = 0.5):
+        partes = urlparse(url)
+        self.host = partes.hostname or "localhost"
+        self.port = partes.port or 6379
+        self.senha = partes.password
+        self.db = int(partes.path.lstrip("/") or 0)
+        self.ttl = int(ttl)
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def _conectar(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        if self.senha:
+            await self._enviar("AUTH", self.senha)
+        if self.db:
+            await self._enviar("SELECT", str(self.db))
+
+    def _fechar(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _ler_resposta(self):
+        linha = await self._reader.readline()
+        if not linha:
+            raise ConnectionError("Conexão com o Redis encerrada")
+        tipo, conteudo = linha[:1], linha[1:-2]
+        if tipo == b"+":
+            return conteudo.decode()
+        if tipo == b"-":
+            raise RedisError(conteudo.decode())
+        if tipo == b":":
+            return int(conteudo)
+        if tipo == b"$":
+            tamanho = int(conteudo)
+            if tamanho == -1:
+                return None
+            dados = await self._reader.readexactly(tamanho + 2)
+            return dados[:-2]
+        if tipo == b"*":
+            tamanho = int(conteudo)
+            if tamanho == -1:
+                return None
+            return [await self._ler_resposta() for _ in range(tamanho)]
+        raise RedisError(f"Resposta inesperada: {linha!r}")
+
+    async def _enviar(self, *args):
+        partes = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            dados = arg if isinstance(arg, bytes) else str(arg).encode()
+            partes.append(f"${len(dados)}\r\n".encode() + dados + b"\r\n")
+        self._writer.write(b"".join(partes))
+        await self._writer.drain()
+        return await asyncio.wait_for(self._ler_resposta(), self.timeout)
+
+    async def comando(self, *args):
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self._conectar()
+                return await self._enviar(*args)
+            except (OSError, ConnectionError, RedisError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                logger.warning("Falha no cache Redis: %s", e)
+                self._fechar()
+                return None
+
+    async def get(self, chave: str):
+        dados = await self.comando("GET", chave)
+        return json.loads(dados) if dados is not None else None
+
+    async def set(self, chave: str, valor):
+        await self.comando("SET", chave, json.dumps(valor), "EX", self.ttl)
+
+    async def delete(self, *chaves: str):
+        if chaves:
+            await self.comando("DEL", *chaves)
+
+    def tamanho(self):
+        return None
+
+
+class NenhumBackend:
+    async def get(self, chave: str):
+        return None
+
+    async def set(self, chave: str, valor):
+        pass
+
+    async def delete(self, *chaves: str):
+        pass
+
+    def tamanho(self):
+        return 0
+
+
+def criar_backend(nome: str = CACHE_BACKEND):
+    if nome == "redis":
+        return RedisBackend()
+    if nome == "nenhum":
+        return NenhumBackend()
+    return MemoriaBackend()
+
+
+# ==================== CACHES ====================
+
+class Cache:
+    """Cache de um tipo de documento, com as chaves prefixadas por `namespace`."""
+
+    def __init__(self, namespace: str, backend):
+        self.namespace = namespace
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def _chave(self, chave: str) -> str:
+        return f"strongify:{self.namespace}:{chave}"
+
+    async def get(self, chave: str):
+        valor = await self.backend.get(self._chave(chave))
+        if valor is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return valor
+
+    async def set(self, chave: str, valor):
+        await self.backend.set(self._chave(chave), valor)
+
+    async def invalidar(self, *chaves: str):
+        await self.backend.delete(*(self._chave(c) for c in chaves))
+
+    def estatisticas(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_backend = criar_backend()
+
+treinos_cache = Cache("treino", _backend)
+listas_treinos_cache = Cache("treinos_personal", _backend)
+usuarios_cache = Cache("usuario", _backend)
+
+CACHES = [treinos_cache, listas_treinos_cache, usuarios_cache]
+
+
+def estatisticas_caches() -> dict:
+    return {
+        "backend": CACHE_BACKEND,
+        "tamanho": _backend.tamanho(),
+        "caches": {cache.namespace: cache.estatisticas() for cache in CACHES},
+    }
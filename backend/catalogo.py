@@ -0,0 +1,263 @@
+"""Catálogo de exercícios do personal, referenciado pelos treinos.
+
+Cada exercício do catálogo (`exercicios`) guarda o que é comum a todos os
+treinos: nome, observações e vídeos. O treino guarda só a referência e o que
+muda de um treino para outro:
+
+    {"id": "EX...", "idCatalogo": "EXC...", "series": 4, "repeticoes": "8-12",
+     "carga": 40, "descanso": 90}
+
+O `id` do item continua sendo o do exercício dentro do treino (é ele que as
+execuções e a progressão usam). A API continua recebendo e devolvendo
+exercícios completos: na escrita `catalogar` troca cada exercício pela
+referência (o catálogo é endereçado pelo conteúdo, então exercícios iguais
+do mesmo personal viram uma única entrada), e na leitura `resolver_exercicios`
+busca de uma vez as entradas de todos os treinos da resposta.
+
+Uso:
+    python catalogo.py migrar   # move os exercícios embutidos nos treinos para o catálogo
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import secrets
+import sys
+from datetime import datetime, timezone
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import exercicios_collection, treinos_collection
+from busca import normalizar
+from media import externalizar, externalizar_exercicios, externalizar_existente
+
+logger = logging.getLogger(__name__)
+
+# Campos do catálogo e campos que cada treino define
+CAMPOS_CATALOGO = ("nome", "observacoes", "videoUrl", "videoLocal")
+CAMPOS_TREINO = ("series", "repeticoes", "carga", "descanso")
+
+# Sempre termina em "id" para o cursor ser único
+ORDEM_CATALOGO = [("nomeBusca", ASCENDING), ("id", ASCENDING)]
+
+REMOVIDO = "Exercício removido"
+LOTE_STREAM = 100
+
+
+def _agora() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def novo_id() -> str:
+    return f"EXC{int(datetime.now().timestamp())}{secrets.token_hex(4)}"
+
+
+def chave_conteudo(exercicio: dict) -> str:
+    """Identifica exercícios iguais: nome sem acento/caixa, observações e vídeos."""
+    conteudo = [normalizar(exercicio.get("nome"))] + [exercicio.get(c) or "" for c in CAMPOS_CATALOGO[1:]]
+    return hashlib.sha1(json.dumps(conteudo, ensure_ascii=False).encode()).hexdigest()
+
+
+def documento_catalogo(id_personal: str, exercicio: dict, agora: str = None, id: str = None) -> dict:
+    agora = agora or _agora()
+    doc = {campo: exercicio.get(campo) for campo in CAMPOS_CATALOGO}
+    return {
+        "id": id or novo_id(),
+        "idPersonal": id_personal,
+        **doc,
+        "nomeBusca": normalizar(doc["nome"]),
+        "chave": chave_conteudo(doc),
+        "dataCriacao": agora,
+        "dataUltimaEdicao": agora,
+    }
+
+
+def referencia_treino(exercicio: dict, id_catalogo: str) -> dict:
+    return {"id": exercicio["id"], "idCatalogo": id_catalogo, **{c: exercicio.get(c) for c in CAMPOS_TREINO}}
+
+
+# ==================== ESCRITA ====================
+
+async def _ids_por_chave(id_personal: str, docs: list) -> dict:
+    """Garante as entradas (por personal e chave) e retorna {chave: id}."""
+    if not docs:
+        return {}
+    operacoes = [
+        UpdateOne({"idPersonal": id_personal, "chave": doc["chave"]}, {"$setOnInsert": doc}, upsert=True)
+        for doc in docs
+    ]
+    try:
+        await exercicios_collection.bulk_write(operacoes, ordered=False)
+    except BulkWriteError as erro:
+        # Outra requisição criou a mesma entrada ao mesmo tempo: basta ler a dela
+        if any(e.get("code") != 11000 for e in erro.details.get("writeErrors", [])):
+            raise
+    return {
+        doc["chave"]: doc["id"]
+        async for doc in exercicios_collection.find(
+            {"idPersonal": id_personal, "chave": {"$in": [d["chave"] for d in docs]}},
+            {"_id": 0, "id": 1, "chave": 1},
+        )
+    }
+
+
+async def catalogar(id_personal: str, exercicios: list) -> list:
+    """Troca os exercícios completos de um treino por referências ao catálogo do personal."""
+    exercicios = await externalizar_exercicios(exercicios)
+    agora = _agora()
+    novos = {}
+    for exercicio in exercicios:
+        doc = documento_catalogo(id_personal, exercicio, agora)
+        novos.setdefault(doc["chave"], doc)
+
+    ids = await _ids_por_chave(id_personal, list(novos.values()))
+    return [referencia_treino(ex, ids[chave_conteudo(ex)]) for ex in exercicios]
+
+
+async def criar_exercicio(id_personal: str, dados: dict) -> dict:
+    """Cria uma entrada no catálogo; se já houver uma igual, retorna a existente."""
+    dados = {**dados, "videoLocal": await externalizar(dados.get("videoLocal"))}
+    doc = documento_catalogo(id_personal, dados)
+    ids = await _ids_por_chave(id_personal, [doc])
+    return await exercicios_collection.find_one({"id": ids[doc["chave"]]}, {"_id": 0})
+
+
+async def atualizar_exercicio(id: str, id_personal: str, dados: dict):
+    """Edita uma entrada do catálogo; retorna o documento novo ou None se não existir.
+
+    Levanta DuplicateKeyError se a edição deixar a entrada igual a outra do catálogo.
+    """
+    atual = await exercicios_collection.find_one({"id": id, "idPersonal": id_personal}, {"_id": 0})
+    if not atual:
+        return None
+    novo = {**atual, **{c: v for c, v in dados.items() if c in CAMPOS_CATALOGO}}
+    novo["videoLocal"] = await externalizar(novo.get("videoLocal"))
+    novo.update(nomeBusca=normalizar(novo["nome"]), chave=chave_conteudo(novo), dataUltimaEdicao=_agora())
+
+    await exercicios_collection.update_one({"id": id}, {"$set": novo})
+    return novo
+
+
+async def treinos_com_exercicio(id: str, id_personal: str) -> list:
+    return await treinos_collection.distinct("id", {"idPersonal": id_personal, "exercicios.idCatalogo": id})
+
+
+async def remover_exercicio(id: str, id_personal: str) -> bool:
+    resultado = await exercicios_collection.delete_one({"id": id, "idPersonal": id_personal})
+    return resultado.deleted_count == 1
+
+
+# ==================== LEITURA ====================
+
+def filtro_catalogo(id_personal: str, q: str = None) -> dict:
+    filtro = {"idPersonal": id_personal}
+    q = normalizar(q)
+    if q:
+        filtro["nomeBusca"] = re.compile("^" + re.escape(q))
+    return filtro
+
+
+def _resolver_item(item: dict, catalogo: dict) -> dict:
+    if not item.get("idCatalogo"):
+        # Treino gravado antes do catálogo (ou ainda não migrado)
+        return item
+    entrada = catalogo.get(item["idCatalogo"]) or {"nome": REMOVIDO}
+    return {**{c: entrada.get(c) for c in CAMPOS_CATALOGO}, **item}
+
+
+async def resolver_exercicios(treinos: list) -> list:
+    """Completa os exercícios de vários treinos com uma única consulta ao catálogo (no lugar)."""
+    ids = {
+        item["idCatalogo"]
+        for treino in treinos
+        for item in treino.get("exercicios") or []
+        if item.get("idCatalogo")
+    }
+    if not ids:
+        return treinos
+
+    projecao = {"_id": 0, "id": 1, **{c: 1 for c in CAMPOS_CATALOGO}}
+    catalogo = {doc["id"]: doc async for doc in exercicios_collection.find({"id": {"$in": list(ids)}}, projecao)}
+    for treino in treinos:
+        if treino.get("exercicios"):
+            treino["exercicios"] = [_resolver_item(item, catalogo) for item in treino["exercicios"]]
+    return treinos
+
+
+async def resolver_stream(documentos, tamanho: int = LOTE_STREAM):
+    """Resolve um iterável assíncrono de treinos em lotes, para as respostas NDJSON."""
+    lote = []
+    async for doc in documentos:
+        lote.append(doc)
+        if len(lote) >= tamanho:
+            for treino in await resolver_exercicios(lote):
+                yield treino
+            lote = []
+    for treino in await resolver_exercicios(lote):
+        yield treino
+
+
+# ==================== MIGRAÇÃO ====================
+
+async def migrar_treinos(tamanho_lote: int = 200):
+    """Troca os exercícios embutidos por referências, um personal por vez.
+
+    Pode ser executada de novo: itens que já têm `idCatalogo` ficam como estão.
+    Os treinos não são carimbados para a sincronização, pois a resposta da API
+    não muda.
+    """
+    treinos = itens = 0
+    id_personal, pendentes = None, []
+
+    async def gravar(id_personal: str, lote: list):
+        embutidos = [ex for t in lote for ex in t["exercicios"] if not ex.get("idCatalogo")]
+        for ex in embutidos:
+            # Vídeo que não passa na validação de mídias fica inline, como estava
+            if ex.get("videoLocal"):
+                ex["videoLocal"] = await externalizar_existente(ex["videoLocal"])
+        docs = {}
+        for ex in embutidos:
+            doc = documento_catalogo(id_personal, ex)
+            docs.setdefault(doc["chave"], doc)
+        ids = await _ids_por_chave(id_personal, list(docs.values()))
+
+        operacoes = [
+            UpdateOne({"id": t["id"]}, {"$set": {"exercicios": [
+                ex if ex.get("idCatalogo") else referencia_treino(ex, ids[chave_conteudo(ex)])
+                for ex in t["exercicios"]
+            ]}})
+            for t in lote
+        ]
+        await treinos_collection.bulk_write(operacoes, ordered=False)
+        return len(embutidos)
+
+    async for treino in treinos_collection.find(
+        {"exercicios": {"$elemMatch": {"idCatalogo": {"$exists": False}}}},
+        {"_id": 0, "id": 1, "idPersonal": 1, "exercicios": 1},
+        sort=[("idPersonal", ASCENDING)],
+        batch_size=tamanho_lote,
+    ):
+        if pendentes and (treino["idPersonal"] != id_personal or len(pendentes) >= tamanho_lote):
+            itens += await gravar(id_personal, pendentes)
+            treinos += len(pendentes)
+            pendentes = []
+        id_personal = treino["idPersonal"]
+        pendentes.append(treino)
+
+    if pendentes:
+        itens += await gravar(id_personal, pendentes)
+        treinos += len(pendentes)
+
+    catalogo = await exercicios_collection.count_documents({})
+    logger.info("Catálogo migrado: %d exercícios de %d treinos; %d entradas no catálogo", itens, treinos, catalogo)
+    return {"treinos": treinos, "exercicios": itens, "catalogo": catalogo}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["migrar"]:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(migrar_treinos())
@@ -0,0 +1,69 @@
+"""GET condicional: ETag/Last-Modified e respostas 304 Not Modified."""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Response
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def gerar_etag(*partes) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in partes).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def _parse_iso(valor: Optional[str]) -> Optional[datetime]:
+    if not valor:
+        return None
+    try:
+        data = datetime.fromisoformat(valor)
+    except ValueError:
+        return None
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return data.astimezone(timezone.utc)
+
+
+def http_date(valor: Optional[str]) -> Optional[str]:
+    data = _parse_iso(valor)
+    return format_datetime(data, usegmt=True) if data else None
+
+
+def headers_versao(etag: str, ultima_modificacao: Optional[str] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    last_modified = http_date(ultima_modificacao)
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+def nao_modificado(
+    etag: str,
+    ultima_modificacao: Optional[str],
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+) -> bool:
+    # If-None-Match tem precedência sobre If-Modified-Since (RFC 9110)
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    data = _parse_iso(ultima_modificacao)
+    if if_modified_since and data:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            desde = desde.replace(tzinfo=timezone.utc)
+        # Last-Modified tem resolução de segundos
+        return data.replace(microsecond=0) <= desde
+
+    return False
+
+
+def resposta_304(etag: str, ultima_modificacao: Optional[str] = None) -> Response:
+    return Response(status_code=304, headers=headers_versao(etag, ultima_modificacao))
+
@@ -3,6 +3,8 @@ import os
 from dotenv import load_dotenv
 from pathlib import Path
 
+from metricas import ComandosMongo
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -13,7 +15,8 @@ db_name = os.getenv("DB_NAME", "test")
 #mongo_url = os.environ['MONGO_URL']
 #db_name = os.environ['DB_NAME']
 
-client = AsyncIOMotorClient(mongo_url)
+# O listener atribui tempo e contagem de comandos à requisição HTTP em andamento
+client = AsyncIOMotorClient(mongo_url, event_listeners=[ComandosMongo()])
 db = client[db_name]
 
 # Collections
@@ -21,6 +24,18 @@ usuarios_collection = db.usuarios
 treinos_collection = db.treinos
 atribuicoes_collection = db.atribuicoes
 execucoes_collection = db.execucoes
+execucoes_buckets_collection = db.execucoes_buckets
+execucoes_chaves_collection = db.execucoes_chaves
+estatisticas_aluno_collection = db.estatisticas_aluno
+estatisticas_personal_collection = db.estatisticas_personal
+medidas_collection = db.medidas
+progressao_exercicios_collection = db.progressao_exercicios
+exercicios_collection = db.exercicios
+contadores_collection = db.contadores
+remocoes_collection = db.remocoes
+eventos_collection = db.eventos
+tarefas_collection = db.tarefas
+tokens_revogados_collection = db.tokens_revogados
 
 async def close_db_connection():
     client.close()
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""Estatísticas materializadas por aluno e por personal.
+
+`registrar_execucao` é chamado a cada execução criada e atualiza os
+documentos com um update em pipeline (somas e máximo, mais a retirada dos
+períodos que saíram da janela), então a leitura do dashboard é um único find_one.
+
+Uso:
+    python estatisticas.py reconstruir           # recalcula tudo a partir de `execucoes`
+    python estatisticas.py reconstruir <idAluno> # recalcula apenas um aluno
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from database import (
+    usuarios_collection,
+    estatisticas_aluno_collection,
+    estatisticas_personal_collection,
+)
+from progresso import inicio_periodo, limites_periodos
+from execucoes import repositorio_execucoes
+
+logger = logging.getLogger(__name__)
+
+# Quantos períodos recentes são mantidos nos documentos
+RETENCAO = {"semana": 12, "mes": 12}
+CAMPOS_PERIODO = {"semana": "semanas", "mes": "meses"}
+
+
+def chave_periodo(inicio: datetime, granularidade: str) -> str:
+    if granularidade == "mes":
+        return inicio.strftime("%Y-%m")
+    return inicio.date().isoformat()
+
+
+def _parse_data(valor: str) -> datetime:
+    data = datetime.fromisoformat(valor)
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return data
+
+
+def _somar(campo: str, valor) -> dict:
+    return {"$add": [{"$ifNull": [f"${campo}", 0]}, valor]}
+
+
+def _update_execucao(execucao: dict, agora: datetime = None) -> list:
+    agora = agora or datetime.now(timezone.utc)
+    data = _parse_data(execucao["dataExecucao"])
+    duracao = execucao.get("duracao") or 0
+
+    totais = {
+        "totalTreinos": _somar("totalTreinos", 1),
+        "tempoTotal": _somar("tempoTotal", duracao),
+        "ultimaExecucao": {"$max": ["$ultimaExecucao", execucao["dataExecucao"]]},
+    }
+    periodos = {}
+    for granularidade, campo in CAMPOS_PERIODO.items():
+        # Tira todos os períodos anteriores à janela (as chaves ordenam como as datas)
+        primeiro = limites_periodos(granularidade, RETENCAO[granularidade], agora)[0]
+        totais[campo] = {"$arrayToObject": {"$filter": {
+            "input": {"$objectToArray": {"$ifNull": [f"${campo}", {}]}},
+            "cond": {"$gte": ["$$this.k", chave_periodo(primeiro, granularidade)]},
+        }}}
+        # Execução com data anterior à janela só entra nos totais, como na reconstrução
+        if data >= primeiro:
+            chave = chave_periodo(inicio_periodo(data, granularidade), granularidade)
+            periodos[f"{campo}.{chave}.treinos"] = _somar(f"{campo}.{chave}.treinos", 1)
+            periodos[f"{campo}.{chave}.tempoTotal"] = _somar(f"{campo}.{chave}.tempoTotal", duracao)
+
+    return [{"$set": totais}, {"$set": periodos}] if periodos else [{"$set": totais}]
+
+
+def _operacoes(execucao: dict, id_personal: str = None):
+    update = _update_execucao(execucao)
+
+    aluno_update = update + [{"$set": {"idPersonal": id_personal}}] if id_personal else update
+    aluno = UpdateOne({"idAluno": execucao["idAluno"]}, aluno_update, upsert=True)
+    personal = UpdateOne({"idPersonal": id_personal}, update, upsert=True) if id_personal else None
+    return aluno, personal
+
+
+async def registrar_execucao(execucao: dict, id_personal: str = None):
+    await registrar_execucoes([execucao], id_personal)
+
+
+async def registrar_execucoes(execucoes: list, id_personal: str = None):
+    """Aplica várias execuções com um bulk_write por coleção."""
+    ops_aluno, ops_personal = [], []
+    for execucao in execucoes:
+        aluno, personal = _operacoes(execucao, id_personal)
+        ops_aluno.append(aluno)
+        if personal:
+            ops_personal.append(personal)
+
+    if ops_aluno:
+        await estatisticas_aluno_collection.bulk_write(ops_aluno, ordered=False)
+    if ops_personal:
+        await estatisticas_personal_collection.bulk_write(ops_personal, ordered=False)
+
+
+def formatar_estatisticas(doc: dict, agora: datetime = None) -> dict:
+    """Converte o documento materializado para o formato de resposta."""
+    agora = agora or datetime.now(timezone.utc)
+    doc = doc or {}
+    total = doc.get("totalTreinos", 0)
+    tempo_total = doc.get("tempoTotal", 0)
+
+    resposta = {
+        "totalTreinos": total,
+        "tempoTotal": tempo_total,
+        "mediaTempoTreino": round(tempo_total / total) if total else 0,
+        "ultimaExecucao": doc.get("ultimaExecucao"),
+    }
+
+    for granularidade, campo in CAMPOS_PERIODO.items():
+        buckets = doc.get(campo) or {}
+        limites = limites_periodos(granularidade, RETENCAO[granularidade], agora)
+        periodos = []
+        for inicio, fim in zip(limites, limites[1:]):
+            bucket = buckets.get(chave_periodo(inicio, granularidade), {})
+            periodos.append({
+                "inicio": inicio.isoformat(),
+                "fim": fim.isoformat(),
+                "treinos": bucket.get("treinos", 0),
+                "tempoTotal": bucket.get("tempoTotal", 0),
+            })
+        resposta[campo] = periodos
+
+    return resposta
+
+
+# ==================== RECONSTRUÇÃO ====================
+
+class _Acumulador:
+    def __init__(self):
+        self.totalTreinos = 0
+        self.tempoTotal = 0
+        self.ultimaExecucao = None
+        self.periodos = {campo: {} for campo in CAMPOS_PERIODO.values()}
+
+    def adicionar(self, execucao: dict, agora: datetime):
+        data = _parse_data(execucao["dataExecucao"])
+        duracao = execucao.get("duracao") or 0
+        self.totalTreinos += 1
+        self.tempoTotal += duracao
+        if self.ultimaExecucao is None or execucao["dataExecucao"] > self.ultimaExecucao:
+            self.ultimaExecucao = execucao["dataExecucao"]
+
+        for granularidade, campo in CAMPOS_PERIODO.items():
+            primeiro = limites_periodos(granularidade, RETENCAO[granularidade], agora)[0]
+            if data < primeiro:
+                continue
+            chave = chave_periodo(inicio_periodo(data, granularidade), granularidade)
+            bucket = self.periodos[campo].setdefault(chave, {"treinos": 0, "tempoTotal": 0})
+            bucket["treinos"] += 1
+            bucket["tempoTotal"] += duracao
+
+    def documento(self) -> dict:
+        return {
+            "totalTreinos": self.totalTreinos,
+            "tempoTotal": self.tempoTotal,
+            "ultimaExecucao": self.ultimaExecucao,
+            **self.periodos,
+        }
+
+
+async def reconstruir_estatisticas(id_aluno: str = None):
+    """Recalcula os documentos de estatísticas a partir das execuções.
+
+    Percorre as execuções ordenadas por aluno, mantendo em memória apenas o
+    aluno atual e os acumuladores dos personals.
+    """
+    agora = datetime.now(timezone.utc)
+    filtro_alunos = {"tipo": "aluno"}
+    if id_aluno:
+        filtro_alunos["id"] = id_aluno
+    personal_do_aluno = {
+        u["id"]: u.get("codigoPersonal")
+        async for u in usuarios_collection.find(filtro_alunos, {"_id": 0, "id": 1, "codigoPersonal": 1})
+    }
+
+    cursor = repositorio_execucoes.iterar_por_aluno(id_aluno)
+
+    personais = {}
+    aluno_atual, acumulador = None, None
+    total_alunos = 0
+
+    async def gravar_aluno():
+        doc = acumulador.documento()
+        doc["idAluno"] = aluno_atual
+        doc["idPersonal"] = personal_do_aluno.get(aluno_atual)
+        await estatisticas_aluno_collection.replace_one({"idAluno": aluno_atual}, doc, upsert=True)
+
+    async for execucao in cursor:
+        if execucao["idAluno"] != aluno_atual:
+            if aluno_atual is not None:
+                await gravar_aluno()
+                total_alunos += 1
+            aluno_atual, acumulador = execucao["idAluno"], _Acumulador()
+        acumulador.adicionar(execucao, agora)
+
+        id_personal = personal_do_aluno.get(execucao["idAluno"])
+        if id_personal and not id_aluno:
+            personais.setdefault(id_personal, _Acumulador()).adicionar(execucao, agora)
+
+    if aluno_atual is not None:
+        await gravar_aluno()
+        total_alunos += 1
+    elif id_aluno:
+        # O aluno não tem mais execuções (foram removidas): nada a somar
+        await estatisticas_aluno_collection.delete_one({"idAluno": id_aluno})
+
+    # Reconstruir um único aluno não permite recalcular o rollup do personal
+    if not id_aluno:
+        for id_personal, acumulador_personal in personais.items():
+            doc = acumulador_personal.documento()
+            doc["idPersonal"] = id_personal
+            await estatisticas_personal_collection.replace_one({"idPersonal": id_personal}, doc, upsert=True)
+
+    logger.info("Estatísticas reconstruídas: %d alunos, %d personals", total_alunos, len(personais))
+    return {"alunos": total_alunos, "personais": 0 if id_aluno else len(personais)}
+
+
+async def reconstruir_personal(id_personal: str):
+    """Refaz o rollup do personal somando os documentos dos alunos dele.
+
+    Usado depois de remover execuções, quando não dá para desfazer os $inc/$max.
+    """
+    agora = datetime.now(timezone.utc)
+    primeiros = {
+        campo: chave_periodo(limites_periodos(granularidade, RETENCAO[granularidade], agora)[0], granularidade)
+        for granularidade, campo in CAMPOS_PERIODO.items()
+    }
+    acumulado = {"totalTreinos": 0, "tempoTotal": 0, "ultimaExecucao": None, **{c: {} for c in CAMPOS_PERIODO.values()}}
+    async for doc in estatisticas_aluno_collection.find({"idPersonal": id_personal}, {"_id": 0}):
+        acumulado["totalTreinos"] += doc.get("totalTreinos", 0)
+        acumulado["tempoTotal"] += doc.get("tempoTotal", 0)
+        if doc.get("ultimaExecucao") and doc["ultimaExecucao"] > (acumulado["ultimaExecucao"] or ""):
+            acumulado["ultimaExecucao"] = doc["ultimaExecucao"]
+        for campo in CAMPOS_PERIODO.values():
+            for chave, periodo in (doc.get(campo) or {}).items():
+                if chave < primeiros[campo]:
+                    continue
+                bucket = acumulado[campo].setdefault(chave, {"treinos": 0, "tempoTotal": 0})
+                bucket["treinos"] += periodo.get("treinos", 0)
+                bucket["tempoTotal"] += periodo.get("tempoTotal", 0)
+
+    acumulado["idPersonal"] = id_personal
+    await estatisticas_personal_collection.replace_one({"idPersonal": id_personal}, acumulado, upsert=True)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if not sys.argv[1:] or sys.argv[1] != "reconstruir":
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(reconstruir_estatisticas(*sys.argv[2:3]))
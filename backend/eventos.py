@@ -0,0 +1,210 @@
+"""Feed de eventos em tempo real (Server-Sent Events) em `/api/eventos`.
+
+Os handlers de escrita chamam `publicar(tipo, dados, escopos)` com um resumo
+pequeno do documento; cada conexão tem uma fila e recebe os eventos cujo
+`escopos` contém o id do usuário autenticado.
+
+Backends (EVENTOS_BACKEND):
+    memoria  fan-out no próprio processo (padrão; suficiente com um worker)
+    mongo    o evento é gravado em `eventos` e cada worker o recebe pelo
+             change stream da coleção (exige replica set), então conexões
+             em qualquer worker recebem eventos publicados em qualquer outro
+
+Uma conexão cuja fila enche (cliente lento) perde os eventos pendentes e
+recebe um `ressincronizar`: o cliente deve buscar o estado de novo, por
+exemplo com `/api/sync?since=`.
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+
+from fastapi.responses import StreamingResponse
+
+from database import eventos_collection
+from metricas import Contador, Medidor
+
+logger = logging.getLogger(__name__)
+
+EVENTOS_BACKEND = os.getenv("EVENTOS_BACKEND", "memoria")
+EVENTOS_FILA_MAX = int(os.getenv("EVENTOS_FILA_MAX", "100"))
+EVENTOS_HEARTBEAT_S = float(os.getenv("EVENTOS_HEARTBEAT_S", "15"))
+# Backend mongo: por quanto tempo os eventos ficam na coleção (índice TTL)
+EVENTOS_RETENCAO_S = int(os.getenv("EVENTOS_RETENCAO_S", "3600"))
+
+# Campos de cada tipo de documento que vão no evento
+CAMPOS_RESUMO = {
+    "usuario": ("id", "tipo", "nome", "email", "avatar", "peso", "altura", "objetivo", "codigoPersonal"),
+    "treino": ("id", "idPersonal", "nome", "tipo", "nivel", "duracao", "dataUltimaEdicao"),
+    "exercicio": ("id", "idPersonal", "nome", "dataUltimaEdicao"),
+    "atribuicao": ("id", "idAluno", "idTreino", "idPersonal", "status", "dataInicio", "dataFim", "diasSemana"),
+    "execucao": ("id", "idAluno", "idAtribuicao", "dataExecucao", "duracao"),
+}
+
+conexoes = Medidor("strongify_eventos_conexoes", "Conexões abertas em /api/eventos")
+publicados = Contador("strongify_eventos_publicados_total", "Eventos publicados", ("tipo",))
+descartados = Contador("strongify_eventos_descartados_total", "Eventos descartados por fila cheia")
+
+METRICAS = [conexoes, publicados, descartados]
+
+
+def resumo(tipo_documento: str, doc: dict) -> dict:
+    return {campo: doc[campo] for campo in CAMPOS_RESUMO[tipo_documento] if campo in doc}
+
+
+# ==================== FAN-OUT ====================
+
+class Assinatura:
+    def __init__(self, id_usuario: str):
+        self.id_usuario = id_usuario
+        self.fila = asyncio.Queue(maxsize=EVENTOS_FILA_MAX)
+
+    def entregar(self, evento: dict):
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Em vez de bloquear quem publica, troca o que estava pendente por um aviso
+            descartados.inc(valor=self.fila.qsize())
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait({"id": uuid.uuid4().hex, "tipo": "ressincronizar", "dados": {}})
+
+
+class Barramento:
+    """Assinaturas do processo, indexadas pelo id do usuário.
+
+    Módulos do próprio servidor também podem `ouvir` um tipo de evento (sem
+    escopos, o evento não vai a nenhuma conexão), p. ex. a revogação de tokens.
+    """
+
+    def __init__(self):
+        self._assinaturas = {}
+        self._ouvintes = {}
+
+    def ouvir(self, tipo: str, funcao):
+        """`funcao(dados)` é chamada, no processo, a cada evento `tipo` publicado em qualquer worker."""
+        self._ouvintes.setdefault(tipo, []).append(funcao)
+
+    def assinar(self, id_usuario: str) -> Assinatura:
+        assinatura = Assinatura(id_usuario)
+        self._assinaturas.setdefault(id_usuario, set()).add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura: Assinatura):
+        assinaturas = self._assinaturas.get(assinatura.id_usuario)
+        if assinaturas is not None:
+            assinaturas.discard(assinatura)
+            if not assinaturas:
+                del self._assinaturas[assinatura.id_usuario]
+
+    def distribuir(self, evento: dict):
+        publico = {campo: evento[campo] for campo in ("id", "tipo", "dados", "em")}
+        for funcao in self._ouvintes.get(evento["tipo"], ()):
+            try:
+                funcao(evento["dados"])
+            except Exception:
+                logger.exception("Falha no ouvinte de %s", evento["tipo"])
+        for escopo in evento["escopos"]:
+            for assinatura in list(self._assinaturas.get(escopo, ())):
+                assinatura.entregar(publico)
+
+
+barramento = Barramento()
+
+
+async def publicar(tipo: str, dados: dict, escopos: list):
+    """Publica um evento para os usuários em `escopos`. Nunca falha a escrita que o originou."""
+    evento = {
+        "id": uuid.uuid4().hex,
+        "tipo": tipo,
+        "dados": dados,
+        "escopos": sorted({e for e in escopos if e}),
+        "em": datetime.now(timezone.utc).isoformat(),
+    }
+    publicados.inc(tipo)
+    if EVENTOS_BACKEND != "mongo":
+        barramento.distribuir(evento)
+        return
+    try:
+        await eventos_collection.insert_one({**evento, "criadoEm": datetime.now(timezone.utc)})
+    except Exception:
+        logger.exception("Falha ao publicar o evento %s", tipo)
+
+
+# ==================== CHANGE STREAM ====================
+
+_tarefa = None
+
+
+async def _acompanhar():
+    """Repassa ao barramento local os eventos gravados por qualquer worker."""
+    retomar = None
+    while True:
+        try:
+            async with eventos_collection.watch(
+                [{"$match": {"operationType": "insert"}}], resume_after=retomar
+            ) as stream:
+                async for mudanca in stream:
+                    retomar = stream.resume_token
+                    barramento.distribuir(mudanca["fullDocument"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Change stream de eventos interrompido; reconectando")
+            await asyncio.sleep(1)
+
+
+def iniciar():
+    global _tarefa
+    if EVENTOS_BACKEND == "mongo" and _tarefa is None:
+        _tarefa = asyncio.create_task(_acompanhar())
+
+
+async def encerrar():
+    global _tarefa
+    if _tarefa is not None:
+        _tarefa.cancel()
+        try:
+            await _tarefa
+        except asyncio.CancelledError:
+            pass
+        _tarefa = None
+
+
+# ==================== SSE ====================
+
+def _formatar(evento: dict) -> str:
+    return f"id: {evento['id']}\ndata: {json.dumps(evento, ensure_ascii=False, default=str)}\n\n"
+
+
+def stream_eventos(id_usuario: str, request) -> StreamingResponse:
+    async def gerar():
+        # A assinatura só existe enquanto o gerador roda: se a resposta nunca
+        # chegar a ser enviada (cliente desconectou antes), não fica nada no barramento
+        assinatura = barramento.assinar(id_usuario)
+        conexoes.inc()
+        try:
+            # `retry` ajusta o intervalo de reconexão do EventSource
+            yield "retry: 5000\n\n"
+            yield _formatar({"id": uuid.uuid4().hex, "tipo": "conectado", "dados": {}})
+            while True:
+                try:
+                    evento = await asyncio.wait_for(assinatura.fila.get(), EVENTOS_HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comentário SSE: mantém a conexão viva em proxies
+                    yield ": ping\n\n"
+                    continue
+                yield _formatar(evento)
+        finally:
+            conexoes.dec()
+            barramento.cancelar(assinatura)
+
+    return StreamingResponse(
+        gerar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
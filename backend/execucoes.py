@@ -0,0 +1,455 @@
+"""Repositório das execuções de treino, com dois formatos de armazenamento.
+
+EXECUCOES_ARMAZENAMENTO:
+    documentos  um documento por execução em `execucoes` (padrão)
+    buckets     execuções agrupadas por aluno e mês em `execucoes_buckets`,
+                até MAX_POR_BUCKET por documento, com resumo pré-calculado
+                (quantidade, tempoTotal, inicio, fim)
+
+As execuções são sempre lidas por aluno (ou atribuição) e por data; no
+formato em buckets uma listagem lê poucos documentos grandes em vez de
+muitos pequenos, e o índice tem uma entrada por bucket em vez de uma por
+execução. Os endpoints usam só a interface do repositório, então a resposta
+da API é a mesma nos dois formatos.
+
+Uso:
+    python execucoes.py migrar   # (re)constrói os buckets a partir de `execucoes`
+
+A migração refaz os buckets de cada aluno do zero: rode-a com o formato
+`documentos` ainda ativo e só então troque para `buckets`.
+"""
+import asyncio
+import logging
+import os
+import sys
+from bisect import insort
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database import execucoes_collection, execucoes_buckets_collection, execucoes_chaves_collection
+from lote import LOTE_REMOCAO, inserir_lote, remover_em_lotes, resultado
+from paginacao import LIMITE_PADRAO, buscar_pagina, codificar_cursor, decodificar_cursor, _aplicar_cursor
+
+logger = logging.getLogger(__name__)
+
+EXECUCOES_ARMAZENAMENTO = os.getenv("EXECUCOES_ARMAZENAMENTO", "documentos")
+MAX_POR_BUCKET = int(os.getenv("EXECUCOES_POR_BUCKET", "200"))
+
+# Sempre termina em "id" para o cursor ser único
+ORDEM_EXECUCAO = [("dataExecucao", DESCENDING), ("id", DESCENDING)]
+
+# Campo das execuções -> campo do bucket usado para achar os buckets
+# (`modificadoEm` do bucket é o maior entre as execuções, o que atende filtros $gte)
+CAMPOS_BUCKET = {"idAluno": "idAluno", "idAtribuicao": "atribuicoes", "modificadoEm": "modificadoEm"}
+
+
+def _chave(execucao: dict):
+    return execucao["dataExecucao"], execucao["id"]
+
+
+def _mes(execucao: dict) -> str:
+    return execucao["dataExecucao"][:7]  # ISO 8601: "YYYY-MM"
+
+
+def _projetar(doc: dict, projecao: dict) -> dict:
+    if not projecao:
+        return doc
+    return {campo: doc[campo] for campo, incluir in projecao.items() if incluir and campo in doc}
+
+
+class ExecucoesDocumentos:
+    """Um documento por execução (formato original)."""
+
+    nome = "documentos"
+    collection = execucoes_collection
+
+    async def inserir(self, execucao: dict):
+        await self.collection.insert_one(execucao)
+
+    async def inserir_lote(self, itens: list) -> dict:
+        return await inserir_lote(self.collection, itens, "idAluno")
+
+    async def pagina(self, filtro: dict, projecao: dict = None, after=None, limit=None):
+        return await buscar_pagina(self.collection, filtro, projecao, ORDEM_EXECUCAO, after, limit)
+
+    def iterar(self, filtro: dict, projecao: dict = None, after=None, limit=None):
+        cursor = self.collection.find(_aplicar_cursor(filtro, after, ORDEM_EXECUCAO), projecao).sort(ORDEM_EXECUCAO)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    def iterar_por_aluno(self, id_aluno: str = None):
+        """Execuções agrupadas por aluno (usado na reconstrução das estatísticas)."""
+        filtro = {"idAluno": id_aluno} if id_aluno else {}
+        return self.collection.find(
+            filtro, {"_id": 0, "idAluno": 1, "dataExecucao": 1, "duracao": 1}
+        ).sort([("idAluno", ASCENDING), ("dataExecucao", DESCENDING)])
+
+    def estagios_execucoes(self, filtro: dict) -> list:
+        """Estágios iniciais de um aggregate que produzem as execuções que casam com `filtro`."""
+        return [{"$match": filtro}]
+
+    def estagios_por_aluno(self, filtro: dict) -> list:
+        """Como `estagios_execucoes`, por aluno e da mais recente para a mais antiga.
+
+        O $sort é coberto pelo índice idAluno_dataExecucao_id, então não ordena em memória.
+        """
+        return [{"$match": filtro}, {"$sort": {"idAluno": ASCENDING, "dataExecucao": DESCENDING, "id": DESCENDING}}]
+
+    def remover(self, filtro: dict, tamanho: int = LOTE_REMOCAO, antes=None):
+        """Remove as execuções de `filtro` (idAluno e/ou idAtribuicao) em lotes; gera quantas saíram em cada um.
+
+        `antes` recebe as execuções de cada lote ({id, idAluno, idAtribuicao}) antes de elas saírem.
+        """
+        return remover_em_lotes(self.collection, filtro, tamanho, antes, ("id", "idAluno", "idAtribuicao"))
+
+    def pipeline_progresso(self, id_aluno: str, desde: str, facetas: dict) -> list:
+        """Pipeline com os totais do aluno e `facetas` aplicadas às execuções a partir de `desde`."""
+        return [
+            {"$match": {"idAluno": id_aluno}},
+            {"$facet": {
+                "totais": [
+                    {"$group": {
+                        "_id": None,
+                        "totalTreinos": {"$sum": 1},
+                        "tempoTotal": {"$sum": "$duracao"},
+                        "mediaTempoTreino": {"$avg": "$duracao"},
+                        "ultimaExecucao": {"$max": "$dataExecucao"},
+                    }},
+                ],
+                **{
+                    nome: [{"$match": {"dataExecucao": {"$gte": desde}}}] + estagios
+                    for nome, estagios in facetas.items()
+                },
+            }},
+        ]
+
+
+class ExecucoesBuckets:
+    """Execuções agrupadas em buckets por aluno e mês.
+
+    Formato do bucket:
+        {idAluno, mes, quantidade, tempoTotal, inicio, fim, atribuicoes: [...], execucoes: [...]}
+
+    Um mês pode ter mais de um bucket (quando enche, ou em escritas
+    concorrentes), por isso a leitura ordena as execuções intercalando os
+    buckets em vez de assumir que eles não se sobrepõem.
+    """
+
+    nome = "buckets"
+    collection = execucoes_buckets_collection
+
+    def _update(self, execucao: dict) -> UpdateOne:
+        # O filtro com quantidade < MAX faz o upsert abrir um bucket novo quando o atual enche
+        return UpdateOne(
+            {"idAluno": execucao["idAluno"], "mes": _mes(execucao), "quantidade": {"$lt": MAX_POR_BUCKET}},
+            {
+                "$push": {"execucoes": execucao},
+                "$inc": {"quantidade": 1, "tempoTotal": execucao.get("duracao") or 0},
+                "$min": {"inicio": execucao["dataExecucao"]},
+                "$max": {"fim": execucao["dataExecucao"], "modificadoEm": execucao.get("modificadoEm")},
+                "$addToSet": {"atribuicoes": execucao["idAtribuicao"]},
+            },
+            upsert=True,
+        )
+
+    async def inserir(self, execucao: dict):
+        await self.collection.bulk_write([self._update(execucao)])
+
+    async def inserir_lote(self, itens: list) -> dict:
+        """Mesma semântica de `lote.inserir_lote`.
+
+        Um índice único dentro de um array não impede repetições no mesmo
+        documento, então as chaves de idempotência ficam em `execucoes_chaves`
+        e são registradas antes das execuções.
+        """
+        com_chave = [(i, doc) for i, doc in itens if doc.get("chaveIdempotencia")]
+        resultados = await inserir_lote(
+            execucoes_chaves_collection,
+            [
+                (i, {"id": doc["id"], "idAluno": doc["idAluno"], "chaveIdempotencia": doc["chaveIdempotencia"]})
+                for i, doc in com_chave
+            ],
+            "idAluno",
+        )
+        novos = [(i, doc) for i, doc in itens if i not in resultados or resultados[i]["status"] == "criado"]
+        if not novos:
+            return resultados
+
+        try:
+            # Ordenado: cada upsert precisa ver a quantidade atualizada pelo anterior
+            await self.collection.bulk_write([self._update(doc) for _, doc in novos], ordered=True)
+        except BulkWriteError as e:
+            falha = e.details["writeErrors"][0]
+            for i, doc in novos[falha["index"]:]:
+                resultados[i] = resultado(i, "erro", erro=falha.get("errmsg"))
+            nao_gravadas = [doc["id"] for _, doc in novos[falha["index"]:] if doc.get("chaveIdempotencia")]
+            if nao_gravadas:
+                await execucoes_chaves_collection.delete_many({"id": {"$in": nao_gravadas}})
+
+        for i, doc in novos:
+            resultados.setdefault(i, resultado(i, "criado", id=doc["id"]))
+        return resultados
+
+    async def _execucoes(self, filtro: dict, after=None):
+        """Gera as execuções que atendem `filtro` na ORDEM_EXECUCAO, bucket a bucket.
+
+        Os buckets são lidos do mais recente (`fim`) para o mais antigo; uma
+        execução só é emitida quando nenhum bucket ainda não lido pode ter
+        uma execução posterior a ela.
+        """
+        filtro_bucket = {CAMPOS_BUCKET[campo]: valor for campo, valor in filtro.items()}
+        cursor_chave = None
+        if after:
+            cursor_chave = tuple(decodificar_cursor(after, ORDEM_EXECUCAO))
+            filtro_bucket["inicio"] = {"$lte": cursor_chave[0]}
+
+        pendentes = []  # (chave, sequência, execução) em ordem crescente; a mais recente fica no fim
+        sequencia = 0
+        async for bucket in self.collection.find(
+            filtro_bucket, {"_id": 0, "fim": 1, "execucoes": 1}
+        ).sort("fim", DESCENDING):
+            while pendentes and pendentes[-1][0][0] > bucket["fim"]:
+                yield pendentes.pop()[2]
+            for execucao in bucket["execucoes"]:
+                if any(execucao.get(campo) != valor for campo, valor in filtro.items()):
+                    continue
+                chave = _chave(execucao)
+                if cursor_chave is None or chave < cursor_chave:
+                    sequencia += 1
+                    insort(pendentes, (chave, sequencia, execucao))
+
+        while pendentes:
+            yield pendentes.pop()[2]
+
+    async def iterar(self, filtro: dict, projecao: dict = None, after=None, limit=None):
+        emitidas = 0
+        async for execucao in self._execucoes(filtro, after):
+            yield _projetar(execucao, projecao)
+            emitidas += 1
+            if limit and emitidas >= limit:
+                return
+
+    async def pagina(self, filtro: dict, projecao: dict = None, after=None, limit=None):
+        limit = limit or LIMITE_PADRAO
+        docs = []
+        async for execucao in self._execucoes(filtro, after):
+            docs.append(execucao)
+            if len(docs) > limit:
+                break
+
+        proximo = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            proximo = codificar_cursor(docs[-1], ORDEM_EXECUCAO)
+        return [_projetar(doc, projecao) for doc in docs], proximo
+
+    async def iterar_por_aluno(self, id_aluno: str = None):
+        filtro = {"idAluno": id_aluno} if id_aluno else {}
+        async for bucket in self.collection.find(
+            filtro,
+            {"_id": 0, "idAluno": 1, "execucoes.dataExecucao": 1, "execucoes.duracao": 1},
+        ).sort([("idAluno", ASCENDING), ("fim", DESCENDING)]):
+            for execucao in bucket["execucoes"]:
+                yield {"idAluno": bucket["idAluno"], **execucao}
+
+    async def remover(self, filtro: dict, tamanho: int = LOTE_REMOCAO, antes=None):
+        filtro_bucket = {CAMPOS_BUCKET[campo]: valor for campo, valor in filtro.items()}
+        projecao = {
+            "_id": 1, "quantidade": 1, "execucoes.id": 1, "execucoes.idAluno": 1, "execucoes.idAtribuicao": 1,
+        }
+        if "idAtribuicao" not in filtro:
+            # Por aluno: os buckets saem inteiros
+            while True:
+                lote = await self.collection.find(filtro_bucket, projecao).limit(tamanho).to_list(None)
+                if not lote:
+                    return
+                if antes:
+                    await antes([e for b in lote for e in b["execucoes"]])
+                await self.collection.delete_many({"_id": {"$in": [b["_id"] for b in lote]}})
+                yield sum(b["quantidade"] for b in lote)
+
+        # Por atribuição: o bucket pode ter execuções de outras atribuições, então
+        # só as execuções delas saem e o resumo é recalculado; buckets vazios são apagados
+        valor = filtro["idAtribuicao"]
+        removidas = valor["$in"] if isinstance(valor, dict) else [valor]
+        recalcular = [
+            {"$set": {"execucoes": {"$filter": {
+                "input": "$execucoes",
+                "cond": {"$not": [{"$in": ["$$this.idAtribuicao", removidas]}]},
+            }}}},
+            {"$set": {
+                "quantidade": {"$size": "$execucoes"},
+                "tempoTotal": {"$sum": "$execucoes.duracao"},
+                "inicio": {"$min": "$execucoes.dataExecucao"},
+                "fim": {"$max": "$execucoes.dataExecucao"},
+                "atribuicoes": {"$setDifference": ["$atribuicoes", removidas]},
+            }},
+        ]
+        while True:
+            lote = await self.collection.find(filtro_bucket, projecao).limit(tamanho).to_list(None)
+            if not lote:
+                return
+            if antes:
+                await antes([e for b in lote for e in b["execucoes"] if e["idAtribuicao"] in removidas])
+            ids = [b["_id"] for b in lote]
+            await self.collection.update_many({"_id": {"$in": ids}}, recalcular)
+            restantes = {b["_id"]: b["quantidade"] async for b in self.collection.find({"_id": {"$in": ids}}, {"quantidade": 1})}
+            await self.collection.delete_many({"_id": {"$in": ids}, "quantidade": 0})
+            yield sum(b["quantidade"] - restantes.get(b["_id"], 0) for b in lote)
+
+    def estagios_execucoes(self, filtro: dict) -> list:
+        filtro_bucket = {CAMPOS_BUCKET[campo]: valor for campo, valor in filtro.items() if campo != "dataExecucao"}
+        # Um intervalo de datas descarta os buckets que terminam antes ou começam depois dele
+        intervalo = filtro.get("dataExecucao")
+        if isinstance(intervalo, dict):
+            desde = intervalo.get("$gte", intervalo.get("$gt"))
+            ate = intervalo.get("$lte", intervalo.get("$lt"))
+            if desde is not None:
+                filtro_bucket["fim"] = {"$gte": desde}
+            if ate is not None:
+                filtro_bucket["inicio"] = {"$lte": ate}
+        return [
+            {"$match": filtro_bucket},
+            {"$unwind": "$execucoes"},
+            {"$replaceRoot": {"newRoot": "$execucoes"}},
+            {"$match": filtro},
+        ]
+
+    def estagios_por_aluno(self, filtro: dict) -> list:
+        """Como `estagios_execucoes`, por aluno e da mais recente para a mais antiga.
+
+        Um $sort depois do $unwind seria bloqueante (ordena o histórico inteiro
+        em memória ou em disco), então a ordem sai do índice idAluno_fim e cada
+        bucket é aberto do fim para o começo. Dentro do mesmo aluno a ordem é
+        aproximada: buckets do mesmo mês podem se sobrepor e uma execução
+        sincronizada com atraso fica na posição em que foi gravada.
+        """
+        match, *resto = self.estagios_execucoes(filtro)
+        return [
+            match,
+            {"$sort": {"idAluno": ASCENDING, "fim": DESCENDING}},
+            {"$set": {"execucoes": {"$reverseArray": "$execucoes"}}},
+            *resto,
+        ]
+
+    def pipeline_progresso(self, id_aluno: str, desde: str, facetas: dict) -> list:
+        # Os totais saem dos resumos dos buckets; só os buckets recentes são abertos
+        recentes = [
+            {"$match": {"fim": {"$gte": desde}}},
+            {"$unwind": "$execucoes"},
+            {"$replaceRoot": {"newRoot": "$execucoes"}},
+            {"$match": {"dataExecucao": {"$gte": desde}}},
+        ]
+        return [
+            {"$match": {"idAluno": id_aluno}},
+            {"$facet": {
+                "totais": [
+                    {"$group": {
+                        "_id": None,
+                        "totalTreinos": {"$sum": "$quantidade"},
+                        "tempoTotal": {"$sum": "$tempoTotal"},
+                        "ultimaExecucao": {"$max": "$fim"},
+                    }},
+                    {"$set": {"mediaTempoTreino": {"$cond": [
+                        {"$gt": ["$totalTreinos", 0]},
+                        {"$divide": ["$tempoTotal", "$totalTreinos"]},
+                        0,
+                    ]}}},
+                ],
+                **{nome: recentes + estagios for nome, estagios in facetas.items()},
+            }},
+        ]
+
+
+ARMAZENAMENTOS = {
+    ExecucoesDocumentos.nome: ExecucoesDocumentos,
+    ExecucoesBuckets.nome: ExecucoesBuckets,
+}
+
+
+def criar_repositorio(nome: str = EXECUCOES_ARMAZENAMENTO):
+    if nome not in ARMAZENAMENTOS:
+        raise ValueError(f"EXECUCOES_ARMAZENAMENTO inválido: {nome}")
+    return ARMAZENAMENTOS[nome]()
+
+
+repositorio_execucoes = criar_repositorio()
+
+
+# ==================== MIGRAÇÃO ====================
+
+def montar_buckets(id_aluno: str, execucoes: list) -> list:
+    """Agrupa as execuções de um aluno em buckets por mês com até MAX_POR_BUCKET cada."""
+    buckets = []
+    atual = None
+    for execucao in sorted(execucoes, key=_chave):
+        mes = _mes(execucao)
+        if atual is None or atual["mes"] != mes or atual["quantidade"] >= MAX_POR_BUCKET:
+            atual = {
+                "idAluno": id_aluno,
+                "mes": mes,
+                "quantidade": 0,
+                "tempoTotal": 0,
+                "inicio": execucao["dataExecucao"],
+                "fim": execucao["dataExecucao"],
+                "atribuicoes": [],
+                "execucoes": [],
+            }
+            buckets.append(atual)
+        atual["quantidade"] += 1
+        atual["tempoTotal"] += execucao.get("duracao") or 0
+        atual["fim"] = execucao["dataExecucao"]
+        if execucao.get("modificadoEm") and execucao["modificadoEm"] > atual.get("modificadoEm", ""):
+            atual["modificadoEm"] = execucao["modificadoEm"]
+        if execucao["idAtribuicao"] not in atual["atribuicoes"]:
+            atual["atribuicoes"].append(execucao["idAtribuicao"])
+        atual["execucoes"].append(execucao)
+    return buckets
+
+
+async def migrar_para_buckets():
+    """Reconstrói `execucoes_buckets` e `execucoes_chaves` a partir de `execucoes`.
+
+    Processa um aluno por vez (as execuções vêm ordenadas por aluno), então a
+    memória usada é a do histórico de um aluno.
+    """
+    alunos = buckets = 0
+
+    async def gravar(id_aluno, execucoes):
+        novos = montar_buckets(id_aluno, execucoes)
+        await execucoes_buckets_collection.delete_many({"idAluno": id_aluno})
+        await execucoes_buckets_collection.insert_many(novos)
+        chaves = [
+            {"id": e["id"], "idAluno": id_aluno, "chaveIdempotencia": e["chaveIdempotencia"]}
+            for e in execucoes if e.get("chaveIdempotencia")
+        ]
+        await execucoes_chaves_collection.delete_many({"idAluno": id_aluno})
+        if chaves:
+            await execucoes_chaves_collection.insert_many(chaves, ordered=False)
+        return len(novos)
+
+    aluno_atual, execucoes = None, []
+    async for execucao in execucoes_collection.find({}, {"_id": 0}).sort("idAluno", ASCENDING):
+        if execucao["idAluno"] != aluno_atual:
+            if aluno_atual is not None:
+                buckets += await gravar(aluno_atual, execucoes)
+                alunos += 1
+            aluno_atual, execucoes = execucao["idAluno"], []
+        execucoes.append(execucao)
+
+    if aluno_atual is not None:
+        buckets += await gravar(aluno_atual, execucoes)
+        alunos += 1
+
+    logger.info("Execuções migradas para buckets: %d alunos, %d buckets", alunos, buckets)
+    return {"alunos": alunos, "buckets": buckets}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["migrar"]:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(migrar_para_buckets())
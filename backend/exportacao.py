@@ -0,0 +1,284 @@
+"""Exportação do histórico de execuções dos alunos de um personal.
+
+`/api/personal/{id}/exportar?formato=csv|parquet&de=&ate=` lê as execuções
+de todos os alunos do personal num único cursor (pelo repositório, então
+funciona com documentos ou buckets) e gera uma linha por série: cada item de
+`exercicios` é achatado em (execução, exercício, série). As linhas são
+escritas em lotes de EXPORTACAO_LOTE, então a memória usada não depende do
+tamanho do histórico.
+
+    csv      texto UTF-8; com `Accept-Encoding: gzip` a resposta vai comprimida
+    parquet  um row group por lote (exige pyarrow; compressão zstd no arquivo)
+"""
+import csv
+import io
+import os
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from database import usuarios_collection, treinos_collection, exercicios_collection
+from execucoes import repositorio_execucoes
+from progressao import series_exercicio
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow é opcional; sem ele só há exportação em CSV
+    pa = None
+    pq = None
+
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "5000"))
+FORMATOS = ("csv", "parquet")
+
+
+# (coluna, tipo no Parquet)
+COLUNAS = [
+    ("idAluno", "string"),
+    ("aluno", "string"),
+    ("idExecucao", "string"),
+    ("idAtribuicao", "string"),
+    ("dataExecucao", "string"),
+    ("duracao", "int64"),
+    ("idExercicio", "string"),
+    ("exercicio", "string"),
+    ("serie", "int64"),
+    ("repeticoes", "int64"),
+    ("carga", "float64"),
+    ("observacoes", "string"),
+    ("dataConclusao", "string"),
+]
+NOMES_COLUNAS = [nome for nome, _ in COLUNAS]
+
+
+def _numero(valor) -> Optional[float]:
+    return valor if isinstance(valor, (int, float)) and not isinstance(valor, bool) else None
+
+
+def _real(valor) -> Optional[float]:
+    numero = _numero(valor)
+    return float(numero) if numero is not None else None
+
+
+def _inteiro(valor) -> Optional[int]:
+    numero = _numero(valor)
+    return int(numero) if numero is not None else None
+
+
+def _texto(valor) -> Optional[str]:
+    return valor if isinstance(valor, str) else None
+
+
+def intervalo_datas(de: Optional[str], ate: Optional[str]) -> dict:
+    """Filtro de `dataExecucao`; `ate` só com a data inclui o dia inteiro."""
+    intervalo = {}
+    for nome, valor in (("de", de), ("ate", ate)):
+        if not valor:
+            continue
+        try:
+            data = datetime.fromisoformat(valor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Parâmetro '{nome}' inválido")
+        if data.tzinfo is None:
+            data = data.replace(tzinfo=timezone.utc)
+        if nome == "de":
+            intervalo["$gte"] = data.astimezone(timezone.utc).isoformat()
+        elif len(valor) == 10:
+            intervalo["$lt"] = (data + timedelta(days=1)).astimezone(timezone.utc).isoformat()
+        else:
+            intervalo["$lte"] = data.astimezone(timezone.utc).isoformat()
+    return intervalo
+
+
+def linhas_execucao(execucao: dict, alunos: dict, exercicios: dict):
+    """Uma linha por série da execução (ou uma linha só, se não houver exercícios)."""
+    base = {
+        "idAluno": execucao.get("idAluno"),
+        "aluno": alunos.get(execucao.get("idAluno")),
+        "idExecucao": execucao.get("id"),
+        "idAtribuicao": execucao.get("idAtribuicao"),
+        "dataExecucao": execucao.get("dataExecucao"),
+        "duracao": _inteiro(execucao.get("duracao")),
+    }
+    vazia = True
+    for exercicio in execucao.get("exercicios") or []:
+        if not isinstance(exercicio, dict):
+            continue
+        id_exercicio = _texto(exercicio.get("idExercicio"))
+        for n, serie in enumerate(series_exercicio(exercicio), 1):
+            if not isinstance(serie, dict):
+                continue
+            vazia = False
+            yield {
+                **base,
+                "idExercicio": id_exercicio,
+                "exercicio": exercicios.get(id_exercicio),
+                "serie": _inteiro(serie.get("serie")) or n,
+                "repeticoes": _inteiro(serie.get("repeticoesFeit")),
+                "carga": _real(serie.get("cargaUtilizada")),
+                "observacoes": _texto(serie.get("observacoes")),
+                "dataConclusao": _texto(serie.get("dataConclusao")),
+            }
+    if vazia:
+        yield {**base, **{coluna: None for coluna in NOMES_COLUNAS if coluna not in base}}
+
+
+async def _nomes_alunos(id_personal: str) -> dict:
+    return {
+        doc["id"]: doc.get("nome")
+        async for doc in usuarios_collection.find(
+            {"tipo": "aluno", "codigoPersonal": id_personal}, {"_id": 0, "id": 1, "nome": 1}
+        )
+    }
+
+
+async def _nomes_exercicios(id_personal: str) -> dict:
+    """{id do item do treino: nome}, lendo dos treinos só as referências ao catálogo."""
+    nomes, catalogo = {}, {}
+    async for treino in treinos_collection.find(
+        {"idPersonal": id_personal},
+        {"_id": 0, "exercicios.id": 1, "exercicios.idCatalogo": 1, "exercicios.nome": 1},
+    ):
+        for item in treino.get("exercicios") or []:
+            if not item.get("id"):
+                continue
+            if item.get("idCatalogo"):
+                catalogo[item["id"]] = item["idCatalogo"]
+            else:
+                nomes[item["id"]] = item.get("nome")  # treino ainda não migrado para o catálogo
+
+    if catalogo:
+        nomes_catalogo = {
+            doc["id"]: doc.get("nome")
+            async for doc in exercicios_collection.find(
+                {"id": {"$in": list(set(catalogo.values()))}}, {"_id": 0, "id": 1, "nome": 1}
+            )
+        }
+        nomes.update({id_item: nomes_catalogo.get(id_catalogo) for id_item, id_catalogo in catalogo.items()})
+    return nomes
+
+
+async def _lotes(id_personal: str, intervalo: dict):
+    """Lotes de até EXPORTACAO_LOTE linhas, direto do cursor do Motor."""
+    alunos = await _nomes_alunos(id_personal)
+    exercicios = await _nomes_exercicios(id_personal)
+
+    filtro = {"idAluno": {"$in": list(alunos)}}
+    if intervalo:
+        filtro["dataExecucao"] = intervalo
+    pipeline = repositorio_execucoes.estagios_por_aluno(filtro) + [
+        {"$project": {"_id": 0, "id": 1, "idAluno": 1, "idAtribuicao": 1, "dataExecucao": 1, "duracao": 1, "exercicios": 1}},
+    ]
+
+    lote = []
+    async for execucao in repositorio_execucoes.collection.aggregate(
+        pipeline, allowDiskUse=True, batchSize=EXPORTACAO_LOTE
+    ):
+        lote.extend(linhas_execucao(execucao, alunos, exercicios))
+        if len(lote) >= EXPORTACAO_LOTE:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# ==================== FORMATOS ====================
+
+async def _csv(lotes):
+    cabecalho = io.StringIO()
+    csv.writer(cabecalho).writerow(NOMES_COLUNAS)
+    yield cabecalho.getvalue().encode()
+    async for lote in lotes:
+        buffer = io.StringIO()
+        escritor = csv.DictWriter(buffer, fieldnames=NOMES_COLUNAS)
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode()
+
+
+class _Saida:
+    """Arquivo só de escrita que acumula os bytes até serem retirados com `retirar`."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados) -> int:
+        self._buffer.extend(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def retirar(self) -> bytes:
+        dados = bytes(self._buffer)
+        self._buffer.clear()
+        return dados
+
+
+def _esquema():
+    return pa.schema([(nome, getattr(pa, tipo)()) for nome, tipo in COLUNAS])
+
+
+async def _parquet(lotes):
+    esquema = _esquema()
+    saida = _Saida()
+    escritor = pq.ParquetWriter(pa.PythonFile(saida, mode="w"), esquema, compression="zstd")
+    try:
+        async for lote in lotes:
+            colunas = {nome: [linha[nome] for linha in lote] for nome in NOMES_COLUNAS}
+            escritor.write_batch(pa.RecordBatch.from_pydict(colunas, schema=esquema))
+            yield saida.retirar()
+    finally:
+        # Grava o rodapé; sem lotes o arquivo fica só com o esquema
+        escritor.close()
+    yield saida.retirar()
+
+
+async def _gzip(partes):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for parte in partes:
+        comprimido = compressor.compress(parte)
+        if comprimido:
+            yield comprimido
+    yield compressor.flush()
+
+
+def aceita_gzip(accept_encoding: Optional[str]) -> bool:
+    return bool(accept_encoding) and "gzip" in accept_encoding.lower()
+
+
+def exportar_execucoes(
+    id_personal: str,
+    formato: str = "csv",
+    de: Optional[str] = None,
+    ate: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+) -> StreamingResponse:
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato inválido; use {' ou '.join(FORMATOS)}")
+    if formato == "parquet" and pa is None:
+        raise HTTPException(status_code=501, detail="Exportação em Parquet indisponível (pyarrow não instalado)")
+
+    lotes = _lotes(id_personal, intervalo_datas(de, ate))
+    nome_arquivo = f"execucoes-{id_personal}.{formato}"
+    headers = {"Content-Disposition": f'attachment; filename="{nome_arquivo}"', "Vary": "Accept-Encoding"}
+
+    if formato == "parquet":
+        return StreamingResponse(_parquet(lotes), media_type="application/vnd.apache.parquet", headers=headers)
+
+    conteudo = _csv(lotes)
+    if aceita_gzip(accept_encoding):
+        conteudo = _gzip(conteudo)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(conteudo, media_type="text/csv; charset=utf-8", headers=headers)
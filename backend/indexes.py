@@ -0,0 +1,262 @@
+"""Índices das coleções e verificação dos planos de consulta.
+
+Uso:
+    python indexes.py           # cria/garante os índices
+    python indexes.py --check   # roda explain() nas consultas e falha se houver COLLSCAN
+                                # ou ordenação em memória (SORT)
+"""
+import asyncio
+import logging
+import re
+import sys
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+from database import db
+from medidas import garantir_colecao as garantir_colecao_medidas
+from sincronizacao import SYNC_RETENCAO_DIAS
+from eventos import EVENTOS_RETENCAO_S
+from tarefas import TAREFAS_RETENCAO_DIAS
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "usuarios": [
+        IndexModel([("id", ASCENDING)], name="id_unico", unique=True),
+        IndexModel([("email", ASCENDING), ("tipo", ASCENDING)], name="email_tipo", unique=True),
+        IndexModel(
+            [("tipo", ASCENDING), ("codigoPersonal", ASCENDING), ("dataCriacao", DESCENDING), ("id", DESCENDING)],
+            name="tipo_codigoPersonal_dataCriacao_id",
+        ),
+        # Sincronização incremental (/api/sync)
+        IndexModel(
+            [("tipo", ASCENDING), ("codigoPersonal", ASCENDING), ("modificadoEm", ASCENDING)],
+            name="tipo_codigoPersonal_modificadoEm",
+        ),
+        # Busca de alunos (busca.py): sempre em ordem de nome, com ou sem `q`. O
+        # prefixo nas chaves é conferido nas entradas do índice, já na ordem da
+        # página, sem ordenação em memória
+        IndexModel(
+            [("tipo", ASCENDING), ("codigoPersonal", ASCENDING), ("nomeBusca", ASCENDING), ("id", ASCENDING),
+             ("chavesBusca", ASCENDING)],
+            name="tipo_codigoPersonal_nomeBusca_id_chavesBusca",
+        ),
+    ],
+    "treinos": [
+        IndexModel([("id", ASCENDING)], name="id_unico", unique=True),
+        IndexModel([("idPersonal", ASCENDING), ("dataCriacao", DESCENDING), ("id", DESCENDING)], name="idPersonal_dataCriacao_id"),
+        # Versão da lista de treinos (ETag) sem ler os documentos
+        IndexModel([("idPersonal", ASCENDING), ("dataUltimaEdicao", DESCENDING)], name="idPersonal_dataUltimaEdicao"),
+        IndexModel([("idPersonal", ASCENDING), ("modificadoEm", ASCENDING)], name="idPersonal_modificadoEm"),
+        # Treinos que usam uma entrada do catálogo
+        IndexModel([("idPersonal", ASCENDING), ("exercicios.idCatalogo", ASCENDING)], name="idPersonal_exercicios_idCatalogo"),
+    ],
+    "atribuicoes": [
+        IndexModel([("id", ASCENDING)], name="id_unico", unique=True),
+        IndexModel([("idAluno", ASCENDING), ("dataCriacao", DESCENDING), ("id", DESCENDING)], name="idAluno_dataCriacao_id"),
+        IndexModel([("idPersonal", ASCENDING), ("dataCriacao", DESCENDING), ("id", DESCENDING)], name="idPersonal_dataCriacao_id"),
+        IndexModel([("idPersonal", ASCENDING), ("status", ASCENDING), ("idAluno", ASCENDING)], name="idPersonal_status_idAluno"),
+        IndexModel([("idPersonal", ASCENDING), ("modificadoEm", ASCENDING)], name="idPersonal_modificadoEm"),
+        IndexModel([("idAluno", ASCENDING), ("modificadoEm", ASCENDING)], name="idAluno_modificadoEm"),
+        # Escopos da lápide do treino e remoção em cascata (manutencao.py)
+        IndexModel([("idTreino", ASCENDING)], name="idTreino"),
+        IndexModel(
+            [("idPersonal", ASCENDING), ("chaveIdempotencia", ASCENDING)],
+            name="idPersonal_chaveIdempotencia",
+            unique=True,
+            partialFilterExpression={"chaveIdempotencia": {"$type": "string"}},
+        ),
+    ],
+    "execucoes": [
+        IndexModel([("id", ASCENDING)], name="id_unico", unique=True),
+        IndexModel([("idAluno", ASCENDING), ("dataExecucao", DESCENDING), ("id", DESCENDING)], name="idAluno_dataExecucao_id"),
+        # Páginas da sincronização incremental (ORDEM_SYNC_DELTA)
+        IndexModel([("idAluno", ASCENDING), ("modificadoEm", ASCENDING), ("id", ASCENDING)], name="idAluno_modificadoEm_id"),
+        IndexModel([("idAtribuicao", ASCENDING), ("dataExecucao", DESCENDING), ("id", DESCENDING)], name="idAtribuicao_dataExecucao_id"),
+        IndexModel(
+            [("idAluno", ASCENDING), ("chaveIdempotencia", ASCENDING)],
+            name="idAluno_chaveIdempotencia",
+            unique=True,
+            partialFilterExpression={"chaveIdempotencia": {"$type": "string"}},
+        ),
+    ],
+    # Formato de execuções em buckets (EXECUCOES_ARMAZENAMENTO=buckets)
+    "execucoes_buckets": [
+        IndexModel([("idAluno", ASCENDING), ("fim", DESCENDING)], name="idAluno_fim"),
+        IndexModel([("atribuicoes", ASCENDING), ("fim", DESCENDING)], name="atribuicoes_fim"),
+        IndexModel([("idAluno", ASCENDING), ("modificadoEm", ASCENDING)], name="idAluno_modificadoEm"),
+    ],
+    "execucoes_chaves": [
+        IndexModel([("idAluno", ASCENDING), ("chaveIdempotencia", ASCENDING)], name="idAluno_chaveIdempotencia", unique=True),
+        IndexModel([("id", ASCENDING)], name="id"),
+    ],
+    "estatisticas_aluno": [
+        IndexModel([("idAluno", ASCENDING)], name="idAluno_unico", unique=True),
+    ],
+    "estatisticas_personal": [
+        IndexModel([("idPersonal", ASCENDING)], name="idPersonal_unico", unique=True),
+    ],
+    "midias": [
+        IndexModel([("id", ASCENDING)], name="id_unico", unique=True),
+    ],
+    "medidas": [
+        IndexModel([("idAluno", ASCENDING), ("data", ASCENDING)], name="idAluno_data"),
+    ],
+    # Catálogo de exercícios (catalogo.py); a chave de conteúdo deduplica por personal
+    "exercicios": [
+        IndexModel([("id", ASCENDING)], name="id_unico", unique=True),
+        IndexModel([("idPersonal", ASCENDING), ("chave", ASCENDING)], name="idPersonal_chave", unique=True),
+        IndexModel([("idPersonal", ASCENDING), ("nomeBusca", ASCENDING), ("id", ASCENDING)], name="idPersonal_nomeBusca_id"),
+    ],
+    "progressao_exercicios": [
+        IndexModel([("idAluno", ASCENDING), ("idExercicio", ASCENDING)], name="idAluno_idExercicio", unique=True),
+    ],
+    # Lápides das remoções para a sincronização; o TTL apaga as antigas
+    "remocoes": [
+        IndexModel([("escopos", ASCENDING), ("modificadoEm", ASCENDING)], name="escopos_modificadoEm"),
+        IndexModel([("removidoEm", ASCENDING)], name="removidoEm_ttl", expireAfterSeconds=SYNC_RETENCAO_DIAS * 86400),
+    ],
+    # Só usada com EVENTOS_BACKEND=mongo (os workers leem pelo change stream)
+    "eventos": [
+        IndexModel([("criadoEm", ASCENDING)], name="criadoEm_ttl", expireAfterSeconds=EVENTOS_RETENCAO_S),
+    ],
+    # Logout: uma revogação por token, apagada quando o token expiraria
+    "tokens_revogados": [
+        IndexModel([("expiraEm", ASCENDING)], name="expiraEm_ttl", expireAfterSeconds=0),
+    ],
+    "tarefas": [
+        IndexModel([("id", ASCENDING)], name="id_unico", unique=True),
+        IndexModel([("status", ASCENDING), ("executarEm", ASCENDING)], name="status_executarEm"),
+        IndexModel([("status", ASCENDING), ("bloqueadaAte", ASCENDING)], name="status_bloqueadaAte"),
+        # Só as encerradas têm concluidaEm; as pendentes nunca expiram
+        IndexModel([("concluidaEm", ASCENDING)], name="concluidaEm_ttl", expireAfterSeconds=TAREFAS_RETENCAO_DIAS * 86400),
+    ],
+}
+
+# Formato das consultas feitas pelos endpoints: (coleção, filtro, ordenação)
+QUERY_SHAPES = {
+    "get_current_user": ("usuarios", {"id": "X"}, None),
+    "get_current_user (revogação)": ("tokens_revogados", {"_id": "X"}, None),
+    "login": ("usuarios", {"email": "X", "tipo": "aluno"}, None),
+    "cadastro (email existente)": ("usuarios", {"email": "X"}, None),
+    "listar_alunos_personal": (
+        "usuarios", {"tipo": "aluno", "codigoPersonal": "X"}, [("dataCriacao", DESCENDING), ("id", DESCENDING)]
+    ),
+    "estatisticas_aluno": ("estatisticas_aluno", {"idAluno": "X"}, None),
+    "estatisticas_personal": ("estatisticas_personal", {"idPersonal": "X"}, None),
+    "progressao_exercicio": ("progressao_exercicios", {"idAluno": "X", "idExercicio": "X"}, None),
+    "download_midia": ("midias", {"id": "X"}, None),
+    "get_treino": ("treinos", {"id": "X"}, None),
+    "listar_treinos_personal": ("treinos", {"idPersonal": "X"}, [("dataCriacao", DESCENDING), ("id", DESCENDING)]),
+    "listar_catalogo_personal": ("exercicios", {"idPersonal": "X"}, [("nomeBusca", ASCENDING), ("id", ASCENDING)]),
+    "resolver_exercicios": ("exercicios", {"id": {"$in": ["X", "Y"]}}, None),
+    "treinos_com_exercicio": ("treinos", {"idPersonal": "X", "exercicios.idCatalogo": "X"}, None),
+    "listar_atribuicoes_aluno": ("atribuicoes", {"idAluno": "X"}, [("dataCriacao", DESCENDING), ("id", DESCENDING)]),
+    "listar_atribuicoes_personal": ("atribuicoes", {"idPersonal": "X"}, [("dataCriacao", DESCENDING), ("id", DESCENDING)]),
+    "agenda_aluno": ("atribuicoes", {"idAluno": "X", "status": "ativo"}, [("dataCriacao", DESCENDING), ("id", DESCENDING)]),
+    "buscar_alunos_personal": (
+        "usuarios",
+        {"tipo": "aluno", "codigoPersonal": "X", "chavesBusca": {"$all": [re.compile("^x")]}},
+        [("nomeBusca", ASCENDING), ("id", ASCENDING)],
+    ),
+    "buscar_alunos_personal (sem q)": (
+        "usuarios", {"tipo": "aluno", "codigoPersonal": "X"}, [("nomeBusca", ASCENDING), ("id", ASCENDING)]
+    ),
+    "resumo_personal (alunos ativos)": ("atribuicoes", {"idPersonal": "X", "status": "ativo"}, None),
+    "atualizar_atribuicao": ("atribuicoes", {"id": "X"}, None),
+    "listar_execucoes_aluno": ("execucoes", {"idAluno": "X"}, [("dataExecucao", DESCENDING), ("id", DESCENDING)]),
+    "listar_execucoes_atribuicao": ("execucoes", {"idAtribuicao": "X"}, [("dataExecucao", DESCENDING), ("id", DESCENDING)]),
+    "sync_alunos_personal": ("usuarios", {"tipo": "aluno", "codigoPersonal": "X", "modificadoEm": {"$gte": "X"}}, None),
+    "sync_treinos_personal": ("treinos", {"idPersonal": "X", "modificadoEm": {"$gte": "X"}}, None),
+    "sync_atribuicoes_aluno": ("atribuicoes", {"idAluno": "X", "modificadoEm": {"$gte": "X"}}, None),
+    "sync_execucoes_aluno": (
+        "execucoes", {"idAluno": "X", "modificadoEm": {"$gte": "X"}}, [("idAluno", ASCENDING), ("modificadoEm", ASCENDING), ("id", ASCENDING)]
+    ),
+    "sync_execucoes_aluno (completa)": (
+        "execucoes", {"idAluno": "X"}, [("idAluno", ASCENDING), ("dataExecucao", DESCENDING), ("id", DESCENDING)]
+    ),
+    "sync_remocoes": ("remocoes", {"escopos": "X", "modificadoEm": {"$gte": "X"}}, None),
+    "exportar_execucoes": (
+        "execucoes",
+        {"idAluno": {"$in": ["X", "Y"]}, "dataExecucao": {"$gte": "X"}},
+        [("idAluno", ASCENDING), ("dataExecucao", DESCENDING), ("id", DESCENDING)],
+    ),
+    "exportar_execucoes (buckets)": ("execucoes_buckets", {"idAluno": {"$in": ["X", "Y"]}, "fim": {"$gte": "X"}}, None),
+    "listar_execucoes_aluno (buckets)": ("execucoes_buckets", {"idAluno": "X"}, [("fim", DESCENDING)]),
+    "listar_execucoes_atribuicao (buckets)": ("execucoes_buckets", {"atribuicoes": "X"}, [("fim", DESCENDING)]),
+    "get_tarefa": ("tarefas", {"id": "X"}, None),
+    "pegar_tarefa": ("tarefas", {"status": "pendente", "executarEm": {"$lte": "X"}}, [("executarEm", ASCENDING)]),
+    "recuperar_tarefas": ("tarefas", {"status": "executando", "bloqueadaAte": {"$lt": "X"}}, None),
+    "remover_treino (atribuicoes)": ("atribuicoes", {"idTreino": {"$in": ["X", "Y"]}}, None),
+    "remover_aluno (chaves)": ("execucoes_chaves", {"idAluno": "X"}, None),
+    "remover_personal (treinos)": ("treinos", {"idPersonal": "X"}, None),
+    "remover_personal (exercicios)": ("exercicios", {"idPersonal": "X"}, None),
+}
+
+
+async def ensure_indexes() -> list:
+    """Cria os índices que faltam. Idempotente: índices iguais já existentes são mantidos.
+
+    Uma coleção que falha (p. ex. um índice com o mesmo nome e outra definição)
+    não impede as outras; retorna os nomes das coleções com falha.
+    """
+    # Precisa existir antes do create_indexes, que criaria uma coleção comum
+    await garantir_colecao_medidas()
+    falhas = []
+    for nome_colecao, modelos in INDEXES.items():
+        try:
+            nomes = await db[nome_colecao].create_indexes(modelos)
+        except PyMongoError:
+            logger.exception("Falha ao criar os índices de %s", nome_colecao)
+            falhas.append(nome_colecao)
+            continue
+        logger.info("Índices garantidos em %s: %s", nome_colecao, ", ".join(nomes))
+    return falhas
+
+
+def _stages(plano):
+    """Percorre o plano de execução e devolve todos os estágios encontrados."""
+    if isinstance(plano, dict):
+        if "stage" in plano:
+            yield plano["stage"]
+        for valor in plano.values():
+            yield from _stages(valor)
+    elif isinstance(plano, list):
+        for item in plano:
+            yield from _stages(item)
+
+
+async def check_query_plans():
+    """Roda explain() em cada formato de consulta e devolve os que não usam índice."""
+    falhas = []
+    for endpoint, (nome_colecao, filtro, ordenacao) in QUERY_SHAPES.items():
+        cursor = db[nome_colecao].find(filtro)
+        if ordenacao:
+            cursor = cursor.sort(ordenacao)
+        explicacao = await cursor.explain()
+        stages = set(_stages(explicacao.get("queryPlanner", {}).get("winningPlan", {})))
+        if "COLLSCAN" in stages or "SORT" in stages:
+            falhas.append((endpoint, sorted(stages)))
+    return falhas
+
+
+async def _main(argv):
+    falhas_indices = await ensure_indexes()
+    if falhas_indices:
+        print(f"FALHA ao criar índices em: {', '.join(falhas_indices)}")
+    if "--check" not in argv:
+        return 1 if falhas_indices else 0
+
+    falhas = await check_query_plans()
+    for endpoint, stages in falhas:
+        print(f"FALHA {endpoint}: {' > '.join(stages)}")
+    if falhas or falhas_indices:
+        return 1
+    print(f"OK: {len(QUERY_SHAPES)} consultas usam índice")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,105 @@
+"""Inserção em lote com chaves de idempotência.
+
+Cada item pode trazer uma `chaveIdempotencia` gerada pelo cliente. Um índice
+único parcial em (dono, chaveIdempotencia) faz com que reenvios do mesmo item
+falhem com chave duplicada; esses itens são reportados como "duplicado" com
+o id do documento original, em vez de criar uma cópia.
+
+`remover_em_lotes` faz o caminho inverso para remoções grandes: um
+delete_many por lote de _ids, para nenhuma operação segurar o banco por
+muito tempo.
+"""
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+MAX_LOTE = 500
+LOTE_REMOCAO = 1000
+
+DUPLICATE_KEY = 11000
+
+
+def resultado(indice: int, status: str, id: str = None, erro: str = None) -> dict:
+    return {"indice": indice, "status": status, "id": id, "erro": erro}
+
+
+def validar_itens(itens: list, modelo):
+    """Valida cada item separadamente; um item inválido não derruba o lote."""
+    validos, resultados = [], {}
+    for indice, item in enumerate(itens):
+        try:
+            validos.append((indice, modelo.model_validate(item)))
+        except ValidationError as e:
+            erros = "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            resultados[indice] = resultado(indice, "erro", erro=erros)
+    return validos, resultados
+
+
+async def inserir_lote(collection, itens: list, campo_dono: str) -> dict:
+    """Insere [(indice, documento)] com um único insert_many não ordenado.
+
+    Retorna {indice: resultado}. `campo_dono` é o campo que, junto com a
+    chave de idempotência, identifica o documento original em caso de reenvio.
+    """
+    resultados = {}
+    if not itens:
+        return resultados
+
+    duplicados = []
+    try:
+        await collection.insert_many([doc for _, doc in itens], ordered=False)
+    except BulkWriteError as e:
+        for erro in e.details.get("writeErrors", []):
+            indice, doc = itens[erro["index"]]
+            if erro.get("code") == DUPLICATE_KEY and doc.get("chaveIdempotencia"):
+                duplicados.append((indice, doc))
+            else:
+                resultados[indice] = resultado(indice, "erro", erro=erro.get("errmsg"))
+
+    if duplicados:
+        # Busca os originais de todos os duplicados de uma vez
+        chaves = [doc["chaveIdempotencia"] for _, doc in duplicados]
+        donos = list({doc[campo_dono] for _, doc in duplicados})
+        originais = {
+            (o[campo_dono], o["chaveIdempotencia"]): o["id"]
+            async for o in collection.find(
+                {campo_dono: {"$in": donos}, "chaveIdempotencia": {"$in": chaves}},
+                {"_id": 0, "id": 1, campo_dono: 1, "chaveIdempotencia": 1},
+            )
+        }
+        for indice, doc in duplicados:
+            id_original = originais.get((doc[campo_dono], doc["chaveIdempotencia"]))
+            resultados[indice] = resultado(indice, "duplicado", id=id_original)
+
+    for indice, doc in itens:
+        resultados.setdefault(indice, resultado(indice, "criado", id=doc["id"]))
+
+    return resultados
+
+
+def resumo_lote(resultados: dict) -> dict:
+    itens = [resultados[i] for i in sorted(resultados)]
+    return {
+        "criados": sum(1 for r in itens if r["status"] == "criado"),
+        "duplicados": sum(1 for r in itens if r["status"] == "duplicado"),
+        "erros": sum(1 for r in itens if r["status"] == "erro"),
+        "itens": itens,
+    }
+
+
+async def remover_em_lotes(collection, filtro: dict, tamanho: int = LOTE_REMOCAO, antes=None, campos=()):
+    """Apaga os documentos de `filtro` em lotes de `tamanho`; gera a quantidade apagada em cada lote.
+
+    `antes`, se dado, é aguardado com os documentos do lote (só `_id` e `campos`)
+    antes de apagá-los, p. ex. para deixar as lápides da sincronização.
+    """
+    projecao = {"_id": 1, **{campo: 1 for campo in campos}}
+    while True:
+        lote = [doc async for doc in collection.find(filtro, projecao).limit(tamanho)]
+        if not lote:
+            return
+        if antes:
+            await antes(lote)
+        resultado = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in lote]}})
+        yield resultado.deleted_count
@@ -0,0 +1,186 @@
+"""Tipos de tarefa em segundo plano: remoções em cascata e manutenção.
+
+A requisição de remoção apaga só o documento principal (usuário ou treino),
+deixa a lápide e enfileira a cascata; o que depende dele sai aqui, em lotes
+de CASCATA_LOTE com um delete_many cada, então a latência do DELETE não
+depende do tamanho do histórico.
+
+    remover_aluno     atribuições, execuções, chaves de idempotência, medidas,
+                      progressão e estatísticas do aluno; refaz o rollup do personal
+    remover_treino    atribuições do treino e as execuções delas; refaz as
+                      estatísticas e a progressão dos alunos afetados
+    remover_personal  treinos (com a cascata de cada um), catálogo e
+                      estatísticas do personal. Os alunos continuam cadastrados
+
+Cada passo pode ser repetido (o worker pode morrer no meio): as execuções
+saem antes das atribuições, para uma nova tentativa ainda achá-las, e cada
+lote deixa as lápides da sincronização antes de ser apagado.
+
+Manutenção (antes só pela linha de comando de cada módulo):
+    reconstruir_estatisticas, reconstruir_progressao  {"idAluno": opcional}
+    migrar_midias, migrar_catalogo, indexar_busca
+"""
+import os
+
+from database import (
+    usuarios_collection,
+    treinos_collection,
+    atribuicoes_collection,
+    execucoes_chaves_collection,
+    estatisticas_aluno_collection,
+    estatisticas_personal_collection,
+    progressao_exercicios_collection,
+    exercicios_collection,
+)
+from busca import indexar_usuarios
+from cache import treinos_cache, listas_treinos_cache
+from catalogo import migrar_treinos
+from estatisticas import reconstruir_estatisticas, reconstruir_personal
+from execucoes import repositorio_execucoes
+from lote import remover_em_lotes
+from media import migrar_midias_inline
+from medidas import remover_medidas
+from progressao import reconstruir_progressao
+from sincronizacao import registrar_remocoes
+from tarefas import tipo_tarefa
+
+CASCATA_LOTE = int(os.getenv("CASCATA_LOTE", "1000"))
+
+
+async def _remover(collection, filtro: dict, andamento, contadores: dict, nome: str):
+    async for quantidade in remover_em_lotes(collection, filtro, CASCATA_LOTE):
+        contadores[nome] = contadores.get(nome, 0) + quantidade
+        await andamento.registrar(**contadores)
+
+
+async def _remover_execucoes(filtro: dict, andamento, contadores: dict, personal_de):
+    """`personal_de(execucao)`: o personal que também recebe a lápide da execução."""
+    async def lapides(execucoes):
+        await registrar_remocoes("execucoes", [(e["id"], [e.get("idAluno"), personal_de(e)]) for e in execucoes])
+
+    async for quantidade in repositorio_execucoes.remover(filtro, CASCATA_LOTE, lapides):
+        contadores["execucoes"] = contadores.get("execucoes", 0) + quantidade
+        await andamento.registrar(**contadores)
+
+
+async def _remover_atribuicoes(filtro: dict, andamento, contadores: dict) -> set:
+    """Remove as atribuições de `filtro` e as execuções delas; retorna os alunos afetados."""
+    alunos = set()
+    while True:
+        lote = await atribuicoes_collection.find(
+            filtro, {"_id": 1, "id": 1, "idAluno": 1, "idPersonal": 1}
+        ).limit(CASCATA_LOTE).to_list(None)
+        if not lote:
+            return alunos
+        personais = {a["id"]: a.get("idPersonal") for a in lote}
+        await _remover_execucoes(
+            {"idAtribuicao": {"$in": list(personais)}}, andamento, contadores,
+            lambda execucao: personais.get(execucao.get("idAtribuicao")),
+        )
+        await registrar_remocoes("atribuicoes", [(a["id"], [a.get("idAluno"), a.get("idPersonal")]) for a in lote])
+        resultado = await atribuicoes_collection.delete_many({"_id": {"$in": [a["_id"] for a in lote]}})
+        alunos.update(a["idAluno"] for a in lote if a.get("idAluno"))
+        contadores["atribuicoes"] = contadores.get("atribuicoes", 0) + resultado.deleted_count
+        await andamento.registrar(**contadores)
+
+
+async def _reconstruir_alunos(alunos: set, andamento, contadores: dict):
+    for id_aluno in sorted(alunos):
+        await reconstruir_estatisticas(id_aluno)
+        await reconstruir_progressao(id_aluno)
+        contadores["alunosRecalculados"] = contadores.get("alunosRecalculados", 0) + 1
+        await andamento.registrar(**contadores)
+
+
+# ==================== REMOÇÕES EM CASCATA ====================
+
+@tipo_tarefa("remover_aluno")
+async def remover_aluno(parametros: dict, andamento) -> dict:
+    id_aluno = parametros["idAluno"]
+    contadores = {}
+    # Todas as execuções do aluno de uma vez; as atribuições já não terão nenhuma
+    await _remover_execucoes({"idAluno": id_aluno}, andamento, contadores, lambda execucao: parametros.get("idPersonal"))
+    await _remover_atribuicoes({"idAluno": id_aluno}, andamento, contadores)
+    await _remover(execucoes_chaves_collection, {"idAluno": id_aluno}, andamento, contadores, "chaves")
+    await _remover(progressao_exercicios_collection, {"idAluno": id_aluno}, andamento, contadores, "progressao")
+    # Coleção de séries temporais: a remoção é pelo metaField, num comando só
+    await remover_medidas(id_aluno)
+    await estatisticas_aluno_collection.delete_one({"idAluno": id_aluno})
+    if parametros.get("idPersonal"):
+        await reconstruir_personal(parametros["idPersonal"])
+    return contadores
+
+
+@tipo_tarefa("remover_treino")
+async def remover_treino(parametros: dict, andamento) -> dict:
+    contadores = {}
+    alunos = await _remover_atribuicoes({"idTreino": parametros["idTreino"]}, andamento, contadores)
+    await _reconstruir_alunos(alunos, andamento, contadores)
+    if alunos:
+        await reconstruir_personal(parametros["idPersonal"])
+    return contadores
+
+
+@tipo_tarefa("remover_personal")
+async def remover_personal(parametros: dict, andamento) -> dict:
+    id_personal = parametros["idPersonal"]
+    contadores = {}
+    alunos = set()
+    while True:
+        treinos = [
+            t["id"] async for t in treinos_collection.find({"idPersonal": id_personal}, {"_id": 0, "id": 1}).limit(CASCATA_LOTE)
+        ]
+        if not treinos:
+            break
+        escopos = await atribuicoes_collection.distinct("idAluno", {"idTreino": {"$in": treinos}})
+        alunos |= await _remover_atribuicoes({"idTreino": {"$in": treinos}}, andamento, contadores)
+        await registrar_remocoes("treinos", [(id, [id_personal, *escopos]) for id in treinos])
+        resultado = await treinos_collection.delete_many({"id": {"$in": treinos}, "idPersonal": id_personal})
+        await treinos_cache.invalidar(*treinos)
+        contadores["treinos"] = contadores.get("treinos", 0) + resultado.deleted_count
+        await andamento.registrar(**contadores)
+    await listas_treinos_cache.invalidar(id_personal)
+
+    # Atribuições que sobraram sem treino
+    alunos |= await _remover_atribuicoes({"idPersonal": id_personal}, andamento, contadores)
+    await _remover(exercicios_collection, {"idPersonal": id_personal}, andamento, contadores, "exercicios")
+    await _reconstruir_alunos(alunos, andamento, contadores)
+    await estatisticas_personal_collection.delete_one({"idPersonal": id_personal})
+    contadores["alunosMantidos"] = await usuarios_collection.count_documents(
+        {"tipo": "aluno", "codigoPersonal": id_personal}
+    )
+    return contadores
+
+
+def tipo_remocao_usuario(usuario: dict) -> tuple:
+    """(tipo, parametros) da cascata de um usuário removido."""
+    if usuario.get("tipo") == "personal":
+        return "remover_personal", {"idPersonal": usuario["id"]}
+    return "remover_aluno", {"idAluno": usuario["id"], "idPersonal": usuario.get("codigoPersonal")}
+
+
+# ==================== MANUTENÇÃO ====================
+
+@tipo_tarefa("reconstruir_estatisticas")
+async def tarefa_reconstruir_estatisticas(parametros: dict, andamento) -> dict:
+    return await reconstruir_estatisticas(parametros.get("idAluno"))
+
+
+@tipo_tarefa("reconstruir_progressao")
+async def tarefa_reconstruir_progressao(parametros: dict, andamento) -> dict:
+    return await reconstruir_progressao(parametros.get("idAluno"))
+
+
+@tipo_tarefa("migrar_midias")
+async def tarefa_migrar_midias(parametros: dict, andamento) -> dict:
+    return await migrar_midias_inline()
+
+
+@tipo_tarefa("migrar_catalogo")
+async def tarefa_migrar_catalogo(parametros: dict, andamento) -> dict:
+    return await migrar_treinos()
+
+
+@tipo_tarefa("indexar_busca")
+async def tarefa_indexar_busca(parametros: dict, andamento) -> dict:
+    return await indexar_usuarios()
@@ -0,0 +1,314 @@
+"""Armazenamento de mídias (avatares e vídeos) endereçado por conteúdo.
+
+Os documentos guardam apenas a referência `/api/midias/<sha256>`; os bytes
+ficam no sistema de arquivos local ou no GridFS (MEDIA_BACKEND).
+
+Só entram imagens e vídeos (sem SVG, que pode carregar script) de até
+MEDIA_TAMANHO_MAX_MB; o download é servido de modo que o navegador nunca
+interprete o conteúdo como página.
+
+Uso:
+    python media.py migrar   # extrai avatares e vídeos do catálogo base64 já gravados nos documentos
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+
+from cache import treinos_cache, listas_treinos_cache, usuarios_cache
+from database import db, usuarios_collection, treinos_collection, exercicios_collection
+from sincronizacao import carimbar
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+
+MEDIA_BACKEND = os.getenv("MEDIA_BACKEND", "local")  # 'local' ou 'gridfs'
+MEDIA_DIR = Path(os.getenv("MEDIA_DIR", str(ROOT_DIR / "media")))
+MEDIA_PREFIX = "/api/midias/"
+CHUNK_SIZE = 256 * 1024
+MEDIA_TAMANHO_MAX = int(float(os.getenv("MEDIA_TAMANHO_MAX_MB", "50")) * 1024 * 1024)
+TIPOS_PERMITIDOS = ("image/", "video/")
+TIPOS_BLOQUEADOS = {"image/svg+xml"}
+
+midias_collection = db.midias
+
+
+class LocalMediaStore:
+    def __init__(self, diretorio: Path):
+        self.diretorio = diretorio
+
+    def _caminho(self, id: str) -> Path:
+        return self.diretorio / id[:2] / id
+
+    async def exists(self, id: str) -> bool:
+        return self._caminho(id).exists()
+
+    async def put(self, id: str, arquivo):
+        destino = self._caminho(id)
+
+        def copiar():
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            # Grava em arquivo temporário e renomeia para nunca expor arquivo parcial
+            with tempfile.NamedTemporaryFile(dir=destino.parent, delete=False) as tmp:
+                shutil.copyfileobj(arquivo, tmp, CHUNK_SIZE)
+            os.replace(tmp.name, destino)
+
+        await asyncio.to_thread(copiar)
+
+    async def read(self, id: str, inicio: int, fim: int):
+        """Gera os bytes [inicio, fim] (inclusivo) em blocos de CHUNK_SIZE."""
+        arquivo = await asyncio.to_thread(open, self._caminho(id), "rb")
+        try:
+            await asyncio.to_thread(arquivo.seek, inicio)
+            restante = fim - inicio + 1
+            while restante > 0:
+                bloco = await asyncio.to_thread(arquivo.read, min(CHUNK_SIZE, restante))
+                if not bloco:
+                    break
+                restante -= len(bloco)
+                yield bloco
+        finally:
+            arquivo.close()
+
+
+class GridFSMediaStore:
+    def __init__(self, database):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name="midias_fs", chunk_size_bytes=CHUNK_SIZE)
+
+    async def exists(self, id: str) -> bool:
+        return await db.midias_fs.files.find_one({"filename": id}, {"_id": 1}) is not None
+
+    async def put(self, id: str, arquivo):
+        await self.bucket.upload_from_stream(id, arquivo)
+
+    async def read(self, id: str, inicio: int, fim: int):
+        stream = await self.bucket.open_download_stream_by_name(id)
+        stream.seek(inicio)
+        restante = fim - inicio + 1
+        while restante > 0:
+            bloco = await stream.read(min(CHUNK_SIZE, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            yield bloco
+
+
+def _criar_store():
+    if MEDIA_BACKEND == "gridfs":
+        return GridFSMediaStore(db)
+    return LocalMediaStore(MEDIA_DIR)
+
+
+store = _criar_store()
+
+
+def referencia(id: str) -> str:
+    return f"{MEDIA_PREFIX}{id}"
+
+
+def tipo_permitido(content_type: str) -> bool:
+    tipo = (content_type or "").split(";")[0].strip().lower()
+    return tipo.startswith(TIPOS_PERMITIDOS) and tipo not in TIPOS_BLOQUEADOS
+
+
+def _validar_tipo(content_type: str):
+    if not tipo_permitido(content_type):
+        raise HTTPException(status_code=415, detail="Tipo de mídia não permitido; envie uma imagem ou um vídeo")
+
+
+def _validar_tamanho(tamanho: int):
+    if tamanho > MEDIA_TAMANHO_MAX:
+        raise HTTPException(status_code=413, detail=f"Mídia maior que {MEDIA_TAMANHO_MAX // (1024 * 1024)} MB")
+
+
+async def _registrar(id: str, arquivo, tamanho: int, content_type: str) -> dict:
+    if not await store.exists(id):
+        arquivo.seek(0)
+        await store.put(id, arquivo)
+
+    midia = {
+        "id": id,
+        "contentType": content_type or "application/octet-stream",
+        "tamanho": tamanho,
+        "dataCriacao": datetime.now(timezone.utc).isoformat(),
+    }
+    await midias_collection.update_one({"id": id}, {"$setOnInsert": midia}, upsert=True)
+    midia["url"] = referencia(id)
+    return midia
+
+
+async def salvar_upload(upload) -> dict:
+    """Salva um UploadFile lendo em blocos, sem carregar o arquivo todo na memória."""
+    _validar_tipo(upload.content_type)
+    hasher = hashlib.sha256()
+    tamanho = 0
+    with tempfile.TemporaryFile() as tmp:
+        while True:
+            bloco = await upload.read(CHUNK_SIZE)
+            if not bloco:
+                break
+            tamanho += len(bloco)
+            _validar_tamanho(tamanho)
+            hasher.update(bloco)
+            tmp.write(bloco)
+        return await _registrar(hasher.hexdigest(), tmp, tamanho, upload.content_type)
+
+
+def _gravar_temporario(dados: bytes):
+    """Hash e arquivo temporário de `dados`; roda fora do event loop."""
+    tmp = tempfile.TemporaryFile()
+    tmp.write(dados)
+    return hashlib.sha256(dados).hexdigest(), tmp
+
+
+async def salvar_bytes(dados: bytes, content_type: str) -> dict:
+    _validar_tipo(content_type)
+    _validar_tamanho(len(dados))
+    id, tmp = await asyncio.to_thread(_gravar_temporario, dados)
+    with tmp:
+        return await _registrar(id, tmp, len(dados), content_type)
+
+
+async def buscar_midia(id: str):
+    return await midias_collection.find_one({"id": id}, {"_id": 0})
+
+
+def ler_intervalo(id: str, inicio: int, fim: int):
+    return store.read(id, inicio, fim)
+
+
+async def externalizar(valor):
+    """Troca um data URL base64 pela referência da mídia salva. Outros valores passam direto."""
+    if not isinstance(valor, str) or not valor.startswith("data:") or ";base64," not in valor:
+        return valor
+
+    cabecalho, conteudo = valor.split(",", 1)
+    content_type = cabecalho[len("data:"):].split(";")[0]
+    _validar_tipo(content_type)
+    # Estimativa pelo tamanho do base64, antes de decodificar
+    _validar_tamanho(len(conteudo) * 3 // 4 - conteudo.count("=", -2))
+    try:
+        # Vídeos de dezenas de MB: a decodificação não pode travar o event loop
+        dados = await asyncio.to_thread(base64.b64decode, conteudo)
+    except (binascii.Error, ValueError):
+        return valor
+
+    midia = await salvar_bytes(dados, content_type)
+    return midia["url"]
+
+
+async def externalizar_exercicios(exercicios):
+    for exercicio in exercicios or []:
+        if exercicio.get("videoLocal"):
+            exercicio["videoLocal"] = await externalizar(exercicio["videoLocal"])
+    return exercicios
+
+
+def intervalo_http(range_header: str, tamanho: int):
+    """Interpreta um cabeçalho Range de intervalo único.
+
+    Retorna (inicio, fim) inclusivo, None se não houver Range válido para
+    ignorar, ou levanta ValueError se o intervalo não puder ser satisfeito.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+
+    inicio_txt, _, fim_txt = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if inicio_txt == "":
+            # Sufixo: últimos N bytes
+            sufixo = int(fim_txt)
+            if sufixo <= 0:
+                raise ValueError("Intervalo inválido")
+            return max(tamanho - sufixo, 0), tamanho - 1
+        inicio = int(inicio_txt)
+        fim = int(fim_txt) if fim_txt else tamanho - 1
+    except ValueError:
+        raise ValueError("Intervalo inválido")
+
+    if inicio >= tamanho or inicio > fim:
+        raise ValueError("Intervalo inválido")
+    return inicio, min(fim, tamanho - 1)
+
+
+# ==================== MIGRAÇÃO ====================
+
+async def externalizar_existente(valor):
+    """Como `externalizar`, mas mantém no documento o que não é imagem nem vídeo ou passa do limite."""
+    try:
+        return await externalizar(valor)
+    except HTTPException as erro:
+        logger.warning("Mídia inline mantida no documento: %s", erro.detail)
+        return valor
+
+
+async def migrar_midias_inline(tamanho_lote: int = 100):
+    """Extrai avatares e vídeos base64 dos documentos para o armazenamento de mídias."""
+    usuarios = 0
+    async for usuario in usuarios_collection.find(
+        {"avatar": {"$regex": "^data:"}}, {"_id": 0, "id": 1, "avatar": 1}, batch_size=tamanho_lote
+    ):
+        avatar = await externalizar_existente(usuario["avatar"])
+        if avatar != usuario["avatar"]:
+            # Nova versão também para o ETag/Last-Modified, senão o cliente segue com o base64 (304)
+            atualizacao = {"avatar": avatar, "dataUltimaEdicao": datetime.now(timezone.utc).isoformat()}
+            await carimbar(atualizacao)
+            await usuarios_collection.update_one({"id": usuario["id"]}, {"$set": atualizacao})
+            await usuarios_cache.invalidar(usuario["id"])
+            usuarios += 1
+
+    # Os vídeos ficam no catálogo (catalogo.py); os treinos só têm a referência
+    from catalogo import chave_conteudo
+
+    exercicios = 0
+    async for exercicio in exercicios_collection.find(
+        {"videoLocal": {"$regex": "^data:"}}, {"_id": 0}, batch_size=tamanho_lote
+    ):
+        video = await externalizar_existente(exercicio["videoLocal"])
+        if video == exercicio["videoLocal"]:
+            continue
+        # A chave do catálogo inclui o vídeo
+        novo = {**exercicio, "videoLocal": video}
+        agora = datetime.now(timezone.utc).isoformat()
+        atualizacao = {"videoLocal": video, "chave": chave_conteudo(novo), "dataUltimaEdicao": agora}
+        try:
+            await exercicios_collection.update_one({"id": exercicio["id"]}, {"$set": atualizacao})
+        except DuplicateKeyError:
+            logger.warning("Exercício %s mantido com vídeo inline: já existe uma entrada igual no catálogo", exercicio["id"])
+            continue
+        exercicios += 1
+
+        # A resposta dos treinos que usam o exercício mudou: nova versão (ETag,
+        # cache e sincronização), como em atualizar_exercicio_catalogo
+        ids_treinos = await treinos_collection.distinct(
+            "id", {"idPersonal": exercicio["idPersonal"], "exercicios.idCatalogo": exercicio["id"]}
+        )
+        if ids_treinos:
+            versao = {"dataUltimaEdicao": agora}
+            await carimbar(versao)
+            await treinos_collection.update_many({"id": {"$in": ids_treinos}}, {"$set": versao})
+            await treinos_cache.invalidar(*ids_treinos)
+            await listas_treinos_cache.invalidar(exercicio["idPersonal"])
+
+    logger.info("Mídias migradas: %d usuários, %d exercícios do catálogo", usuarios, exercicios)
+    return {"usuarios": usuarios, "exercicios": exercicios}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["migrar"]:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(migrar_midias_inline())
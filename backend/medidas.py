@@ -0,0 +1,186 @@
+"""Histórico de medidas (peso/altura) dos alunos em uma coleção própria.
+
+Antes o histórico era um array `historicoMedidas` dentro do usuário, que
+crescia sem limite e era lido em toda busca de usuário. Agora cada medida é
+um documento em `medidas`, criada como coleção time-series (MongoDB 5.0+)
+com `idAluno` como metaField; o usuário guarda só o `peso`/`altura` atuais.
+
+Uso:
+    python medidas.py migrar   # move os arrays historicoMedidas existentes para a coleção
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+from pymongo import ASCENDING
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from database import db, usuarios_collection, medidas_collection
+from paginacao import codificar_cursor, decodificar_cursor
+
+logger = logging.getLogger(__name__)
+
+LIMITE_MEDIDAS = 1000
+
+# Medidas com a mesma data são desempatadas pelo _id
+ORDEM_MEDIDAS = [("data", ASCENDING), ("_id", ASCENDING)]
+
+
+def _parse_data(valor: str) -> datetime:
+    data = datetime.fromisoformat(valor)
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return data
+
+
+def _parse_parametro(valor: Optional[str], nome: str) -> Optional[datetime]:
+    if not valor:
+        return None
+    try:
+        return _parse_data(valor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Parâmetro '{nome}' inválido")
+
+
+def _iso(data: datetime) -> str:
+    # O Mongo devolve datas sem fuso (sempre UTC)
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return data.isoformat()
+
+
+def _filtro_cursor(cursor: str) -> dict:
+    """Medidas depois de (data, _id) do cursor; o cursor guarda os dois como texto."""
+    data, id = decodificar_cursor(cursor, ORDEM_MEDIDAS)
+    try:
+        data, id = _parse_data(data), ObjectId(id)
+    except (TypeError, ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return {"$or": [{"data": {"$gt": data}}, {"data": data, "_id": {"$gt": id}}]}
+
+
+async def garantir_colecao():
+    """Cria `medidas` como coleção time-series, se ainda não existir.
+
+    Em servidores sem suporte a time-series (MongoDB < 5.0) cai para uma
+    coleção comum; o índice (idAluno, data) de `indexes.py` atende os dois.
+    """
+    if medidas_collection.name in await db.list_collection_names():
+        return
+    try:
+        await db.create_collection(
+            medidas_collection.name,
+            timeseries={"timeField": "data", "metaField": "idAluno", "granularity": "hours"},
+        )
+    except CollectionInvalid:
+        pass  # criada por outro worker ao mesmo tempo
+    except OperationFailure as e:
+        logger.warning("Coleção time-series indisponível (%s); usando coleção comum", e)
+        await db.create_collection(medidas_collection.name)
+
+
+def documento_medida(id_aluno: str, peso: float, altura: float, data: str) -> dict:
+    data = _parse_data(data).astimezone(timezone.utc)
+    # O BSON guarda datas com precisão de milissegundos
+    data = data.replace(microsecond=data.microsecond // 1000 * 1000)
+    return {"idAluno": id_aluno, "data": data, "peso": peso, "altura": altura}
+
+
+async def registrar_medida(id_aluno: str, peso: float, altura: float, data: str):
+    await medidas_collection.insert_one(documento_medida(id_aluno, peso, altura, data))
+
+
+async def listar_medidas(
+    id_aluno: str,
+    de: Optional[str] = None,
+    ate: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+):
+    """Medidas em ordem cronológica, filtradas por intervalo [de, ate].
+
+    Retorna (medidas, cursor da próxima página ou None). O cursor é opaco,
+    como o das outras listagens, e guarda (data, _id) da última medida da
+    página, para medidas com a mesma data não se perderem entre páginas.
+    """
+    limit = limit or LIMITE_MEDIDAS
+    intervalo = {}
+    inicio = _parse_parametro(de, "de")
+    fim = _parse_parametro(ate, "ate")
+    if inicio:
+        intervalo["$gte"] = inicio
+    if fim:
+        intervalo["$lte"] = fim
+
+    filtro = {"idAluno": id_aluno}
+    if intervalo:
+        filtro["data"] = intervalo
+    if after:
+        filtro = {"$and": [filtro, _filtro_cursor(after)]}
+
+    docs = await medidas_collection.find(
+        filtro, {"_id": 1, "data": 1, "peso": 1, "altura": 1}
+    ).sort(ORDEM_MEDIDAS).limit(limit + 1).to_list(limit + 1)
+
+    proximo = None
+    if len(docs) > limit:
+        ultimo = docs[limit - 1]
+        proximo = codificar_cursor({"data": _iso(ultimo["data"]), "_id": str(ultimo["_id"])}, ORDEM_MEDIDAS)
+    medidas = [{"data": _iso(doc["data"]), "peso": doc["peso"], "altura": doc["altura"]} for doc in docs[:limit]]
+    return medidas, proximo
+
+
+async def remover_medidas(id_aluno: str):
+    await medidas_collection.delete_many({"idAluno": id_aluno})
+
+
+async def migrar_historico(tamanho_lote: int = 100):
+    """Move `historicoMedidas` de cada usuário para a coleção `medidas`.
+
+    Pode ser executada de novo após uma interrupção: medidas cuja data já
+    existe na coleção para o aluno não são duplicadas.
+    """
+    await garantir_colecao()
+
+    usuarios = medidas = 0
+    async for usuario in usuarios_collection.find(
+        {"historicoMedidas": {"$exists": True}},
+        {"_id": 0, "id": 1, "historicoMedidas": 1},
+        batch_size=tamanho_lote,
+    ):
+        docs = [
+            documento_medida(usuario["id"], m["peso"], m["altura"], m["data"])
+            for m in usuario.get("historicoMedidas") or []
+            if m.get("data") and m.get("peso") is not None and m.get("altura") is not None
+        ]
+        if docs:
+            existentes = {
+                _iso(doc["data"])
+                async for doc in medidas_collection.find(
+                    {"idAluno": usuario["id"], "data": {"$in": [d["data"] for d in docs]}},
+                    {"_id": 0, "data": 1},
+                )
+            }
+            novos = [d for d in docs if _iso(d["data"]) not in existentes]
+            if novos:
+                await medidas_collection.insert_many(novos, ordered=False)
+            medidas += len(novos)
+
+        await usuarios_collection.update_one({"id": usuario["id"]}, {"$unset": {"historicoMedidas": ""}})
+        usuarios += 1
+
+    logger.info("Histórico migrado: %d usuários, %d medidas", usuarios, medidas)
+    return {"usuarios": usuarios, "medidas": medidas}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ["migrar"]:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(migrar_historico())
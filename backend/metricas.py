@@ -0,0 +1,299 @@
+"""Instrumentação por requisição e por comando do MongoDB.
+
+- `MetricasMiddleware` mede cada requisição HTTP por rota (o template, não
+  a URL com ids) e status.
+- `ComandosMongo` é um `CommandListener` do pymongo registrado no cliente do
+  Motor; cada comando é contado globalmente e atribuído à requisição em
+  andamento através de um `ContextVar` (o Motor copia o contexto para as
+  threads onde o pymongo roda; tests/test_metricas_mongo.py cobre isso).
+  Comandos que o pymongo manda sozinho, fora de uma chamada (ex.: killCursors
+  de um cursor coletado), entram só nos totais.
+- `exportar()` gera o texto no formato do Prometheus servido em `/api/metrics`.
+
+Requisições acima de SLOW_REQUEST_MS (padrão 500) são registradas no log com
+o tempo gasto no Mongo, comando a comando.
+"""
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from threading import Lock
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+
+# Limites (em segundos) dos buckets dos histogramas
+BUCKETS_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_MONGO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+ROTA_DESCONHECIDA = "desconhecida"
+
+
+# ==================== PRIMITIVAS ====================
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, labels=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = labels
+        self._valores = defaultdict(float)
+        self._lock = Lock()
+
+    def inc(self, *valores_labels, valor: float = 1):
+        with self._lock:
+            self._valores[valores_labels] += valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for chave, valor in sorted(self._valores.items()):
+                linhas.append(f"{self.nome}{_labels(self.labels, chave)} {_numero(valor)}")
+        return linhas
+
+
+class Medidor:
+    """Gauge: valor que sobe e desce (ex.: requisições em andamento)."""
+
+    def __init__(self, nome: str, ajuda: str):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.valor = 0
+        self._lock = Lock()
+
+    def inc(self, valor: float = 1):
+        with self._lock:
+            self.valor += valor
+
+    def dec(self, valor: float = 1):
+        self.inc(-valor)
+
+    def exportar(self):
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} gauge", f"{self.nome} {_numero(self.valor)}"]
+
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, labels=(), buckets=BUCKETS_HTTP):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # chave dos labels -> [contagens por bucket (+Inf no fim), soma, total]
+        self._series = {}
+        self._lock = Lock()
+
+    def observar(self, valor: float, *valores_labels):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores_labels)
+            if serie is None:
+                serie = self._series[valores_labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = sorted((chave, [list(s[0]), s[1], s[2]]) for chave, s in self._series.items())
+        for chave, (contagens, soma, total) in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + ("+Inf",), contagens):
+                acumulado += contagem
+                le = limite if limite == "+Inf" else _numero(limite)
+                rotulos = _labels(self.labels + ("le",), chave + (le,))
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _labels(self.labels, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_numero(soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {total}")
+        return linhas
+
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if not float(valor).is_integer() else str(int(valor))
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(nomes, valores) -> str:
+    if not nomes:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)) + "}"
+
+
+# ==================== MÉTRICAS ====================
+
+requisicoes_total = Contador(
+    "strongify_http_requisicoes_total", "Requisições HTTP atendidas", ("metodo", "rota", "status")
+)
+requisicao_segundos = Histograma(
+    "strongify_http_requisicao_segundos", "Latência das requisições HTTP", ("metodo", "rota", "status")
+)
+requisicao_mongo_segundos = Histograma(
+    "strongify_http_requisicao_mongo_segundos",
+    "Tempo gasto em comandos do MongoDB por requisição HTTP",
+    ("metodo", "rota"),
+    buckets=BUCKETS_HTTP,
+)
+requisicao_mongo_comandos = Contador(
+    "strongify_http_requisicao_mongo_comandos_total",
+    "Comandos do MongoDB executados durante requisições HTTP",
+    ("metodo", "rota", "comando"),
+)
+em_andamento = Medidor("strongify_http_requisicoes_em_andamento", "Requisições HTTP em andamento")
+
+mongo_comandos_total = Contador(
+    "strongify_mongo_comandos_total", "Comandos enviados ao MongoDB", ("comando", "resultado")
+)
+mongo_comando_segundos = Histograma(
+    "strongify_mongo_comando_segundos", "Duração dos comandos do MongoDB", ("comando",), buckets=BUCKETS_MONGO
+)
+
+METRICAS = [
+    requisicoes_total,
+    requisicao_segundos,
+    requisicao_mongo_segundos,
+    requisicao_mongo_comandos,
+    em_andamento,
+    mongo_comandos_total,
+    mongo_comando_segundos,
+]
+
+
+# ==================== REQUISIÇÃO ATUAL ====================
+
+class MedicaoRequisicao:
+    """Comandos do Mongo executados durante uma requisição."""
+
+    def __init__(self):
+        self.comandos = defaultdict(lambda: [0, 0.0])  # comando -> [quantidade, segundos]
+        self._lock = Lock()
+
+    def registrar(self, comando: str, segundos: float):
+        with self._lock:
+            item = self.comandos[comando]
+            item[0] += 1
+            item[1] += segundos
+
+    @property
+    def total_segundos(self) -> float:
+        return sum(segundos for _, segundos in self.comandos.values())
+
+    @property
+    def total_comandos(self) -> int:
+        return sum(quantidade for quantidade, _ in self.comandos.values())
+
+    def resumo(self) -> str:
+        itens = sorted(self.comandos.items(), key=lambda item: item[1][1], reverse=True)
+        return ", ".join(f"{comando}={qtd} ({seg * 1000:.1f}ms)" for comando, (qtd, seg) in itens)
+
+
+_requisicao_atual: ContextVar = ContextVar("requisicao_atual", default=None)
+
+
+class ComandosMongo(monitoring.CommandListener):
+    """Conta e cronometra os comandos do MongoDB, atribuindo-os à requisição atual."""
+
+    def started(self, event):
+        pass
+
+    def _registrar(self, event, resultado: str):
+        segundos = event.duration_micros / 1_000_000
+        mongo_comandos_total.inc(event.command_name, resultado)
+        mongo_comando_segundos.observar(segundos, event.command_name)
+        medicao = _requisicao_atual.get()
+        if medicao is not None:
+            medicao.registrar(event.command_name, segundos)
+
+    def succeeded(self, event):
+        self._registrar(event, "sucesso")
+
+    def failed(self, event):
+        self._registrar(event, "falha")
+
+
+# ==================== MIDDLEWARE ====================
+
+class MetricasMiddleware:
+    """Middleware ASGI que mede cada requisição HTTP, incluindo o corpo em streaming."""
+
+    def __init__(self, app):
+        self.app = app
+        self._rotas = None
+
+    def _rota(self, scope) -> str:
+        # O router do Starlette grava o endpoint no scope; o template vem da rota dele
+        if self._rotas is None:
+            app = scope.get("app")
+            self._rotas = {
+                getattr(rota, "endpoint", None): rota.path
+                for rota in getattr(app, "routes", [])
+                if hasattr(rota, "path")
+            }
+        return self._rotas.get(scope.get("endpoint"), ROTA_DESCONHECIDA)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicao = MedicaoRequisicao()
+        token = _requisicao_atual.set(medicao)
+        status = 500
+        continua = False
+
+        async def send_com_status(message):
+            nonlocal status, continua
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Streams de eventos (SSE) ficam abertos por horas; não são "lentos"
+                continua = any(
+                    nome == b"content-type" and valor.startswith(b"text/event-stream")
+                    for nome, valor in message.get("headers", [])
+                )
+            await send(message)
+
+        em_andamento.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            duracao = time.perf_counter() - inicio
+            em_andamento.dec()
+            _requisicao_atual.reset(token)
+            self._registrar(scope, status, duracao, medicao, continua)
+
+    def _registrar(self, scope, status: int, duracao: float, medicao: MedicaoRequisicao, continua: bool = False):
+        metodo = scope["method"]
+        rota = self._rota(scope)
+        requisicoes_total.inc(metodo, rota, str(status))
+        requisicao_segundos.observar(duracao, metodo, rota, str(status))
+        requisicao_mongo_segundos.observar(medicao.total_segundos, metodo, rota)
+        for comando, (quantidade, _) in medicao.comandos.items():
+            requisicao_mongo_comandos.inc(metodo, rota, comando, valor=quantidade)
+
+        if duracao * 1000 >= SLOW_REQUEST_MS and not continua:
+            logger.warning(
+                "Requisição lenta: %s %s %s em %.1fms (mongo %.1fms em %d comandos%s)",
+                metodo,
+                scope["path"],
+                status,
+                duracao * 1000,
+                medicao.total_segundos * 1000,
+                medicao.total_comandos,
+                f": {medicao.resumo()}" if medicao.comandos else "",
+            )
+
+
+def exportar(extras=()) -> str:
+    """Texto no formato de exposição do Prometheus com todas as métricas."""
+    linhas = []
+    for metrica in list(METRICAS) + list(extras):
+        linhas.extend(metrica.exportar())
+    return "\n".join(linhas) + "\n"
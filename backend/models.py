@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, field_validator
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Modelos de Usuários
 class HistoricoMedida(BaseModel):
@@ -55,7 +55,6 @@ class UsuarioResponse(BaseModel):
     sexo: Optional[str] = None
     objetivo: Optional[str] = None
     restricoes: Optional[str] = None
-    historicoMedidas: Optional[List[HistoricoMedida]] = []
 
 class LoginRequest(BaseModel):
     email: str
@@ -77,6 +76,33 @@ class Exercicio(BaseModel):
     observacoes: Optional[str] = None
     videoUrl: Optional[str] = None
     videoLocal: Optional[str] = None
+    # Entrada do catálogo de onde vêm nome, observações e vídeos
+    idCatalogo: Optional[str] = None
+
+# Modelos do catálogo de exercícios
+class ExercicioCatalogoCreate(BaseModel):
+    nome: str
+    observacoes: Optional[str] = None
+    videoUrl: Optional[str] = None
+    videoLocal: Optional[str] = None
+
+class ExercicioCatalogoUpdate(BaseModel):
+    nome: Optional[str] = None
+    observacoes: Optional[str] = None
+    videoUrl: Optional[str] = None
+    videoLocal: Optional[str] = None
+
+class ExercicioCatalogoResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    id: str
+    idPersonal: str
+    nome: str
+    observacoes: Optional[str] = None
+    videoUrl: Optional[str] = None
+    videoLocal: Optional[str] = None
+    dataCriacao: str
+    dataUltimaEdicao: str
 
 # Modelos de Treino
 class TreinoCreate(BaseModel):
@@ -120,6 +146,9 @@ class AtribuicaoCreate(BaseModel):
     dataFim: Optional[str] = None
     diasSemana: List[str]
 
+class AtribuicaoLoteItem(AtribuicaoCreate):
+    chaveIdempotencia: Optional[str] = None
+
 class AtribuicaoResponse(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
@@ -133,6 +162,9 @@ class AtribuicaoResponse(BaseModel):
     status: str
     dataCriacao: str
 
+class AgendaItem(AtribuicaoResponse):
+    treino: Optional[TreinoResponse] = None
+
 # Modelos de Execução
 class ExercicioExecucao(BaseModel):
     idExercicio: str
@@ -146,6 +178,25 @@ class ExecucaoCreate(BaseModel):
     duracao: int
     exercicios: List[dict]
 
+class ExecucaoLoteItem(ExecucaoCreate):
+    chaveIdempotencia: Optional[str] = None
+    # Execuções registradas offline informam quando realmente aconteceram
+    dataExecucao: Optional[str] = None
+
+    @field_validator("dataExecucao")
+    @classmethod
+    def normalizar_data(cls, valor: Optional[str]) -> Optional[str]:
+        """ISO 8601 em UTC, o mesmo formato das datas geradas no servidor (a ordenação é pelo texto)."""
+        if valor is None:
+            return None
+        try:
+            data = datetime.fromisoformat(valor[:-1] + "+00:00" if valor.endswith("Z") else valor)
+        except ValueError:
+            raise ValueError("data inválida; use ISO 8601, p. ex. 2024-05-01T18:30:00+00:00")
+        if data.tzinfo is None:
+            data = data.replace(tzinfo=timezone.utc)
+        return data.astimezone(timezone.utc).isoformat()
+
 class ExecucaoResponse(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
@@ -156,7 +207,134 @@ class ExecucaoResponse(BaseModel):
     duracao: int
     exercicios: List[dict]
 
+# Modelos de Progresso
+class PeriodoProgresso(BaseModel):
+    inicio: str
+    fim: str
+    treinos: int
+    tempoTotal: int
+
+class ProgressoResponse(BaseModel):
+    totalTreinos: int
+    tempoTotal: int
+    mediaTempoTreino: int
+    ultimaSemana: int
+    ultimaExecucao: Optional[str] = None
+    granularidade: str
+    periodos: List[PeriodoProgresso]
+
+# Modelos de progressão por exercício
+class PontoProgressao(BaseModel):
+    data: str
+    carga: float
+    repeticoes: int
+    rm1: float
+
+class RecordeExercicio(BaseModel):
+    tipo: str  # 'carga', 'repeticoes' ou '1rm'
+    valor: float
+    anterior: float
+    data: str
+
+class ProgressaoExercicioResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    idAluno: str
+    idExercicio: str
+    totalSessoes: int
+    ultimaData: Optional[str] = None
+    ultimaCarga: Optional[float] = None
+    ultimasRepeticoes: Optional[int] = None
+    melhorCarga: Optional[float] = None
+    melhorCargaData: Optional[str] = None
+    melhorRepeticoes: Optional[int] = None
+    melhorRepeticoesData: Optional[str] = None
+    melhor1RM: Optional[float] = None
+    melhor1RMData: Optional[str] = None
+    historico: List[PontoProgressao]
+    recordes: List[RecordeExercicio]
+
+class EstatisticasResponse(BaseModel):
+    totalTreinos: int
+    tempoTotal: int
+    mediaTempoTreino: int
+    ultimaExecucao: Optional[str] = None
+    semanas: List[PeriodoProgresso]
+    meses: List[PeriodoProgresso]
+
+# Modelos de resumo do dashboard do personal
+class AlunoResumo(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    nome: str
+    avatar: Optional[str] = None
+    peso: Optional[float] = None
+    altura: Optional[float] = None
+
+# Resultado da busca de alunos (só o que a lista do personal mostra)
+class AlunoBusca(AlunoResumo):
+    email: Optional[str] = None
+    objetivo: Optional[str] = None
+    ativo: bool = False  # tem atribuição ativa com o personal
+
+class ResumoPersonalResponse(BaseModel):
+    totalAlunos: int
+    totalTreinos: int
+    alunosAtivos: int
+    alunosRecentes: List[AlunoResumo]
+
+# Modelos de operações em lote
+class LoteRequest(BaseModel):
+    itens: List[dict]
+
+class ResultadoLoteItem(BaseModel):
+    indice: int
+    status: str  # 'criado', 'duplicado' ou 'erro'
+    id: Optional[str] = None
+    erro: Optional[str] = None
+
+class LoteResponse(BaseModel):
+    criados: int
+    duplicados: int
+    erros: int
+    itens: List[ResultadoLoteItem]
+
 # Modelo para adicionar medida
 class AdicionarMedida(BaseModel):
     peso: float
-    altura: float
\ No newline at end of file
+    altura: float
+
+
+# Modelos de sincronização incremental
+class RemocaoSync(BaseModel):
+    colecao: str  # 'usuarios', 'treinos' ou 'atribuicoes'
+    id: str
+    versaoSync: int
+    modificadoEm: str
+
+class SyncResponse(BaseModel):
+    token: str
+    completo: bool  # True quando não houve token: o cliente deve substituir tudo o que tem
+    mais: bool = False  # há mais execuções: chamar de novo com o `token` desta resposta
+    usuarios: List[UsuarioResponse]
+    treinos: List[TreinoResponse]
+    atribuicoes: List[AtribuicaoResponse]
+    execucoes: List[ExecucaoResponse]
+    removidos: List[RemocaoSync]
+
+# Modelo das tarefas em segundo plano
+class TarefaResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    tipo: str
+    status: str  # 'pendente', 'executando', 'concluida' ou 'falhou'
+    tentativas: int
+    maxTentativas: int
+    progresso: dict = {}
+    resultado: Optional[dict] = None
+    erro: Optional[str] = None
+    criadaEm: datetime
+    executarEm: Optional[datetime] = None
+    concluidaEm: Optional[datetime] = None
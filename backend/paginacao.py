@@ -0,0 +1,123 @@
+"""Paginação por cursor (keyset) e streaming NDJSON para os endpoints de listagem.
+
+A ordenação sempre termina em `id`, que é único, então o cursor (os valores
+de ordenação do último documento da página) identifica uma posição exata.
+"""
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pymongo import DESCENDING
+
+from respostas import RESPOSTA_RAPIDA, orjson, serializar_documentos, responder
+
+LIMITE_PADRAO = 1000
+NDJSON = "application/x-ndjson"
+
+
+def codificar_cursor(doc: dict, ordenacao) -> str:
+    valores = [doc.get(campo) for campo, _ in ordenacao]
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, ordenacao) -> list:
+    """Valores de ordenação guardados no cursor."""
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(valores, list) or len(valores) != len(ordenacao):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return valores
+
+
+def filtro_cursor(cursor: str, ordenacao) -> dict:
+    """Filtro que seleciona os documentos posteriores ao cursor na ordenação dada."""
+    valores = decodificar_cursor(cursor, ordenacao)
+
+    # (a, b) depois de (va, vb)  <=>  a > va  ou  (a == va e b > vb)
+    condicoes = []
+    for i, (campo, direcao) in enumerate(ordenacao):
+        operador = "$lt" if direcao == DESCENDING else "$gt"
+        condicao = {c: v for (c, _), v in zip(ordenacao[:i], valores[:i])}
+        condicao[campo] = {operador: valores[i]}
+        condicoes.append(condicao)
+    return {"$or": condicoes}
+
+
+def _aplicar_cursor(filtro: dict, after: Optional[str], ordenacao) -> dict:
+    if not after:
+        return filtro
+    return {"$and": [filtro, filtro_cursor(after, ordenacao)]}
+
+
+def quer_ndjson(accept: Optional[str]) -> bool:
+    return bool(accept) and NDJSON in accept
+
+
+def stream_documentos(documentos, modelo):
+    """Resposta NDJSON a partir de qualquer iterável assíncrono de documentos."""
+
+    async def gerar():
+        async for doc in documentos:
+            if RESPOSTA_RAPIDA == "direto":
+                yield orjson.dumps(doc) + b"\n"
+            else:
+                yield modelo.model_validate(doc).model_dump_json() + "\n"
+
+    return StreamingResponse(gerar(), media_type=NDJSON)
+
+
+def stream_ndjson(collection, filtro, projecao, ordenacao, modelo, after=None, limit=None, transformar=None):
+    """Gera um documento por linha direto do cursor do Motor, sem acumular a lista.
+
+    `transformar`, se dado, recebe o cursor e retorna outro iterável assíncrono
+    (por exemplo, para completar os documentos em lotes).
+    """
+    cursor = collection.find(_aplicar_cursor(filtro, after, ordenacao), projecao).sort(ordenacao)
+    if limit:
+        cursor = cursor.limit(limit)
+    return stream_documentos(transformar(cursor) if transformar else cursor, modelo)
+
+
+async def buscar_pagina(collection, filtro, projecao, ordenacao, after=None, limit=None):
+    """Busca uma página e retorna (documentos, cursor da próxima página ou None)."""
+    limit = limit or LIMITE_PADRAO
+    docs = await collection.find(
+        _aplicar_cursor(filtro, after, ordenacao), projecao
+    ).sort(ordenacao).limit(limit + 1).to_list(limit + 1)
+
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, codificar_cursor(docs[-1], ordenacao)
+    return docs, None
+
+
+def headers_pagina(proximo: Optional[str]) -> dict:
+    return {"X-Next-Cursor": proximo} if proximo else {}
+
+
+async def listar_paginado(
+    response: Response,
+    collection,
+    filtro: dict,
+    projecao: dict,
+    ordenacao,
+    modelo,
+    after: Optional[str] = None,
+    limit: Optional[int] = None,
+    accept: Optional[str] = None,
+):
+    """Lista uma página em JSON ou todo o resultado em NDJSON (Accept: application/x-ndjson).
+
+    No modo JSON, se houver mais documentos o cursor da próxima página é
+    enviado no header `X-Next-Cursor`.
+    """
+    if quer_ndjson(accept):
+        return stream_ndjson(collection, filtro, projecao, ordenacao, modelo, after, limit)
+
+    docs, proximo = await buscar_pagina(collection, filtro, projecao, ordenacao, after, limit)
+    return responder(response, serializar_documentos(docs, modelo), headers_pagina(proximo))
@@ -0,0 +1,347 @@
+"""Índice de progressão de carga e recordes por (aluno, exercício).
+
+Cada execução registrada atualiza, para cada exercício feito, um documento em
+`progressao_exercicios` com a última carga, os melhores valores (carga,
+repetições e 1RM estimado), os recordes batidos e um histórico reduzido com
+um ponto por sessão. Assim a consulta de progressão lê um único documento,
+em vez de varrer todas as execuções do aluno.
+
+O exercício é identificado pela entrada do catálogo (`idCatalogo`, ver
+catalogo.py), não pelo item do treino: o mesmo exercício em dois treinos, ou
+num treino editado, soma no mesmo histórico. O item do treino vem na
+execução (`idExercicio`) e é traduzido pelo treino da atribuição; itens sem
+catálogo (treinos ainda não migrados) continuam pelo id do item.
+
+Uso:
+    python progressao.py reconstruir           # recalcula tudo a partir das execuções
+    python progressao.py reconstruir <idAluno> # apenas um aluno
+"""
+import asyncio
+import logging
+import sys
+from typing import Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from database import progressao_exercicios_collection, atribuicoes_collection, treinos_collection
+from execucoes import repositorio_execucoes
+
+logger = logging.getLogger(__name__)
+
+# Acima disso a metade mais antiga do histórico é reduzida pela metade
+HISTORICO_MAX = 200
+RECORDES_MAX = 100
+TENTATIVAS = 3
+
+# Campo de melhor valor -> campo do ponto de onde ele vem
+MELHORES = {"melhorCarga": "carga", "melhorRepeticoes": "repeticoes", "melhor1RM": "rm1"}
+TIPOS_RECORDE = {"melhorCarga": "carga", "melhorRepeticoes": "repeticoes", "melhor1RM": "1rm"}
+
+
+def estimar_1rm(carga: float, repeticoes: int) -> float:
+    """1RM estimado pela fórmula de Epley."""
+    if not carga or not repeticoes:
+        return 0.0
+    if repeticoes == 1:
+        return float(carga)
+    return carga * (1 + repeticoes / 30)
+
+
+def _numero(valor) -> float:
+    return valor if isinstance(valor, (int, float)) and not isinstance(valor, bool) else 0
+
+
+def series_exercicio(exercicio: dict) -> list:
+    # O app envia {idExercicio, series: [...]}; registros antigos têm uma série por item
+    series = exercicio.get("series")
+    return series if isinstance(series, list) else [exercicio]
+
+
+async def catalogo_das_atribuicoes(ids_atribuicoes) -> dict:
+    """{idAtribuicao: {id do item do treino: idCatalogo}} com duas consultas."""
+    treino_da_atribuicao = {
+        a["id"]: a["idTreino"]
+        async for a in atribuicoes_collection.find(
+            {"id": {"$in": list(set(ids_atribuicoes))}}, {"_id": 0, "id": 1, "idTreino": 1}
+        )
+    }
+    itens_do_treino = {
+        t["id"]: {item["id"]: item["idCatalogo"] for item in t.get("exercicios") or [] if item.get("idCatalogo")}
+        async for t in treinos_collection.find(
+            {"id": {"$in": list(set(treino_da_atribuicao.values()))}},
+            {"_id": 0, "id": 1, "exercicios.id": 1, "exercicios.idCatalogo": 1},
+        )
+    }
+    return {id_atr: itens_do_treino.get(id_treino, {}) for id_atr, id_treino in treino_da_atribuicao.items()}
+
+
+def pontos_execucao(execucao: dict, catalogo: Optional[dict] = None) -> dict:
+    """Melhores valores de cada exercício na execução: {idCatalogo (ou id do item): ponto}.
+
+    `catalogo` traduz o id do item do treino para a entrada do catálogo.
+    """
+    catalogo = catalogo or {}
+    pontos = {}
+    for exercicio in execucao.get("exercicios") or []:
+        if not isinstance(exercicio, dict) or not isinstance(exercicio.get("idExercicio"), str):
+            continue
+        ponto = pontos.setdefault(
+            catalogo.get(exercicio["idExercicio"], exercicio["idExercicio"]),
+            {"data": execucao["dataExecucao"], "carga": 0, "repeticoes": 0, "rm1": 0.0},
+        )
+        for serie in series_exercicio(exercicio):
+            if not isinstance(serie, dict):
+                continue
+            carga = _numero(serie.get("cargaUtilizada"))
+            repeticoes = int(_numero(serie.get("repeticoesFeit")))
+            ponto["carga"] = max(ponto["carga"], carga)
+            ponto["repeticoes"] = max(ponto["repeticoes"], repeticoes)
+            ponto["rm1"] = max(ponto["rm1"], estimar_1rm(carga, repeticoes))
+    # Exercício sem nenhuma série válida não vira ponto
+    return {id_ex: ponto for id_ex, ponto in pontos.items() if ponto["carga"] or ponto["repeticoes"]}
+
+
+def novo_documento(id_aluno: str, id_exercicio: str) -> dict:
+    return {
+        "idAluno": id_aluno,
+        "idExercicio": id_exercicio,
+        "versao": 0,
+        "totalSessoes": 0,
+        "ultimaData": None,
+        "ultimaCarga": None,
+        "ultimasRepeticoes": None,
+        **{campo: None for campo in MELHORES},
+        **{f"{campo}Data": None for campo in MELHORES},
+        "historico": [],
+        "recordes": [],
+    }
+
+
+def reduzir_historico(historico: list) -> list:
+    """Junta os pontos da metade mais antiga de dois em dois (fica o de maior 1RM)."""
+    if len(historico) <= HISTORICO_MAX:
+        return historico
+    metade = len(historico) // 2
+    antigos = historico[:metade]
+    reduzidos = [max(antigos[i:i + 2], key=lambda p: p["rm1"]) for i in range(0, len(antigos), 2)]
+    return reduzidos + historico[metade:]
+
+
+def aplicar_ponto(doc: dict, ponto: dict) -> dict:
+    """Incorpora o ponto de uma sessão ao documento de progressão (sem efeitos colaterais)."""
+    doc = {**doc, "historico": list(doc["historico"]), "recordes": list(doc["recordes"])}
+    ponto = {**ponto, "rm1": round(ponto["rm1"], 1)}
+
+    doc["totalSessoes"] += 1
+    if doc["ultimaData"] is None or ponto["data"] >= doc["ultimaData"]:
+        doc["ultimaData"] = ponto["data"]
+        doc["ultimaCarga"] = ponto["carga"]
+        doc["ultimasRepeticoes"] = ponto["repeticoes"]
+
+    for campo, origem in MELHORES.items():
+        atual = doc[campo]
+        if atual is None or ponto[origem] > atual:
+            # A primeira sessão só define a referência; recorde é superar um valor anterior
+            if atual is not None:
+                doc["recordes"].append({
+                    "tipo": TIPOS_RECORDE[campo],
+                    "valor": ponto[origem],
+                    "anterior": atual,
+                    "data": ponto["data"],
+                })
+            doc[campo] = ponto[origem]
+            doc[f"{campo}Data"] = ponto["data"]
+    doc["recordes"] = doc["recordes"][-RECORDES_MAX:]
+
+    doc["historico"].append(ponto)
+    doc["historico"].sort(key=lambda p: p["data"])
+    doc["historico"] = reduzir_historico(doc["historico"])
+    return doc
+
+
+async def _gravar(atual: Optional[dict], novo: dict) -> bool:
+    """Grava com controle otimista pela `versao`; False se outro processo gravou antes."""
+    novo["versao"] = novo["versao"] + 1
+    if atual is None:
+        try:
+            await progressao_exercicios_collection.insert_one(novo)
+        except DuplicateKeyError:
+            return False
+        return True
+    resultado = await progressao_exercicios_collection.replace_one(
+        {"idAluno": atual["idAluno"], "idExercicio": atual["idExercicio"], "versao": atual["versao"]},
+        novo,
+    )
+    return resultado.matched_count == 1
+
+
+async def registrar_progressao(execucao: dict, catalogo: Optional[dict] = None):
+    """`catalogo`: o mapa de `catalogo_das_atribuicoes`; sem ele, é buscado para esta execução."""
+    if catalogo is None:
+        catalogo = await catalogo_das_atribuicoes([execucao["idAtribuicao"]])
+    pontos = pontos_execucao(execucao, catalogo.get(execucao["idAtribuicao"]))
+    id_aluno = execucao["idAluno"]
+
+    for _ in range(TENTATIVAS):
+        if not pontos:
+            return
+        atuais = {
+            doc["idExercicio"]: doc
+            async for doc in progressao_exercicios_collection.find(
+                {"idAluno": id_aluno, "idExercicio": {"$in": list(pontos)}}, {"_id": 0}
+            )
+        }
+        ids = list(pontos)
+        gravados = await asyncio.gather(*(
+            _gravar(atuais.get(id_ex), aplicar_ponto(atuais.get(id_ex) or novo_documento(id_aluno, id_ex), pontos[id_ex]))
+            for id_ex in ids
+        ))
+        pontos = {id_ex: pontos[id_ex] for id_ex, ok in zip(ids, gravados) if not ok}
+
+    if pontos:
+        logger.warning(
+            "Progressão não atualizada após %d tentativas (aluno %s, exercícios %s)",
+            TENTATIVAS, id_aluno, ", ".join(pontos),
+        )
+
+
+async def registrar_progressoes(execucoes: list):
+    catalogo = await catalogo_das_atribuicoes([e["idAtribuicao"] for e in execucoes]) if execucoes else {}
+    for execucao in sorted(execucoes, key=lambda e: e["dataExecucao"]):
+        await registrar_progressao(execucao, catalogo)
+
+
+def reduzir_pontos(historico: list, pontos: int) -> list:
+    """Reduz o histórico a no máximo `pontos` pontos, mantendo o de maior 1RM de cada faixa."""
+    if pontos <= 0 or len(historico) <= pontos:
+        return historico
+    tamanho = len(historico) / pontos
+    return [
+        max(historico[int(i * tamanho):int((i + 1) * tamanho)], key=lambda p: p["rm1"])
+        for i in range(pontos)
+    ]
+
+
+async def buscar_progressao(
+    id_aluno: str,
+    id_exercicio: str,
+    de: Optional[str] = None,
+    ate: Optional[str] = None,
+    pontos: Optional[int] = None,
+) -> Optional[dict]:
+    """`id_exercicio` é o id do catálogo; o id de um item de treino também é aceito."""
+    doc = await progressao_exercicios_collection.find_one(
+        {"idAluno": id_aluno, "idExercicio": id_exercicio}, {"_id": 0, "versao": 0}
+    )
+    if not doc:
+        # Item de treino: procura só nos treinos atribuídos ao aluno (índices idAluno e id)
+        ids_treinos = await atribuicoes_collection.distinct("idTreino", {"idAluno": id_aluno})
+        treino = await treinos_collection.find_one(
+            {"id": {"$in": ids_treinos}, "exercicios.id": id_exercicio},
+            {"_id": 0, "exercicios": {"$elemMatch": {"id": id_exercicio}}},
+        )
+        id_catalogo = ((treino or {}).get("exercicios") or [{}])[0].get("idCatalogo")
+        if not id_catalogo:
+            return None
+        doc = await progressao_exercicios_collection.find_one(
+            {"idAluno": id_aluno, "idExercicio": id_catalogo}, {"_id": 0, "versao": 0}
+        )
+        if not doc:
+            return None
+
+    historico = [
+        p for p in doc["historico"]
+        if (not de or p["data"] >= de) and (not ate or p["data"] <= ate)
+    ]
+    if pontos:
+        historico = reduzir_pontos(historico, pontos)
+    doc["historico"] = historico
+    return doc
+
+
+async def remover_progressao(id_aluno: str):
+    await progressao_exercicios_collection.delete_many({"idAluno": id_aluno})
+
+# ==================== RECONSTRUÇÃO ====================
+
+def pipeline_pontos(filtro: dict) -> list:
+    """Um ponto por (aluno, exercício, execução), na mesma definição de `pontos_execucao`."""
+    rm1 = {"$cond": [
+        {"$and": [{"$gt": ["$carga", 0]}, {"$gt": ["$repeticoes", 0]}]},
+        {"$cond": [
+            {"$eq": ["$repeticoes", 1]},
+            "$carga",
+            {"$multiply": ["$carga", {"$add": [1, {"$divide": ["$repeticoes", 30]}]}]},
+        ]},
+        0,
+    ]}
+    numero = lambda campo: {"$cond": [{"$isNumber": campo}, campo, 0]}
+    # Entrada do catálogo do item, pelo treino da atribuição (como `catalogo_das_atribuicoes`)
+    id_catalogo = {"$arrayElemAt": [
+        {"$map": {
+            "input": {"$filter": {"input": "$itens", "cond": {"$eq": ["$$this.id", "$exercicios.idExercicio"]}}},
+            "in": "$$this.idCatalogo",
+        }},
+        0,
+    ]}
+    return repositorio_execucoes.estagios_execucoes(filtro) + [
+        {"$project": {"_id": 0, "id": 1, "idAluno": 1, "idAtribuicao": 1, "dataExecucao": 1, "exercicios": 1}},
+        {"$lookup": {"from": "atribuicoes", "localField": "idAtribuicao", "foreignField": "id", "as": "atribuicao"}},
+        {"$set": {"idTreino": {"$arrayElemAt": ["$atribuicao.idTreino", 0]}}},
+        {"$lookup": {"from": "treinos", "localField": "idTreino", "foreignField": "id", "as": "treino"}},
+        {"$set": {"itens": {"$ifNull": [{"$arrayElemAt": ["$treino.exercicios", 0]}, []]}}},
+        {"$project": {"atribuicao": 0, "treino": 0}},
+        {"$unwind": "$exercicios"},
+        {"$match": {"exercicios.idExercicio": {"$type": "string"}}},
+        {"$set": {"chave": {"$ifNull": [id_catalogo, "$exercicios.idExercicio"]}}},
+        {"$set": {"series": {"$cond": [
+            {"$isArray": "$exercicios.series"}, "$exercicios.series", ["$exercicios"],
+        ]}}},
+        {"$unwind": "$series"},
+        {"$set": {
+            "carga": numero("$series.cargaUtilizada"),
+            "repeticoes": {"$toInt": numero("$series.repeticoesFeit")},
+        }},
+        {"$group": {
+            "_id": {"idAluno": "$idAluno", "idExercicio": "$chave", "execucao": "$id"},
+            "data": {"$first": "$dataExecucao"},
+            "carga": {"$max": "$carga"},
+            "repeticoes": {"$max": "$repeticoes"},
+            "rm1": {"$max": rm1},
+        }},
+        {"$match": {"$or": [{"carga": {"$gt": 0}}, {"repeticoes": {"$gt": 0}}]}},
+        {"$sort": {"_id.idAluno": ASCENDING, "_id.idExercicio": ASCENDING, "data": ASCENDING}},
+    ]
+
+
+async def reconstruir_progressao(id_aluno: str = None):
+    """Recalcula o índice a partir das execuções, um (aluno, exercício) por vez."""
+    filtro = {"idAluno": id_aluno} if id_aluno else {}
+    await progressao_exercicios_collection.delete_many(filtro)
+
+    total = 0
+    chave_atual, doc = None, None
+    async for ponto in repositorio_execucoes.collection.aggregate(pipeline_pontos(filtro), allowDiskUse=True):
+        chave = (ponto["_id"]["idAluno"], ponto["_id"]["idExercicio"])
+        if chave != chave_atual:
+            if doc is not None:
+                await progressao_exercicios_collection.insert_one(doc)
+                total += 1
+            chave_atual, doc = chave, novo_documento(*chave)
+        doc = aplicar_ponto(doc, {k: ponto[k] for k in ("data", "carga", "repeticoes", "rm1")})
+
+    if doc is not None:
+        await progressao_exercicios_collection.insert_one(doc)
+        total += 1
+
+    logger.info("Progressão reconstruída: %d pares (aluno, exercício)", total)
+    return {"exercicios": total}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if not sys.argv[1:] or sys.argv[1] != "reconstruir":
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(reconstruir_progressao(*sys.argv[2:3]))
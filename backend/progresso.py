@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+from execucoes import repositorio_execucoes
+
+GRANULARIDADES = ("semana", "mes")
+
+
+def inicio_periodo(data: datetime, granularidade: str) -> datetime:
+    """Início (00:00 UTC) da semana, começando no domingo, ou do mês que contém `data`."""
+    data = data.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularidade == "mes":
+        return data.replace(day=1)
+    # weekday(): segunda=0 ... domingo=6
+    return data - timedelta(days=(data.weekday() + 1) % 7)
+
+
+def proximo_periodo(inicio: datetime, granularidade: str) -> datetime:
+    if granularidade == "mes":
+        if inicio.month == 12:
+            return inicio.replace(year=inicio.year + 1, month=1)
+        return inicio.replace(month=inicio.month + 1)
+    return inicio + timedelta(days=7)
+
+
+def limites_periodos(granularidade: str, janela: int, agora: datetime):
+    """Lista de janela + 1 limites: o início de cada período e o fim do atual."""
+    atual = inicio_periodo(agora, granularidade)
+    limites = [atual]
+    for _ in range(janela - 1):
+        anterior = inicio_periodo(limites[0] - timedelta(days=1), granularidade)
+        limites.insert(0, anterior)
+    limites.append(proximo_periodo(atual, granularidade))
+    return limites
+
+
+async def calcular_progresso(id_aluno: str, granularidade: str = "semana", janela: int = 4, agora: datetime = None):
+    agora = agora or datetime.now(timezone.utc)
+    limites = [d.isoformat() for d in limites_periodos(granularidade, janela, agora)]
+    uma_semana_atras = (agora - timedelta(days=7)).isoformat()
+
+    # dataExecucao é gravada como ISO 8601 em UTC, então a ordem
+    # lexicográfica das strings é a ordem cronológica.
+    # Os totais e as facetas abaixo saem de uma única agregação; o formato de
+    # armazenamento decide como chegar às execuções a partir de `desde`
+    facetas = {
+        "ultimaSemana": [
+            {"$match": {"dataExecucao": {"$gte": uma_semana_atras}}},
+            {"$count": "total"},
+        ],
+        "periodos": [
+            {"$match": {"dataExecucao": {"$gte": limites[0], "$lt": limites[-1]}}},
+            {"$bucket": {
+                "groupBy": "$dataExecucao",
+                "boundaries": limites,
+                "output": {
+                    "treinos": {"$sum": 1},
+                    "tempoTotal": {"$sum": "$duracao"},
+                },
+            }},
+        ],
+    }
+    pipeline = repositorio_execucoes.pipeline_progresso(id_aluno, min(limites[0], uma_semana_atras), facetas)
+
+    resultado = await repositorio_execucoes.collection.aggregate(pipeline).to_list(1)
+    resultado = resultado[0] if resultado else {}
+
+    totais = (resultado.get("totais") or [{}])[0]
+    ultima_semana = (resultado.get("ultimaSemana") or [{}])[0]
+    buckets = {b["_id"]: b for b in resultado.get("periodos", [])}
+
+    # $bucket omite períodos sem execuções; preenche com zero
+    periodos = []
+    for inicio, fim in zip(limites, limites[1:]):
+        bucket = buckets.get(inicio, {})
+        periodos.append({
+            "inicio": inicio,
+            "fim": fim,
+            "treinos": bucket.get("treinos", 0),
+            "tempoTotal": bucket.get("tempoTotal", 0),
+        })
+
+    return {
+        "totalTreinos": totais.get("totalTreinos", 0),
+        "tempoTotal": totais.get("tempoTotal", 0),
+        "mediaTempoTreino": round(totais.get("mediaTempoTreino") or 0),
+        "ultimaSemana": ultima_semana.get("total", 0),
+        "ultimaExecucao": totais.get("ultimaExecucao"),
+        "granularidade": granularidade,
+        "periodos": periodos,
+    }
@@ -0,0 +1,55 @@
+"""Modo rápido de resposta (RESPOSTA_RAPIDA).
+
+No caminho padrão cada documento vira `Modelo(**doc)` no handler e o FastAPI
+valida e serializa de novo pelo `response_model`, terminando no encoder JSON
+da stdlib. No modo rápido o documento é validado uma única vez e a resposta
+sai direto em orjson, sem passar pelo `response_model`:
+
+    RESPOSTA_RAPIDA=""         desativado (padrão)
+    RESPOSTA_RAPIDA="validar"  valida cada documento uma vez e serializa com orjson
+    RESPOSTA_RAPIDA="direto"   envia os documentos projetados do Mongo sem validar
+"""
+import os
+from typing import Optional
+
+from fastapi import Response
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+except ImportError:  # orjson é opcional; sem ele o modo rápido fica desligado
+    orjson = None
+    ORJSONResponse = None
+
+RESPOSTA_RAPIDA = os.getenv("RESPOSTA_RAPIDA", "") if orjson is not None else ""
+
+
+def projecao_modelo(modelo) -> dict:
+    """Projeção do Mongo com exatamente os campos do modelo de resposta."""
+    return {"_id": 0, **{campo: 1 for campo in modelo.model_fields}}
+
+
+def serializar_documento(doc: dict, modelo) -> dict:
+    if RESPOSTA_RAPIDA == "direto":
+        return doc
+    return modelo.model_validate(doc).model_dump(mode="json")
+
+
+def serializar_documentos(docs: list, modelo) -> list:
+    if RESPOSTA_RAPIDA == "direto":
+        return docs
+    validar = modelo.model_validate
+    return [validar(doc).model_dump(mode="json") for doc in docs]
+
+
+def responder(response: Response, conteudo, headers: Optional[dict] = None):
+    """Retorna `conteudo` (já serializado) pelo caminho rápido ou pelo padrão.
+
+    No caminho padrão os headers vão para o `response` injetado pelo FastAPI;
+    no rápido a resposta é criada aqui e os headers vão nela.
+    """
+    if RESPOSTA_RAPIDA:
+        return ORJSONResponse(conteudo, headers=headers)
+    if headers:
+        response.headers.update(headers)
+    return conteudo
@@ -0,0 +1,67 @@
+"""Hash de senhas com bcrypt fora do event loop.
+
+O bcrypt leva dezenas a centenas de milissegundos por senha; rodando direto
+nos handlers `async` ele travaria todas as outras requisições do worker.
+Aqui o trabalho vai para um pool limitado de threads (o bcrypt libera o GIL)
+ou de processos.
+"""
+import asyncio
+import hmac
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(os.cpu_count() or 2)))
+HASH_EXECUTOR = os.getenv("HASH_EXECUTOR", "thread")  # 'thread' ou 'process'
+
+# Hashes com custo ou esquema diferentes do atual são refeitos no próximo login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        if HASH_EXECUTOR == "process":
+            _executor = ProcessPoolExecutor(max_workers=HASH_POOL_SIZE)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=HASH_POOL_SIZE, thread_name_prefix="senhas")
+    return _executor
+
+
+def _hash(senha: str) -> str:
+    return pwd_context.hash(senha)
+
+
+def _verificar(senha: str, armazenada: str):
+    """Retorna (confere, novo_hash). `novo_hash` vem preenchido quando é preciso regravar."""
+    if not armazenada:
+        return False, None
+
+    if pwd_context.identify(armazenada) is None:
+        # Registro legado com senha em texto puro: migra no primeiro login
+        if hmac.compare_digest(senha.encode(), armazenada.encode()):
+            return True, pwd_context.hash(senha)
+        return False, None
+
+    return pwd_context.verify_and_update(senha, armazenada)
+
+
+async def hash_senha(senha: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _hash, senha)
+
+
+async def verificar_senha(senha: str, armazenada: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _verificar, senha, armazenada)
+
+
+def encerrar():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -1,4 +1,7 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Header, UploadFile, File, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from pymongo import DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from starlette.middleware.cors import CORSMiddleware
 from datetime import datetime, timezone
 import os
@@ -6,6 +9,7 @@ import logging
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import List, Optional
+import asyncio
 import uuid
 import secrets
 
@@ -18,55 +22,111 @@ from models import (
     LoginRequest,
     LoginResponse,
     Exercicio,
+    ExercicioCatalogoCreate,
+    ExercicioCatalogoUpdate,
+    ExercicioCatalogoResponse,
     TreinoCreate,
     TreinoUpdate,
     TreinoResponse,
     AtribuicaoCreate,
     AtribuicaoResponse,
+    AtribuicaoLoteItem,
+    AgendaItem,
     ExercicioExecucao,
     ExecucaoCreate,
     ExecucaoResponse,
+    ExecucaoLoteItem,
+    LoteRequest,
+    LoteResponse,
     AdicionarMedida,
+    ProgressoResponse,
+    ProgressaoExercicioResponse,
+    EstatisticasResponse,
+    AlunoResumo,
+    AlunoBusca,
+    ResumoPersonalResponse,
+    SyncResponse,
+    TarefaResponse,
 )
 
 from database import (
     usuarios_collection,
     treinos_collection,
     atribuicoes_collection,
-    execucoes_collection,
+    exercicios_collection,
+    estatisticas_aluno_collection,
+    estatisticas_personal_collection,
     close_db_connection,
 )
 
+from auth import (
+    generate_token,
+    revoke_token,
+    invalidar_usuario,
+    get_current_user,
+    user_cache,
+)
+from cache import treinos_cache, listas_treinos_cache, usuarios_cache, estatisticas_caches
+
+from indexes import ensure_indexes
+from metricas import MetricasMiddleware, Contador, exportar as exportar_metricas
+from admissao import AdmissaoMiddleware, METRICAS as METRICAS_ADMISSAO
+from senhas import hash_senha, verificar_senha, encerrar as encerrar_senhas
+from paginacao import listar_paginado, buscar_pagina, stream_ndjson, stream_documentos, headers_pagina, quer_ndjson, LIMITE_PADRAO
+from condicional import gerar_etag, nao_modificado, resposta_304, headers_versao
+from respostas import projecao_modelo, serializar_documento, serializar_documentos, responder
+from progresso import calcular_progresso
+from execucoes import repositorio_execucoes
+from medidas import registrar_medida, listar_medidas, LIMITE_MEDIDAS
+from estatisticas import registrar_execucao, registrar_execucoes, formatar_estatisticas
+from progressao import registrar_progressao, registrar_progressoes, buscar_progressao
+from exportacao import exportar_execucoes
+from tarefas import enfileirar, buscar_tarefa, iniciar as iniciar_tarefas, encerrar as encerrar_tarefas, METRICAS as METRICAS_TAREFAS
+from manutencao import tipo_remocao_usuario
+from lote import MAX_LOTE, validar_itens, inserir_lote, resumo_lote
+from busca import campos_busca, atualizar_campos_busca, buscar_alunos, LIMITE_BUSCA
+from catalogo import (
+    catalogar,
+    resolver_exercicios,
+    resolver_stream,
+    criar_exercicio,
+    atualizar_exercicio,
+    remover_exercicio,
+    treinos_com_exercicio,
+    filtro_catalogo,
+    ORDEM_CATALOGO,
+)
+from eventos import publicar, resumo, stream_eventos, iniciar as iniciar_eventos, encerrar as encerrar_eventos, METRICAS as METRICAS_EVENTOS
+from sincronizacao import carimbar, registrar_remocao, escopos_usuario, escopos_treino, sincronizar
+from media import (
+    salvar_upload,
+    buscar_midia,
+    ler_intervalo,
+    externalizar,
+    intervalo_http,
+    tipo_permitido,
+)
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
-# Dicionário simples para tokens (em produção, use JWT ou Redis)
-active_tokens = {}
+# Ordenação das listagens; sempre termina em "id" para o cursor ser único
+ORDEM_CRIACAO = [("dataCriacao", DESCENDING), ("id", DESCENDING)]
 
 def generate_id(prefix='ID'):
     return f"{prefix}{int(datetime.now().timestamp())}{secrets.token_hex(4)}"
 
-def generate_token():
-    return secrets.token_urlsafe(32)
+async def invalidar_caches_usuario(id: str):
+    invalidar_usuario(id)
+    await usuarios_cache.invalidar(id)
 
-async def get_current_user(authorization: str = Header(None)):
-    if not authorization or not authorization.startswith('Bearer '):
-        raise HTTPException(status_code=401, detail="Não autorizado")
-    
-    token = authorization.replace('Bearer ', '')
-    user_id = active_tokens.get(token)
-    
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Token inválido")
-    
-    user = await usuarios_collection.find_one({"id": user_id}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=401, detail="Usuário não encontrado")
-    
-    return user
+async def invalidar_caches_treino(id_personal: str, id_treino: str = None):
+    await listas_treinos_cache.invalidar(id_personal)
+    if id_treino:
+        await treinos_cache.invalidar(id_treino)
 
 # ==================== AUTENTICAÇÃO ====================
 
@@ -77,21 +137,24 @@ async def cadastro_personal(dados: PersonalCreate):
     if existe:
         raise HTTPException(status_code=400, detail="Email já cadastrado")
     
+    agora = datetime.now(timezone.utc).isoformat()
     usuario = {
         "id": generate_id('PT'),
         "tipo": "personal",
         "nome": dados.nome,
         "email": dados.email,
-        "senha": dados.senha,  # Em produção: hash com bcrypt
+        "senha": await hash_senha(dados.senha),
         "especializacao": dados.especializacao or "",
-        "avatar": dados.avatar,
-        "dataCriacao": datetime.now(timezone.utc).isoformat()
+        "avatar": await externalizar(dados.avatar),
+        "dataCriacao": agora,
+        "dataUltimaEdicao": agora
     }
     
+    usuario.update(campos_busca(usuario))
+    await carimbar(usuario)
     await usuarios_collection.insert_one(usuario)
     
-    token = generate_token()
-    active_tokens[token] = usuario['id']
+    token = generate_token(usuario)
     
     usuario_response = {k: v for k, v in usuario.items() if k != 'senha'}
     
@@ -109,12 +172,13 @@ async def cadastro_aluno(dados: AlunoCreate):
     if not personal:
         raise HTTPException(status_code=400, detail="Código de personal inválido")
     
+    agora = datetime.now(timezone.utc).isoformat()
     usuario = {
         "id": generate_id('ALN'),
         "tipo": "aluno",
         "nome": dados.nome,
         "email": dados.email,
-        "senha": dados.senha,
+        "senha": await hash_senha(dados.senha),
         "codigoPersonal": dados.codigoPersonal,
         "idade": dados.idade,
         "peso": dados.peso,
@@ -122,21 +186,18 @@ async def cadastro_aluno(dados: AlunoCreate):
         "sexo": dados.sexo,
         "objetivo": dados.objetivo or "",
         "restricoes": dados.restricoes or "",
-        "avatar": dados.avatar,
-        "historicoMedidas": [
-            {
-                "data": datetime.now(timezone.utc).isoformat(),
-                "peso": dados.peso,
-                "altura": dados.altura
-            }
-        ],
-        "dataCriacao": datetime.now(timezone.utc).isoformat()
+        "avatar": await externalizar(dados.avatar),
+        "dataCriacao": agora,
+        "dataUltimaEdicao": agora
     }
     
+    usuario.update(campos_busca(usuario))
+    await carimbar(usuario)
     await usuarios_collection.insert_one(usuario)
+    await registrar_medida(usuario['id'], dados.peso, dados.altura, agora)
+    await publicar("aluno.criado", resumo("usuario", usuario), [dados.codigoPersonal])
     
-    token = generate_token()
-    active_tokens[token] = usuario['id']
+    token = generate_token(usuario)
     
     usuario_response = {k: v for k, v in usuario.items() if k != 'senha'}
     
@@ -149,11 +210,18 @@ async def login(dados: LoginRequest):
         {"_id": 0}
     )
     
-    if not usuario or usuario['senha'] != dados.senha:
+    if not usuario:
+        raise HTTPException(status_code=401, detail="Credenciais inválidas")
+    
+    confere, novo_hash = await verificar_senha(dados.senha, usuario.get('senha'))
+    if not confere:
         raise HTTPException(status_code=401, detail="Credenciais inválidas")
     
-    token = generate_token()
-    active_tokens[token] = usuario['id']
+    # Senha legada em texto puro ou hash com custo antigo
+    if novo_hash:
+        await usuarios_collection.update_one({"id": usuario['id']}, {"$set": {"senha": novo_hash}})
+    
+    token = generate_token(usuario)
     
     usuario_response = {k: v for k, v in usuario.items() if k != 'senha'}
     
@@ -163,37 +231,149 @@ async def login(dados: LoginRequest):
 async def logout(authorization: str = Header(None)):
     if authorization and authorization.startswith('Bearer '):
         token = authorization.replace('Bearer ', '')
-        active_tokens.pop(token, None)
+        await revoke_token(token)
     
     return {"message": "Logout realizado"}
 
 # ==================== USUÁRIOS ====================
 
+async def _usuario_condicional(
+    id: str,
+    response: Response,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    status_ausente: int = 404,
+):
+    usuario = await usuarios_cache.get(id)
+    if usuario is not None:
+        versao = usuario
+    else:
+        # Leitura só da versão; o documento completo só é buscado se mudou
+        versao = await usuarios_collection.find_one(
+            {"id": id}, {"_id": 0, "dataUltimaEdicao": 1, "dataCriacao": 1}
+        )
+        if not versao:
+            raise HTTPException(status_code=status_ausente, detail="Usuário não encontrado")
+    
+    ultima_modificacao = versao.get('dataUltimaEdicao') or versao.get('dataCriacao')
+    etag = gerar_etag("usuario", id, ultima_modificacao)
+    if nao_modificado(etag, ultima_modificacao, if_none_match, if_modified_since):
+        return resposta_304(etag, ultima_modificacao)
+    
+    if usuario is None:
+        doc = await usuarios_collection.find_one({"id": id}, projecao_modelo(UsuarioResponse))
+        if not doc:
+            raise HTTPException(status_code=status_ausente, detail="Usuário não encontrado")
+        usuario = serializar_documento(doc, UsuarioResponse)
+        # Guarda a versão junto para responder 304 direto do cache
+        await usuarios_cache.set(id, {**usuario, 'dataUltimaEdicao': ultima_modificacao})
+    else:
+        # A versão guardada no cache não faz parte da resposta (o modo rápido não passa pelo response_model)
+        usuario = {k: v for k, v in usuario.items() if k in UsuarioResponse.model_fields}
+    
+    return responder(response, usuario, headers_versao(etag, ultima_modificacao))
+
 @api_router.get("/usuarios/me", response_model=UsuarioResponse)
-async def get_me(authorization: str = Header(None)):
+async def get_me(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     user = await get_current_user(authorization)
-    return UsuarioResponse(**{k: v for k, v in user.items() if k != 'senha'})
+    
+    return await _usuario_condicional(user['id'], response, if_none_match, if_modified_since, status_ausente=401)
 
 @api_router.get("/usuarios/{id}", response_model=UsuarioResponse)
-async def get_usuario(id: str, authorization: str = Header(None)):
+async def get_usuario(
+    id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     await get_current_user(authorization)
     
-    usuario = await usuarios_collection.find_one({"id": id}, {"_id": 0, "senha": 0})
-    if not usuario:
-        raise HTTPException(status_code=404, detail="Usuário não encontrado")
-    
-    return UsuarioResponse(**usuario)
+    return await _usuario_condicional(id, response, if_none_match, if_modified_since)
 
 @api_router.get("/personal/{id_personal}/alunos", response_model=List[UsuarioResponse])
-async def listar_alunos_personal(id_personal: str, authorization: str = Header(None)):
+async def listar_alunos_personal(
+    id_personal: str,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_PADRAO),
+    accept: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     await get_current_user(authorization)
     
-    alunos = await usuarios_collection.find(
+    return await listar_paginado(
+        response,
+        usuarios_collection,
         {"tipo": "aluno", "codigoPersonal": id_personal},
-        {"_id": 0, "senha": 0}
-    ).to_list(1000)
+        projecao_modelo(UsuarioResponse),
+        ORDEM_CRIACAO,
+        UsuarioResponse,
+        after=after,
+        limit=limit,
+        accept=accept,
+    )
+
+@api_router.get("/personal/{id_personal}/alunos/busca", response_model=List[AlunoBusca])
+async def buscar_alunos_personal(
+    id_personal: str,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=100),
+    objetivo: Optional[str] = Query(None, max_length=100),
+    ativo: Optional[bool] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_BUSCA),
+    authorization: str = Header(None),
+):
+    await get_current_user(authorization)
     
-    return [UsuarioResponse(**aluno) for aluno in alunos]
+    # Prefixo sem acento em nome/email pelos campos normalizados de busca.py
+    alunos, proximo = await buscar_alunos(
+        id_personal,
+        projecao_modelo(AlunoBusca),
+        q=q,
+        objetivo=objetivo,
+        ativo=ativo,
+        after=after,
+        limit=limit,
+    )
+    return responder(response, serializar_documentos(alunos, AlunoBusca), headers_pagina(proximo))
+
+@api_router.get("/personal/{id_personal}/resumo", response_model=ResumoPersonalResponse)
+async def resumo_personal(
+    id_personal: str,
+    preview: int = Query(4, ge=1, le=20),
+    authorization: str = Header(None),
+):
+    await get_current_user(authorization)
+    
+    filtro_alunos = {"tipo": "aluno", "codigoPersonal": id_personal}
+    
+    total_alunos, total_treinos, ativos, recentes = await asyncio.gather(
+        usuarios_collection.count_documents(filtro_alunos),
+        treinos_collection.count_documents({"idPersonal": id_personal}),
+        atribuicoes_collection.aggregate([
+            {"$match": {"idPersonal": id_personal, "status": "ativo"}},
+            {"$group": {"_id": "$idAluno"}},
+            {"$count": "total"},
+        ]).to_list(1),
+        usuarios_collection.find(
+            filtro_alunos,
+            {"_id": 0, "id": 1, "nome": 1, "avatar": 1, "peso": 1, "altura": 1},
+        ).sort(ORDEM_CRIACAO).limit(preview).to_list(preview),
+    )
+    
+    return ResumoPersonalResponse(
+        totalAlunos=total_alunos,
+        totalTreinos=total_treinos,
+        alunosAtivos=ativos[0]['total'] if ativos else 0,
+        alunosRecentes=[AlunoResumo(**aluno) for aluno in recentes],
+    )
 
 @api_router.post("/alunos", response_model=UsuarioResponse)
 async def criar_aluno_pelo_personal(dados: dict, authorization: str = Header(None)):
@@ -207,12 +387,13 @@ async def criar_aluno_pelo_personal(dados: dict, authorization: str = Header(Non
     if existe:
         raise HTTPException(status_code=400, detail="Email já cadastrado")
     
+    agora = datetime.now(timezone.utc).isoformat()
     aluno = {
         "id": generate_id('ALN'),
         "tipo": "aluno",
         "nome": dados['nome'],
         "email": dados['email'],
-        "senha": dados.get('senha', 'senha123'),  # Senha padrão
+        "senha": await hash_senha(dados.get('senha', 'senha123')),  # Senha padrão
         "codigoPersonal": user['id'],
         "idade": dados['idade'],
         "peso": dados['peso'],
@@ -220,18 +401,16 @@ async def criar_aluno_pelo_personal(dados: dict, authorization: str = Header(Non
         "sexo": dados['sexo'],
         "objetivo": dados.get('objetivo', ''),
         "restricoes": dados.get('restricoes', ''),
-        "avatar": dados.get('avatar'),
-        "historicoMedidas": [
-            {
-                "data": datetime.now(timezone.utc).isoformat(),
-                "peso": dados['peso'],
-                "altura": dados['altura']
-            }
-        ],
-        "dataCriacao": datetime.now(timezone.utc).isoformat()
+        "avatar": await externalizar(dados.get('avatar')),
+        "dataCriacao": agora,
+        "dataUltimaEdicao": agora
     }
     
+    aluno.update(campos_busca(aluno))
+    await carimbar(aluno)
     await usuarios_collection.insert_one(aluno)
+    await registrar_medida(aluno['id'], dados['peso'], dados['altura'], agora)
+    await publicar("aluno.criado", resumo("usuario", aluno), [user['id']])
     
     return UsuarioResponse(**{k: v for k, v in aluno.items() if k != 'senha'})
 
@@ -245,6 +424,14 @@ async def atualizar_usuario(id: str, dados: dict, authorization: str = Header(No
     dados.pop('senha', None)
     dados.pop('tipo', None)
     dados.pop('dataCriacao', None)
+    dados.pop('historicoMedidas', None)  # medidas só por /usuarios/{id}/medidas
+    
+    if 'avatar' in dados:
+        dados['avatar'] = await externalizar(dados['avatar'])
+    
+    dados['dataUltimaEdicao'] = datetime.now(timezone.utc).isoformat()
+    await atualizar_campos_busca(id, dados)
+    await carimbar(dados)
     
     result = await usuarios_collection.update_one(
         {"id": id},
@@ -254,19 +441,33 @@ async def atualizar_usuario(id: str, dados: dict, authorization: str = Header(No
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
+    await invalidar_caches_usuario(id)
+    
     usuario = await usuarios_collection.find_one({"id": id}, {"_id": 0, "senha": 0})
+    await publicar("usuario.atualizado", resumo("usuario", usuario), await escopos_usuario(usuario))
     return UsuarioResponse(**usuario)
 
 @api_router.delete("/usuarios/{id}")
 async def deletar_usuario(id: str, authorization: str = Header(None)):
-    await get_current_user(authorization)
+    user = await get_current_user(authorization)
     
-    result = await usuarios_collection.delete_one({"id": id})
+    removido = await usuarios_collection.find_one_and_delete(
+        {"id": id}, {"_id": 0, "id": 1, "tipo": 1, "codigoPersonal": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not removido:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
-    return {"message": "Usuário deletado com sucesso"}
+    escopos = await escopos_usuario(removido)
+    await registrar_remocao("usuarios", id, escopos)
+    await publicar("usuario.removido", {"id": id}, escopos)
+    await invalidar_caches_usuario(id)
+    
+    # Atribuições, execuções e o resto do histórico saem em segundo plano
+    tipo, parametros = tipo_remocao_usuario(removido)
+    tarefa = await enfileirar(tipo, parametros, criado_por=user['id'])
+    
+    return {"message": "Usuário deletado com sucesso", "idTarefa": tarefa["id"]}
 
 @api_router.post("/usuarios/{id}/medidas")
 async def adicionar_medida(id: str, dados: AdicionarMedida, authorization: str = Header(None)):
@@ -278,16 +479,41 @@ async def adicionar_medida(id: str, dados: AdicionarMedida, authorization: str =
         "altura": dados.altura
     }
     
-    result = await usuarios_collection.update_one(
-        {"id": id},
-        {"$push": {"historicoMedidas": medida}, "$set": {"peso": dados.peso, "altura": dados.altura}}
+    # O usuário guarda só a medida atual; o histórico fica na coleção `medidas`
+    atualizacao = {"peso": dados.peso, "altura": dados.altura, "dataUltimaEdicao": medida['data']}
+    await carimbar(atualizacao)
+    usuario = await usuarios_collection.find_one_and_update(
+        {"id": id}, {"$set": atualizacao}, {"_id": 0, "id": 1, "tipo": 1, "codigoPersonal": 1}
     )
     
-    if result.matched_count == 0:
+    if not usuario:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
     
+    await registrar_medida(id, medida['peso'], medida['altura'], medida['data'])
+    await invalidar_caches_usuario(id)
+    await publicar(
+        "usuario.atualizado",
+        {"id": id, "peso": dados.peso, "altura": dados.altura},
+        await escopos_usuario(usuario),
+    )
+    
     return {"message": "Medida adicionada com sucesso"}
 
+@api_router.get("/usuarios/{id}/medidas", response_model=List[HistoricoMedida])
+async def listar_medidas_usuario(
+    id: str,
+    response: Response,
+    de: Optional[str] = None,
+    ate: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_MEDIDAS),
+    authorization: str = Header(None),
+):
+    await get_current_user(authorization)
+    
+    medidas, proximo = await listar_medidas(id, de=de, ate=ate, after=after, limit=limit)
+    return responder(response, serializar_documentos(medidas, HistoricoMedida), headers_pagina(proximo))
+
 # ==================== TREINOS ====================
 
 @api_router.post("/treinos", response_model=TreinoResponse)
@@ -306,35 +532,109 @@ async def criar_treino(dados: TreinoCreate, authorization: str = Header(None)):
         "duracao": dados.duracao,
         "nivel": dados.nivel,
         "observacoes": dados.observacoes,
-        "exercicios": [ex.model_dump() for ex in dados.exercicios],
+        "exercicios": await catalogar(user['id'], [ex.model_dump() for ex in dados.exercicios]),
         "dataCriacao": datetime.now(timezone.utc).isoformat(),
         "dataUltimaEdicao": datetime.now(timezone.utc).isoformat()
     }
     
+    await carimbar(treino)
     await treinos_collection.insert_one(treino)
+    await invalidar_caches_treino(user['id'])
+    await publicar("treino.criado", resumo("treino", treino), [user['id']])
     
-    return TreinoResponse(**treino)
+    resposta = {**treino}
+    await resolver_exercicios([resposta])
+    return TreinoResponse(**resposta)
 
 @api_router.get("/treinos/{id}", response_model=TreinoResponse)
-async def get_treino(id: str, authorization: str = Header(None)):
+async def get_treino(
+    id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     await get_current_user(authorization)
     
-    treino = await treinos_collection.find_one({"id": id}, {"_id": 0})
-    if not treino:
-        raise HTTPException(status_code=404, detail="Treino não encontrado")
-    
-    return TreinoResponse(**treino)
+    treino = await treinos_cache.get(id)
+    if treino is not None:
+        versao = treino
+    else:
+        versao = await treinos_collection.find_one({"id": id}, {"_id": 0, "dataUltimaEdicao": 1})
+        if not versao:
+            raise HTTPException(status_code=404, detail="Treino não encontrado")
+    
+    ultima_modificacao = versao.get('dataUltimaEdicao')
+    etag = gerar_etag("treino", id, ultima_modificacao)
+    if nao_modificado(etag, ultima_modificacao, if_none_match, if_modified_since):
+        return resposta_304(etag, ultima_modificacao)
+    
+    if treino is None:
+        doc = await treinos_collection.find_one({"id": id}, projecao_modelo(TreinoResponse))
+        if not doc:
+            raise HTTPException(status_code=404, detail="Treino não encontrado")
+        await resolver_exercicios([doc])
+        treino = serializar_documento(doc, TreinoResponse)
+        await treinos_cache.set(id, treino)
+    
+    return responder(response, treino, headers_versao(etag, ultima_modificacao))
 
 @api_router.get("/personal/{id_personal}/treinos", response_model=List[TreinoResponse])
-async def listar_treinos_personal(id_personal: str, authorization: str = Header(None)):
+async def listar_treinos_personal(
+    id_personal: str,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_PADRAO),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     await get_current_user(authorization)
     
-    treinos = await treinos_collection.find(
-        {"idPersonal": id_personal},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    return [TreinoResponse(**treino) for treino in treinos]
+    # Só a primeira página padrão vai para o cache
+    cacheavel = after is None and limit is None and not quer_ndjson(accept)
+    em_cache = await listas_treinos_cache.get(id_personal) if cacheavel else None
+    
+    if em_cache is not None:
+        total, ultima_modificacao = em_cache['total'], em_cache['ultimaEdicao']
+    else:
+        # A versão da lista muda com qualquer criação, edição ou remoção de treino
+        versao = await treinos_collection.aggregate([
+            {"$match": {"idPersonal": id_personal}},
+            {"$group": {"_id": None, "total": {"$sum": 1}, "ultimaEdicao": {"$max": "$dataUltimaEdicao"}}},
+        ]).to_list(1)
+        total = versao[0]['total'] if versao else 0
+        ultima_modificacao = versao[0]['ultimaEdicao'] if versao else None
+    
+    etag = gerar_etag("treinos", id_personal, total, ultima_modificacao, after, limit, quer_ndjson(accept))
+    if nao_modificado(etag, ultima_modificacao, if_none_match, if_modified_since):
+        return resposta_304(etag, ultima_modificacao)
+    
+    filtro = {"idPersonal": id_personal}
+    projecao = projecao_modelo(TreinoResponse)
+    
+    if quer_ndjson(accept):
+        resposta = stream_ndjson(
+            treinos_collection, filtro, projecao, ORDEM_CRIACAO, TreinoResponse, after, limit, transformar=resolver_stream
+        )
+        resposta.headers.update(headers_versao(etag, ultima_modificacao))
+        return resposta
+    
+    if em_cache is not None:
+        itens, proximo = em_cache['itens'], em_cache['proximoCursor']
+    else:
+        docs, proximo = await buscar_pagina(treinos_collection, filtro, projecao, ORDEM_CRIACAO, after, limit)
+        itens = serializar_documentos(await resolver_exercicios(docs), TreinoResponse)
+        if cacheavel:
+            await listas_treinos_cache.set(id_personal, {
+                "total": total,
+                "ultimaEdicao": ultima_modificacao,
+                "proximoCursor": proximo,
+                "itens": itens,
+            })
+    
+    return responder(response, itens, {**headers_versao(etag, ultima_modificacao), **headers_pagina(proximo)})
 
 @api_router.put("/treinos/{id}", response_model=TreinoResponse)
 async def atualizar_treino(id: str, dados: TreinoUpdate, authorization: str = Header(None)):
@@ -348,27 +648,113 @@ async def atualizar_treino(id: str, dados: TreinoUpdate, authorization: str = He
     update_data = dados.model_dump(exclude_unset=True)
     if 'exercicios' in update_data and update_data['exercicios']:
         update_data['exercicios'] = [ex if isinstance(ex, dict) else ex.model_dump() for ex in update_data['exercicios']]
+        update_data['exercicios'] = await catalogar(user['id'], update_data['exercicios'])
     
     update_data['dataUltimaEdicao'] = datetime.now(timezone.utc).isoformat()
+    await carimbar(update_data)
     
     await treinos_collection.update_one(
         {"id": id},
         {"$set": update_data}
     )
+    await invalidar_caches_treino(user['id'], id)
     
     treino_atualizado = await treinos_collection.find_one({"id": id}, {"_id": 0})
+    await publicar("treino.atualizado", resumo("treino", treino_atualizado), await escopos_treino(treino_atualizado))
+    await resolver_exercicios([treino_atualizado])
     return TreinoResponse(**treino_atualizado)
 
 @api_router.delete("/treinos/{id}")
 async def deletar_treino(id: str, authorization: str = Header(None)):
     user = await get_current_user(authorization)
     
-    result = await treinos_collection.delete_one({"id": id, "idPersonal": user['id']})
+    removido = await treinos_collection.find_one_and_delete(
+        {"id": id, "idPersonal": user['id']}, {"_id": 0, "id": 1, "idPersonal": 1}
+    )
     
-    if result.deleted_count == 0:
+    if not removido:
         raise HTTPException(status_code=404, detail="Treino não encontrado")
     
-    return {"message": "Treino deletado com sucesso"}
+    escopos = await escopos_treino(removido)
+    await registrar_remocao("treinos", id, escopos)
+    await publicar("treino.removido", {"id": id}, escopos)
+    await invalidar_caches_treino(user['id'], id)
+    
+    tarefa = await enfileirar("remover_treino", {"idTreino": id, "idPersonal": user['id']}, criado_por=user['id'])
+    
+    return {"message": "Treino deletado com sucesso", "idTarefa": tarefa["id"]}
+
+# ==================== CATÁLOGO DE EXERCÍCIOS ====================
+
+@api_router.get("/personal/{id_personal}/exercicios", response_model=List[ExercicioCatalogoResponse])
+async def listar_catalogo_personal(
+    id_personal: str,
+    response: Response,
+    q: Optional[str] = Query(None, max_length=100),
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_PADRAO),
+    authorization: str = Header(None),
+):
+    await get_current_user(authorization)
+    
+    # O cursor precisa do nome normalizado, mesmo que a resposta não o tenha
+    docs, proximo = await buscar_pagina(
+        exercicios_collection,
+        filtro_catalogo(id_personal, q),
+        {**projecao_modelo(ExercicioCatalogoResponse), "nomeBusca": 1},
+        ORDEM_CATALOGO,
+        after,
+        limit,
+    )
+    for doc in docs:
+        doc.pop("nomeBusca", None)
+    return responder(response, serializar_documentos(docs, ExercicioCatalogoResponse), headers_pagina(proximo))
+
+@api_router.post("/exercicios", response_model=ExercicioCatalogoResponse)
+async def criar_exercicio_catalogo(dados: ExercicioCatalogoCreate, authorization: str = Header(None)):
+    user = await get_current_user(authorization)
+    
+    if user['tipo'] != 'personal':
+        raise HTTPException(status_code=403, detail="Apenas personal trainers podem editar o catálogo")
+    
+    # Um exercício igual a outro do catálogo devolve o existente
+    exercicio = await criar_exercicio(user['id'], dados.model_dump())
+    return ExercicioCatalogoResponse(**exercicio)
+
+@api_router.put("/exercicios/{id}", response_model=ExercicioCatalogoResponse)
+async def atualizar_exercicio_catalogo(id: str, dados: ExercicioCatalogoUpdate, authorization: str = Header(None)):
+    user = await get_current_user(authorization)
+    
+    try:
+        exercicio = await atualizar_exercicio(id, user['id'], dados.model_dump(exclude_unset=True))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Já existe um exercício igual no catálogo")
+    if not exercicio:
+        raise HTTPException(status_code=404, detail="Exercício não encontrado")
+    
+    # Os treinos só guardam a referência; muda apenas a versão deles (ETag, cache e sincronização)
+    ids_treinos = await treinos_com_exercicio(id, user['id'])
+    if ids_treinos:
+        versao = {"dataUltimaEdicao": exercicio['dataUltimaEdicao']}
+        await carimbar(versao)
+        await treinos_collection.update_many({"id": {"$in": ids_treinos}}, {"$set": versao})
+        await treinos_cache.invalidar(*ids_treinos)
+        await listas_treinos_cache.invalidar(user['id'])
+    
+    alunos = await atribuicoes_collection.distinct("idAluno", {"idTreino": {"$in": ids_treinos}}) if ids_treinos else []
+    await publicar("exercicio.atualizado", {**resumo("exercicio", exercicio), "treinos": ids_treinos}, [user['id'], *alunos])
+    return ExercicioCatalogoResponse(**exercicio)
+
+@api_router.delete("/exercicios/{id}")
+async def deletar_exercicio_catalogo(id: str, authorization: str = Header(None)):
+    user = await get_current_user(authorization)
+    
+    if await treinos_com_exercicio(id, user['id']):
+        raise HTTPException(status_code=409, detail="Exercício usado em treinos; remova-o dos treinos antes")
+    if not await remover_exercicio(id, user['id']):
+        raise HTTPException(status_code=404, detail="Exercício não encontrado")
+    
+    return {"message": "Exercício removido do catálogo"}
 
 # ==================== ATRIBUIÇÕES ====================
 
@@ -391,31 +777,121 @@ async def criar_atribuicao(dados: AtribuicaoCreate, authorization: str = Header(
         "dataCriacao": datetime.now(timezone.utc).isoformat()
     }
     
+    await carimbar(atribuicao)
     await atribuicoes_collection.insert_one(atribuicao)
+    await publicar("atribuicao.criada", resumo("atribuicao", atribuicao), [user['id'], dados.idAluno])
     
     return AtribuicaoResponse(**atribuicao)
 
+@api_router.post("/atribuicoes/lote", response_model=LoteResponse)
+async def criar_atribuicoes_lote(dados: LoteRequest, authorization: str = Header(None)):
+    user = await get_current_user(authorization)
+    
+    if user['tipo'] != 'personal':
+        raise HTTPException(status_code=403, detail="Apenas personal trainers podem atribuir treinos")
+    
+    if len(dados.itens) > MAX_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_LOTE} itens por lote")
+    
+    validos, resultados = validar_itens(dados.itens, AtribuicaoLoteItem)
+    
+    agora = datetime.now(timezone.utc).isoformat()
+    atribuicoes = []
+    for indice, item in validos:
+        atribuicao = {
+            "id": generate_id('ATRB'),
+            "idAluno": item.idAluno,
+            "idTreino": item.idTreino,
+            "idPersonal": user['id'],
+            "dataInicio": item.dataInicio,
+            "dataFim": item.dataFim,
+            "diasSemana": item.diasSemana,
+            "status": "ativo",
+            "dataCriacao": agora
+        }
+        if item.chaveIdempotencia:
+            atribuicao["chaveIdempotencia"] = item.chaveIdempotencia
+        atribuicoes.append((indice, atribuicao))
+    
+    await carimbar(*(doc for _, doc in atribuicoes))
+    resultados.update(await inserir_lote(atribuicoes_collection, atribuicoes, "idPersonal"))
+    
+    for indice, doc in atribuicoes:
+        if resultados[indice]['status'] == 'criado':
+            await publicar("atribuicao.criada", resumo("atribuicao", doc), [doc['idPersonal'], doc['idAluno']])
+    
+    return LoteResponse(**resumo_lote(resultados))
+
 @api_router.get("/alunos/{id_aluno}/atribuicoes", response_model=List[AtribuicaoResponse])
-async def listar_atribuicoes_aluno(id_aluno: str, authorization: str = Header(None)):
+async def listar_atribuicoes_aluno(
+    id_aluno: str,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_PADRAO),
+    accept: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     await get_current_user(authorization)
     
-    atribuicoes = await atribuicoes_collection.find(
+    return await listar_paginado(
+        response,
+        atribuicoes_collection,
         {"idAluno": id_aluno},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    return [AtribuicaoResponse(**atr) for atr in atribuicoes]
+        projecao_modelo(AtribuicaoResponse),
+        ORDEM_CRIACAO,
+        AtribuicaoResponse,
+        after=after,
+        limit=limit,
+        accept=accept,
+    )
 
 @api_router.get("/personal/{id_personal}/atribuicoes", response_model=List[AtribuicaoResponse])
-async def listar_atribuicoes_personal(id_personal: str, authorization: str = Header(None)):
+async def listar_atribuicoes_personal(
+    id_personal: str,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_PADRAO),
+    accept: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     await get_current_user(authorization)
     
-    atribuicoes = await atribuicoes_collection.find(
+    return await listar_paginado(
+        response,
+        atribuicoes_collection,
         {"idPersonal": id_personal},
-        {"_id": 0}
-    ).to_list(1000)
+        projecao_modelo(AtribuicaoResponse),
+        ORDEM_CRIACAO,
+        AtribuicaoResponse,
+        after=after,
+        limit=limit,
+        accept=accept,
+    )
+
+@api_router.get("/alunos/{id_aluno}/agenda", response_model=List[AgendaItem])
+async def agenda_aluno(id_aluno: str, dia: Optional[str] = None, authorization: str = Header(None)):
+    await get_current_user(authorization)
     
-    return [AtribuicaoResponse(**atr) for atr in atribuicoes]
+    filtro = {"idAluno": id_aluno, "status": "ativo"}
+    if dia:
+        filtro["diasSemana"] = dia
+    
+    # Atribuições ativas com o treino embutido, em uma única consulta
+    agenda = await atribuicoes_collection.aggregate([
+        {"$match": filtro},
+        {"$sort": dict(ORDEM_CRIACAO)},
+        {"$lookup": {
+            "from": treinos_collection.name,
+            "localField": "idTreino",
+            "foreignField": "id",
+            "as": "treino",
+        }},
+        {"$unwind": {"path": "$treino", "preserveNullAndEmptyArrays": True}},
+        {"$project": {"_id": 0, "treino._id": 0}},
+    ]).to_list(LIMITE_PADRAO)
+    await resolver_exercicios([item["treino"] for item in agenda if item.get("treino")])
+    
+    return [AgendaItem(**item) for item in agenda]
 
 @api_router.put("/atribuicoes/{id}")
 async def atualizar_atribuicao(id: str, dados: dict, authorization: str = Header(None)):
@@ -423,15 +899,24 @@ async def atualizar_atribuicao(id: str, dados: dict, authorization: str = Header
     
     dados.pop('id', None)
     dados.pop('_id', None)
+    await carimbar(dados)
     
-    result = await atribuicoes_collection.update_one(
+    atribuicao = await atribuicoes_collection.find_one_and_update(
         {"id": id},
-        {"$set": dados}
+        {"$set": dados},
+        {"_id": 0},
+        return_document=ReturnDocument.AFTER,
     )
     
-    if result.matched_count == 0:
+    if not atribuicao:
         raise HTTPException(status_code=404, detail="Atribuição não encontrada")
     
+    await publicar(
+        "atribuicao.atualizada",
+        resumo("atribuicao", atribuicao),
+        [atribuicao.get('idPersonal'), atribuicao.get('idAluno')],
+    )
+    
     return {"message": "Atribuição atualizada"}
 
 # ==================== EXECUÇÕES ====================
@@ -452,31 +937,240 @@ async def criar_execucao(dados: ExecucaoCreate, authorization: str = Header(None
         "exercicios": dados.exercicios
     }
     
-    await execucoes_collection.insert_one(execucao)
+    await carimbar(execucao)
+    await repositorio_execucoes.inserir(execucao)
+    await registrar_execucao(execucao, user.get('codigoPersonal'))
+    await registrar_progressao(execucao)
+    await publicar("execucao.criada", resumo("execucao", execucao), [user['id'], user.get('codigoPersonal')])
     
     return ExecucaoResponse(**execucao)
 
+@api_router.post("/execucoes/lote", response_model=LoteResponse)
+async def criar_execucoes_lote(dados: LoteRequest, authorization: str = Header(None)):
+    user = await get_current_user(authorization)
+    
+    if user['tipo'] != 'aluno':
+        raise HTTPException(status_code=403, detail="Apenas alunos podem registrar execuções")
+    
+    if len(dados.itens) > MAX_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_LOTE} itens por lote")
+    
+    validos, resultados = validar_itens(dados.itens, ExecucaoLoteItem)
+    
+    agora = datetime.now(timezone.utc).isoformat()
+    execucoes = []
+    for indice, item in validos:
+        execucao = {
+            "id": generate_id('EXEC'),
+            "idAluno": user['id'],
+            "idAtribuicao": item.idAtribuicao,
+            "dataExecucao": item.dataExecucao or agora,
+            "duracao": item.duracao,
+            "exercicios": item.exercicios
+        }
+        if item.chaveIdempotencia:
+            execucao["chaveIdempotencia"] = item.chaveIdempotencia
+        execucoes.append((indice, execucao))
+    
+    await carimbar(*(doc for _, doc in execucoes))
+    resultados.update(await repositorio_execucoes.inserir_lote(execucoes))
+    
+    # Só as execuções realmente criadas entram nas estatísticas
+    criadas = [doc for indice, doc in execucoes if resultados[indice]['status'] == 'criado']
+    await registrar_execucoes(criadas, user.get('codigoPersonal'))
+    await registrar_progressoes(criadas)
+    for execucao in criadas:
+        await publicar("execucao.criada", resumo("execucao", execucao), [user['id'], user.get('codigoPersonal')])
+    
+    return LoteResponse(**resumo_lote(resultados))
+
+async def _listar_execucoes(response: Response, filtro: dict, after, limit, accept):
+    # Passa pelo repositório: a resposta é a mesma em qualquer formato de armazenamento
+    projecao = projecao_modelo(ExecucaoResponse)
+    if quer_ndjson(accept):
+        return stream_documentos(repositorio_execucoes.iterar(filtro, projecao, after, limit), ExecucaoResponse)
+    
+    docs, proximo = await repositorio_execucoes.pagina(filtro, projecao, after, limit)
+    return responder(response, serializar_documentos(docs, ExecucaoResponse), headers_pagina(proximo))
+
 @api_router.get("/alunos/{id_aluno}/execucoes", response_model=List[ExecucaoResponse])
-async def listar_execucoes_aluno(id_aluno: str, authorization: str = Header(None)):
+async def listar_execucoes_aluno(
+    id_aluno: str,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_PADRAO),
+    accept: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     await get_current_user(authorization)
     
-    execucoes = await execucoes_collection.find(
-        {"idAluno": id_aluno},
-        {"_id": 0}
-    ).to_list(1000)
-    
-    return [ExecucaoResponse(**exec) for exec in execucoes]
+    return await _listar_execucoes(response, {"idAluno": id_aluno}, after, limit, accept)
 
 @api_router.get("/atribuicoes/{id_atribuicao}/execucoes", response_model=List[ExecucaoResponse])
-async def listar_execucoes_atribuicao(id_atribuicao: str, authorization: str = Header(None)):
+async def listar_execucoes_atribuicao(
+    id_atribuicao: str,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=LIMITE_PADRAO),
+    accept: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
     await get_current_user(authorization)
     
-    execucoes = await execucoes_collection.find(
-        {"idAtribuicao": id_atribuicao},
-        {"_id": 0}
-    ).to_list(1000)
+    return await _listar_execucoes(response, {"idAtribuicao": id_atribuicao}, after, limit, accept)
+
+@api_router.get("/alunos/{id_aluno}/progresso", response_model=ProgressoResponse)
+async def progresso_aluno(
+    id_aluno: str,
+    granularidade: str = Query("semana", pattern="^(semana|mes)$"),
+    janela: int = Query(4, ge=1, le=104),
+    authorization: str = Header(None),
+):
+    await get_current_user(authorization)
+    
+    return ProgressoResponse(**await calcular_progresso(id_aluno, granularidade, janela))
+
+@api_router.get(
+    "/alunos/{id_aluno}/exercicios/{id_exercicio}/progressao",
+    response_model=ProgressaoExercicioResponse,
+)
+async def progressao_exercicio(
+    id_aluno: str,
+    id_exercicio: str,
+    response: Response,
+    de: Optional[str] = None,
+    ate: Optional[str] = None,
+    pontos: Optional[int] = Query(None, ge=2, le=500),
+    authorization: str = Header(None),
+):
+    await get_current_user(authorization)
+    
+    # Lê um documento do índice mantido a cada execução, não as execuções do aluno
+    doc = await buscar_progressao(id_aluno, id_exercicio, de=de, ate=ate, pontos=pontos)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Nenhuma execução deste exercício")
+    
+    return responder(response, serializar_documento(doc, ProgressaoExercicioResponse))
+
+@api_router.get("/alunos/{id_aluno}/estatisticas", response_model=EstatisticasResponse)
+async def estatisticas_aluno(id_aluno: str, authorization: str = Header(None)):
+    await get_current_user(authorization)
+    
+    doc = await estatisticas_aluno_collection.find_one({"idAluno": id_aluno}, {"_id": 0})
+    return EstatisticasResponse(**formatar_estatisticas(doc))
+
+@api_router.get("/personal/{id_personal}/estatisticas", response_model=EstatisticasResponse)
+async def estatisticas_personal(id_personal: str, authorization: str = Header(None)):
+    await get_current_user(authorization)
+    
+    doc = await estatisticas_personal_collection.find_one({"idPersonal": id_personal}, {"_id": 0})
+    return EstatisticasResponse(**formatar_estatisticas(doc))
+
+# ==================== EXPORTAÇÃO ====================
+
+@api_router.get("/personal/{id_personal}/exportar")
+async def exportar(
+    id_personal: str,
+    formato: str = "csv",
+    de: Optional[str] = None,
+    ate: Optional[str] = None,
+    accept_encoding: Optional[str] = Header(None),
+    authorization: str = Header(None),
+):
+    user = await get_current_user(authorization)
+    
+    if user['id'] != id_personal:
+        raise HTTPException(status_code=403, detail="Apenas o próprio personal pode exportar o histórico dos alunos")
+    
+    # Uma linha por série, gerada em lotes direto do cursor
+    return exportar_execucoes(id_personal, formato, de=de, ate=ate, accept_encoding=accept_encoding)
+
+# ==================== TAREFAS ====================
+
+@api_router.get("/tarefas/{id}", response_model=TarefaResponse)
+async def get_tarefa(id: str, authorization: str = Header(None)):
+    user = await get_current_user(authorization)
     
-    return [ExecucaoResponse(**exec) for exec in execucoes]
+    tarefa = await buscar_tarefa(id)
+    if not tarefa:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    if tarefa.get("criadoPor") != user['id']:
+        raise HTTPException(status_code=403, detail="Apenas quem criou a tarefa pode acompanhá-la")
+    
+    return TarefaResponse(**tarefa)
+
+# ==================== SINCRONIZAÇÃO ====================
+
+@api_router.get("/sync", response_model=SyncResponse)
+async def sync(response: Response, since: Optional[str] = None, authorization: str = Header(None)):
+    user = await get_current_user(authorization)
+    
+    # Sem `since` devolve tudo o que o usuário enxerga; com ele, só o que mudou
+    return responder(response, await sincronizar(user, since))
+
+# ==================== EVENTOS ====================
+
+@api_router.get("/eventos")
+async def eventos(request: Request, authorization: str = Header(None)):
+    user = await get_current_user(authorization)
+    
+    # Server-Sent Events com os eventos das escritas que o usuário enxerga
+    return stream_eventos(user['id'], request)
+
+# ==================== MÍDIAS ====================
+
+@api_router.post("/midias")
+async def upload_midia(arquivo: UploadFile = File(...), authorization: str = Header(None)):
+    await get_current_user(authorization)
+    
+    return await salvar_upload(arquivo)
+
+@api_router.get("/midias/{id}")
+async def download_midia(
+    id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None),
+):
+    # Sem autenticação: <img> e <video> não enviam o header Authorization,
+    # e o id (sha256 do conteúdo) não é adivinhável.
+    midia = await buscar_midia(id)
+    if not midia:
+        raise HTTPException(status_code=404, detail="Mídia não encontrada")
+    
+    etag = f'"{id}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "X-Content-Type-Options": "nosniff",
+    }
+    # Mídias gravadas antes da restrição de tipos: baixadas, nunca abertas como página
+    if not tipo_permitido(midia['contentType']):
+        headers["Content-Disposition"] = "attachment"
+    
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(',')]:
+        return Response(status_code=304, headers=headers)
+    
+    tamanho = midia['tamanho']
+    try:
+        intervalo = intervalo_http(range_header, tamanho)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{tamanho}"})
+    
+    if intervalo is None:
+        inicio, fim, status = 0, tamanho - 1, 200
+    else:
+        inicio, fim = intervalo
+        status = 206
+        headers["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+    headers["Content-Length"] = str(fim - inicio + 1)
+    
+    return StreamingResponse(
+        ler_intervalo(id, inicio, fim),
+        status_code=status,
+        media_type=midia['contentType'],
+        headers=headers,
+    )
 
 # ==================== ROOT ====================
 
@@ -484,6 +1178,35 @@ async def listar_execucoes_atribuicao(id_atribuicao: str, authorization: str = H
 async def root():
     return {"message": "FitnessPro API - v1.0"}
 
+@api_router.get("/cache/estatisticas")
+async def cache_estatisticas(authorization: str = Header(None)):
+    await get_current_user(authorization)
+    
+    estatisticas = estatisticas_caches()
+    estatisticas["caches"]["autenticacao"] = {
+        "hits": user_cache.hits,
+        "misses": user_cache.misses,
+        "tamanho": len(user_cache),
+    }
+    return estatisticas
+
+@api_router.get("/metrics")
+async def metrics(authorization: str = Header(None)):
+    # Formato de exposição do Prometheus; com METRICS_TOKEN o scrape precisa do Bearer
+    token = os.environ.get('METRICS_TOKEN')
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    
+    hits = Contador("strongify_cache_hits_total", "Acertos no cache de leitura", ("cache",))
+    misses = Contador("strongify_cache_misses_total", "Erros no cache de leitura", ("cache",))
+    for nome, dados in estatisticas_caches()["caches"].items():
+        hits.inc(nome, valor=dados["hits"])
+        misses.inc(nome, valor=dados["misses"])
+    hits.inc("autenticacao", valor=user_cache.hits)
+    misses.inc("autenticacao", valor=user_cache.misses)
+    
+    return Response(exportar_metricas([hits, misses, *METRICAS_EVENTOS, *METRICAS_ADMISSAO, *METRICAS_TAREFAS]), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @api_router.get("/health")
 async def health():
     return {"status": "healthy"}
@@ -491,6 +1214,9 @@ async def health():
 # Include router
 app.include_router(api_router)
 
+# Controle de admissão (por dentro do CORS, para as respostas 429/503 chegarem ao navegador)
+app.add_middleware(AdmissaoMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -498,8 +1224,12 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Retry-After"],
 )
 
+# Métricas por requisição (adicionado por último para envolver todos os outros middlewares)
+app.add_middleware(MetricasMiddleware)
+
 # Logging
 logging.basicConfig(
     level=logging.INFO,
@@ -507,6 +1237,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_indexes():
+    if os.environ.get('ENSURE_INDEXES', 'true').lower() != 'true':
+        return
+    try:
+        await ensure_indexes()
+    except Exception:
+        logger.exception("Falha ao garantir os índices do MongoDB")
+
+@app.on_event("startup")
+async def startup_eventos():
+    iniciar_eventos()
+
+@app.on_event("startup")
+async def startup_tarefas():
+    iniciar_tarefas()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await encerrar_tarefas()
+    await encerrar_eventos()
+    encerrar_senhas()
     await close_db_connection()
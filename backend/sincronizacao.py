@@ -0,0 +1,297 @@
+"""Sincronização incremental: o cliente busca só o que mudou desde o último token.
+
+Toda escrita em `usuarios`, `treinos`, `atribuicoes` e `execucoes` passa por
+`carimbar`, que grava no documento:
+
+    versaoSync    microssegundos de `modificadoEm` (mais a posição no lote)
+    modificadoEm  ISO 8601 em UTC, indexado junto com o campo de escopo
+
+e soma a quantidade de escritas a uma das SYNC_CONTADOR_PARTES partes do
+contador em `contadores`, escolhida ao acaso para nenhum documento concentrar
+todas as escritas do sistema. A soma das partes só serve para o atalho
+"nada mudou".
+
+Remoções deixam uma lápide em `remocoes` com os ids dos usuários que
+enxergavam o documento (`escopos`); elas expiram após SYNC_RETENCAO_DIAS e um
+token mais velho que isso recebe 410 (o cliente deve sincronizar do zero).
+
+A versão é reservada antes da escrita, então uma escrita lenta pode ficar
+visível depois de uma sincronização que já leu versões maiores. Por isso a
+consulta volta SYNC_SOBREPOSICAO_S segundos antes da leitura anterior (o
+cliente recebe alguns documentos repetidos e os substitui pelo id), e o
+atalho "nada mudou" só vale quando a última reserva do contador já tinha
+mais que esse tempo na leitura anterior.
+
+As execuções crescem sem limite, então vêm em páginas de até
+SYNC_LIMITE_EXECUCOES: com `"mais": true` o token devolvido é uma
+continuação, que traz só as próximas execuções da mesma leitura; o cliente
+repete até `"mais": false` e guarda o último token.
+"""
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+from database import (
+    contadores_collection,
+    remocoes_collection,
+    usuarios_collection,
+    treinos_collection,
+    atribuicoes_collection,
+)
+from execucoes import repositorio_execucoes
+from models import UsuarioResponse, TreinoResponse, AtribuicaoResponse, ExecucaoResponse
+from paginacao import codificar_cursor, decodificar_cursor, filtro_cursor
+from respostas import projecao_modelo, serializar_documentos
+
+SYNC_SOBREPOSICAO_S = float(os.getenv("SYNC_SOBREPOSICAO_S", "10"))
+SYNC_RETENCAO_DIAS = int(os.getenv("SYNC_RETENCAO_DIAS", "30"))
+SYNC_CONTADOR_PARTES = int(os.getenv("SYNC_CONTADOR_PARTES", "16"))
+SYNC_LIMITE_EXECUCOES = int(os.getenv("SYNC_LIMITE_EXECUCOES", "5000"))
+
+CONTADOR = "sincronizacao"
+PARTES_CONTADOR = [f"{CONTADOR}:{i}" for i in range(SYNC_CONTADOR_PARTES)]
+
+# O token usa a mesma codificação do cursor de paginação. `desde` e
+# `execucoes` só são preenchidos na continuação de uma leitura paginada
+CAMPOS_TOKEN = [("versao", None), ("lidoEm", None), ("versaoEm", None), ("desde", None), ("execucoes", None)]
+# Tokens emitidos antes da paginação (continuam válidos)
+CAMPOS_TOKEN_ANTIGO = CAMPOS_TOKEN[:3]
+
+# Ordem das páginas de execuções: a completa segue o índice idAluno_dataExecucao_id
+# (funciona também com execuções antigas sem `modificadoEm`); a incremental, o
+# idAluno_modificadoEm_id
+ORDEM_SYNC_COMPLETA = [("idAluno", ASCENDING), ("dataExecucao", DESCENDING), ("id", DESCENDING)]
+ORDEM_SYNC_DELTA = [("idAluno", ASCENDING), ("modificadoEm", ASCENDING), ("id", ASCENDING)]
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(data: datetime) -> str:
+    # Sempre com microssegundos, para as strings ordenarem como as datas
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return data.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+# ==================== ESCRITA ====================
+
+async def _contar_escritas(quantidade: int, agora: datetime):
+    await contadores_collection.update_one(
+        {"_id": random.choice(PARTES_CONTADOR)},
+        {"$inc": {"valor": quantidade}, "$max": {"atualizadoEm": agora}},
+        upsert=True,
+    )
+
+
+async def _ler_contador() -> tuple:
+    """(total de escritas, instante da última) somando as partes do contador."""
+    partes = await contadores_collection.find({"_id": {"$in": PARTES_CONTADOR}}).to_list(None)
+    datas = [p["atualizadoEm"] for p in partes if p.get("atualizadoEm")]
+    return sum(p.get("valor", 0) for p in partes), max(datas) if datas else None
+
+
+async def carimbar(*docs: dict):
+    """Grava `versaoSync` e `modificadoEm` nos documentos (ou nos `$set`) antes da escrita."""
+    if not docs:
+        return
+    agora = _agora()
+    await _contar_escritas(len(docs), agora)
+    base = int(agora.timestamp() * 1_000_000)
+    modificado_em = _iso(agora)
+    for i, doc in enumerate(docs):
+        doc["versaoSync"] = base + i
+        doc["modificadoEm"] = modificado_em
+
+
+async def registrar_remocao(colecao: str, id: str, escopos: list):
+    lapide = {"colecao": colecao, "id": id, "escopos": sorted(set(escopos)), "removidoEm": _agora()}
+    await carimbar(lapide)
+    await remocoes_collection.insert_one(lapide)
+
+
+async def registrar_remocoes(colecao: str, itens: list):
+    """Lápides de várias remoções [(id, escopos)] com uma única reserva de versões."""
+    agora = _agora()
+    lapides = [
+        {"colecao": colecao, "id": id, "escopos": sorted({e for e in escopos if e}), "removidoEm": agora}
+        for id, escopos in itens
+    ]
+    if lapides:
+        await carimbar(*lapides)
+        await remocoes_collection.insert_many(lapides, ordered=False)
+
+
+async def escopos_usuario(usuario: dict) -> list:
+    """Usuários que recebem o documento deste usuário na sincronização."""
+    if usuario.get("tipo") == "aluno":
+        return [usuario["id"], usuario.get("codigoPersonal")] if usuario.get("codigoPersonal") else [usuario["id"]]
+    alunos = await usuarios_collection.distinct("id", {"tipo": "aluno", "codigoPersonal": usuario["id"]})
+    return [usuario["id"], *alunos]
+
+
+async def escopos_treino(treino: dict) -> list:
+    alunos = await atribuicoes_collection.distinct("idAluno", {"idTreino": treino["id"]})
+    return [treino["idPersonal"], *alunos]
+
+
+# ==================== LEITURA ====================
+
+async def _escopos_leitura(usuario: dict) -> dict:
+    """Filtro de cada coleção com o que o usuário enxerga."""
+    if usuario["tipo"] == "personal":
+        alunos = await usuarios_collection.distinct("id", {"tipo": "aluno", "codigoPersonal": usuario["id"]})
+        return {
+            "usuarios": {"$or": [{"id": usuario["id"]}, {"tipo": "aluno", "codigoPersonal": usuario["id"]}]},
+            "treinos": {"idPersonal": usuario["id"]},
+            "atribuicoes": {"idPersonal": usuario["id"]},
+            "execucoes": {"idAluno": {"$in": alunos}},
+        }
+
+    treinos = await atribuicoes_collection.distinct("idTreino", {"idAluno": usuario["id"]})
+    return {
+        "usuarios": {"id": {"$in": [usuario["id"], usuario.get("codigoPersonal")]}},
+        "treinos": {"id": {"$in": treinos}},
+        "atribuicoes": {"idAluno": usuario["id"]},
+        "execucoes": {"idAluno": usuario["id"]},
+    }
+
+
+def _desde(filtro: dict, desde: Optional[str]) -> dict:
+    return {**filtro, "modificadoEm": {"$gte": desde}} if desde else filtro
+
+
+async def _buscar(collection, filtro: dict, modelo) -> list:
+    docs = await collection.find(filtro, projecao_modelo(modelo)).to_list(None)
+    return serializar_documentos(docs, modelo)
+
+
+async def _buscar_treinos(filtro: dict) -> list:
+    # Import local: catalogo -> media -> sincronizacao
+    from catalogo import resolver_exercicios
+
+    docs = await treinos_collection.find(filtro, projecao_modelo(TreinoResponse)).to_list(None)
+    return serializar_documentos(await resolver_exercicios(docs), TreinoResponse)
+
+
+async def _buscar_execucoes(filtro: dict, desde: Optional[str], after: Optional[str] = None) -> tuple:
+    """Uma página de execuções e o cursor da próxima (ou None)."""
+    ordem = ORDEM_SYNC_DELTA if desde else ORDEM_SYNC_COMPLETA
+    # Pelo repositório, para funcionar com execuções em documentos ou em buckets
+    pipeline = repositorio_execucoes.estagios_execucoes(_desde(filtro, desde))
+    if after:
+        pipeline.append({"$match": filtro_cursor(after, ordem)})
+    pipeline += [
+        {"$sort": dict(ordem)},
+        {"$limit": SYNC_LIMITE_EXECUCOES + 1},
+        {"$project": {**projecao_modelo(ExecucaoResponse), "modificadoEm": 1}},
+    ]
+    docs = await repositorio_execucoes.collection.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+    proximo = None
+    if len(docs) > SYNC_LIMITE_EXECUCOES:
+        docs = docs[:SYNC_LIMITE_EXECUCOES]
+        proximo = codificar_cursor(docs[-1], ordem)
+    for doc in docs:
+        doc.pop("modificadoEm", None)  # só para o cursor; não faz parte da resposta
+    return serializar_documentos(docs, ExecucaoResponse), proximo
+
+
+async def _treinos_das_atribuicoes(atribuicoes: list, treinos: list) -> list:
+    """Treinos apontados pelas atribuições do delta que não mudaram (p. ex. um treino antigo recém-atribuído)."""
+    presentes = {t["id"] for t in treinos}
+    faltando = {a["idTreino"] for a in atribuicoes if a.get("idTreino")} - presentes
+    if not faltando:
+        return []
+    return await _buscar_treinos({"id": {"$in": sorted(faltando)}})
+
+
+async def _remocoes(id_usuario: str, desde: str) -> list:
+    return await remocoes_collection.find(
+        {"escopos": id_usuario, "modificadoEm": {"$gte": desde}},
+        {"_id": 0, "colecao": 1, "id": 1, "versaoSync": 1, "modificadoEm": 1},
+    ).to_list(None)
+
+
+def _resposta(token: str, completo: bool, mais: bool = False, **colecoes) -> dict:
+    vazio = {"usuarios": [], "treinos": [], "atribuicoes": [], "execucoes": [], "removidos": []}
+    return {"token": token, "completo": completo, "mais": mais, **vazio, **colecoes}
+
+
+def _token(versao: int, lido_em: str, versao_em: str, desde: Optional[str] = None, execucoes: Optional[str] = None) -> str:
+    valores = {"versao": versao, "lidoEm": lido_em, "versaoEm": versao_em, "desde": desde, "execucoes": execucoes}
+    return codificar_cursor(valores, CAMPOS_TOKEN)
+
+
+def _ler_token(token: str) -> dict:
+    try:
+        valores = decodificar_cursor(token, CAMPOS_TOKEN)
+    except HTTPException:
+        valores = decodificar_cursor(token, CAMPOS_TOKEN_ANTIGO) + [None, None]
+    return dict(zip((campo for campo, _ in CAMPOS_TOKEN), valores))
+
+
+async def sincronizar(usuario: dict, token: Optional[str] = None) -> dict:
+    """Mudanças visíveis para `usuario` desde `token` (ou tudo, sem token)."""
+    agora = _agora()
+    anterior = _ler_token(token) if token else None
+
+    if anterior and anterior["execucoes"]:
+        # Continuação: só as próximas execuções da mesma leitura
+        escopos = await _escopos_leitura(usuario)
+        execucoes, proximo = await _buscar_execucoes(escopos["execucoes"], anterior["desde"], anterior["execucoes"])
+        novo_token = _token(
+            anterior["versao"], anterior["lidoEm"], anterior["versaoEm"],
+            anterior["desde"] if proximo else None, proximo,
+        )
+        return _resposta(novo_token, False, proximo is not None, execucoes=execucoes)
+
+    # O contador é lido antes dos dados: tudo até `versao` já foi reservado
+    versao, atualizado_em = await _ler_contador()
+    versao_em = _iso(atualizado_em or datetime.min.replace(tzinfo=timezone.utc))
+
+    desde = None
+    if anterior:
+        try:
+            lido_em_data = datetime.fromisoformat(anterior["lidoEm"])
+            assentado = lido_em_data - datetime.fromisoformat(anterior["versaoEm"]) >= timedelta(seconds=SYNC_SOBREPOSICAO_S)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+
+        if agora - lido_em_data > timedelta(days=SYNC_RETENCAO_DIAS):
+            raise HTTPException(status_code=410, detail="Token de sincronização expirado; sincronize do zero")
+
+        # Nenhuma reserva nova e todas as anteriores já estavam gravadas na última leitura
+        if versao == anterior["versao"] and assentado:
+            return _resposta(_token(versao, _iso(agora), versao_em), False)
+
+        desde = _iso(lido_em_data - timedelta(seconds=SYNC_SOBREPOSICAO_S))
+
+    escopos = await _escopos_leitura(usuario)
+    usuarios, treinos, atribuicoes, (execucoes, proximo), removidos = await asyncio.gather(
+        _buscar(usuarios_collection, _desde(escopos["usuarios"], desde), UsuarioResponse),
+        _buscar_treinos(_desde(escopos["treinos"], desde)),
+        _buscar(atribuicoes_collection, _desde(escopos["atribuicoes"], desde), AtribuicaoResponse),
+        _buscar_execucoes(escopos["execucoes"], desde),
+        _remocoes(usuario["id"], desde) if desde else asyncio.sleep(0, []),
+    )
+    if desde:
+        treinos += await _treinos_das_atribuicoes(atribuicoes, treinos)
+
+    novo_token = _token(versao, _iso(agora), versao_em, desde if proximo else None, proximo)
+    return _resposta(
+        novo_token,
+        desde is None,
+        proximo is not None,
+        usuarios=usuarios,
+        treinos=treinos,
+        atribuicoes=atribuicoes,
+        execucoes=execucoes,
+        removidos=removidos,
+    )
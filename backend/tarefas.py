@@ -0,0 +1,334 @@
+"""Tarefas em segundo plano: trabalho pesado fora do caminho da requisição.
+
+Cada tarefa é um documento em `tarefas`:
+
+    {id, tipo, parametros, status, tentativas, maxTentativas, executarEm,
+     bloqueadaAte, trabalhador, progresso, resultado, erro, criadoPor,
+     criadaEm, iniciadaEm, concluidaEm}
+
+    status: pendente -> executando -> concluida | falhou
+
+Cada processo do servidor roda TAREFAS_WORKERS workers, que disputam as
+tarefas no próprio banco (find_one_and_update), então vários processos podem
+rodar workers sem outra coordenação. A tarefa pega fica bloqueada por
+TAREFAS_BLOQUEIO_S, renovado enquanto ela roda; se o processo morrer, o
+bloqueio expira e a tarefa volta para a fila. Por isso os tipos de tarefa
+precisam poder ser executados de novo do começo (idempotentes).
+
+Uma tarefa que levanta exceção volta a `pendente` com espera exponencial
+(TAREFAS_ESPERA_S, dobrando a cada tentativa até TAREFAS_ESPERA_MAX_S);
+depois de `maxTentativas` fica como `falhou`, com o erro. Tarefas encerradas
+expiram após TAREFAS_RETENCAO_DIAS.
+
+Novos tipos se registram com o decorador:
+
+    @tipo_tarefa("reconstruir_algo")
+    async def reconstruir_algo(parametros: dict, andamento: Andamento) -> dict:
+        ...
+        await andamento.registrar(processados=n)   # aparece em `progresso`
+        return {"total": n}                        # vira `resultado`
+
+Uso:
+    python tarefas.py trabalhar                          # só os workers, sem o servidor HTTP
+    python tarefas.py enfileirar <tipo> ['{"param": 1}']
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import secrets
+import socket
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+from database import tarefas_collection
+from metricas import Contador, Medidor, Histograma
+
+logger = logging.getLogger(__name__)
+
+TAREFAS_WORKERS = int(os.getenv("TAREFAS_WORKERS", "2"))
+TAREFAS_INTERVALO_S = float(os.getenv("TAREFAS_INTERVALO_S", "5"))
+TAREFAS_BLOQUEIO_S = float(os.getenv("TAREFAS_BLOQUEIO_S", "60"))
+TAREFAS_TENTATIVAS = int(os.getenv("TAREFAS_TENTATIVAS", "5"))
+TAREFAS_ESPERA_S = float(os.getenv("TAREFAS_ESPERA_S", "10"))
+TAREFAS_ESPERA_MAX_S = float(os.getenv("TAREFAS_ESPERA_MAX_S", "900"))
+TAREFAS_RETENCAO_DIAS = int(os.getenv("TAREFAS_RETENCAO_DIAS", "7"))
+
+PENDENTE = "pendente"
+EXECUTANDO = "executando"
+CONCLUIDA = "concluida"
+FALHOU = "falhou"
+
+# tipo -> função assíncrona (parametros, andamento) -> resultado
+TIPOS = {}
+
+execucoes_total = Contador(
+    "strongify_tarefas_total", "Execuções de tarefas em segundo plano por resultado", ("tipo", "resultado")
+)
+duracao_segundos = Histograma(
+    "strongify_tarefas_duracao_segundos", "Duração de cada execução de tarefa", ("tipo",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0),
+)
+em_execucao = Medidor("strongify_tarefas_em_execucao", "Tarefas executando neste processo")
+
+METRICAS = [execucoes_total, duracao_segundos, em_execucao]
+
+
+class TarefaPerdida(Exception):
+    """O bloqueio expirou e outro worker assumiu a tarefa."""
+
+
+def _agora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def novo_id() -> str:
+    return f"TRF{int(datetime.now().timestamp())}{secrets.token_hex(4)}"
+
+
+def tipo_tarefa(nome: str):
+    def registrar(funcao):
+        TIPOS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def espera_tentativa(tentativas: int) -> float:
+    """Segundos até a próxima tentativa, com variação para as repetições não chegarem juntas."""
+    espera = min(TAREFAS_ESPERA_MAX_S, TAREFAS_ESPERA_S * 2 ** max(0, tentativas - 1))
+    return espera * random.uniform(0.75, 1.0)
+
+
+# ==================== FILA ====================
+
+_sinal = None  # acorda os workers deste processo quando ele mesmo enfileira
+
+
+async def enfileirar(tipo: str, parametros: dict = None, criado_por: str = None,
+                     max_tentativas: int = TAREFAS_TENTATIVAS) -> dict:
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+    agora = _agora()
+    tarefa = {
+        "id": novo_id(),
+        "tipo": tipo,
+        "parametros": parametros or {},
+        "status": PENDENTE,
+        "tentativas": 0,
+        "maxTentativas": max_tentativas,
+        "executarEm": agora,
+        "progresso": {},
+        "criadoPor": criado_por,
+        "criadaEm": agora,
+    }
+    await tarefas_collection.insert_one(tarefa)
+    tarefa.pop("_id", None)
+    if _sinal is not None:
+        _sinal.set()
+    return tarefa
+
+
+async def buscar_tarefa(id: str):
+    return await tarefas_collection.find_one({"id": id}, {"_id": 0})
+
+
+async def _recuperar_expiradas():
+    """Devolve à fila as tarefas de workers que morreram (a tentativa perdida conta)."""
+    agora = _agora()
+    resultado = await tarefas_collection.update_many(
+        {"status": EXECUTANDO, "bloqueadaAte": {"$lt": agora}},
+        {"$set": {"status": PENDENTE, "executarEm": agora, "erro": "Bloqueio expirado"},
+         "$unset": {"trabalhador": "", "bloqueadaAte": ""}},
+    )
+    if resultado.modified_count:
+        logger.warning("%d tarefa(s) com bloqueio expirado voltaram para a fila", resultado.modified_count)
+
+
+async def _pegar(trabalhador: str):
+    agora = _agora()
+    return await tarefas_collection.find_one_and_update(
+        {"status": PENDENTE, "executarEm": {"$lte": agora}},
+        {
+            "$set": {
+                "status": EXECUTANDO,
+                "trabalhador": trabalhador,
+                "bloqueadaAte": agora + timedelta(seconds=TAREFAS_BLOQUEIO_S),
+                "iniciadaEm": agora,
+            },
+            "$inc": {"tentativas": 1},
+        },
+        sort=[("executarEm", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+# ==================== EXECUÇÃO ====================
+
+class Andamento:
+    """O que a função da tarefa enxerga do runner: progresso e bloqueio."""
+
+    def __init__(self, tarefa: dict, trabalhador: str):
+        self.tarefa = tarefa
+        self.trabalhador = trabalhador
+        self.perdida = False
+
+    def _filtro(self) -> dict:
+        return {"id": self.tarefa["id"], "status": EXECUTANDO, "trabalhador": self.trabalhador}
+
+    async def renovar(self, extra: dict = None):
+        resultado = await tarefas_collection.update_one(
+            self._filtro(),
+            {"$set": {"bloqueadaAte": _agora() + timedelta(seconds=TAREFAS_BLOQUEIO_S), **(extra or {})}},
+        )
+        if resultado.matched_count == 0:
+            self.perdida = True
+
+    async def registrar(self, **progresso):
+        """Grava contadores em `progresso` e renova o bloqueio."""
+        if self.perdida:
+            raise TarefaPerdida(self.tarefa["id"])
+        await self.renovar({f"progresso.{campo}": valor for campo, valor in progresso.items()})
+        if self.perdida:
+            raise TarefaPerdida(self.tarefa["id"])
+
+    async def _manter(self):
+        # Renova sozinho, para passos longos que não chamam `registrar`
+        while not self.perdida:
+            await asyncio.sleep(TAREFAS_BLOQUEIO_S / 3)
+            try:
+                await self.renovar()
+            except Exception:
+                logger.exception("Falha ao renovar o bloqueio da tarefa %s", self.tarefa["id"])
+
+    async def encerrar(self, atualizacao: dict):
+        await tarefas_collection.update_one(self._filtro(), atualizacao)
+
+
+async def executar(tarefa: dict, trabalhador: str):
+    tipo = tarefa["tipo"]
+    andamento = Andamento(tarefa, trabalhador)
+    funcao = TIPOS.get(tipo)
+    inicio = time.perf_counter()
+    manter = asyncio.create_task(andamento._manter())
+    em_execucao.inc()
+    try:
+        if funcao is None:
+            raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+        resultado = await funcao(tarefa.get("parametros") or {}, andamento)
+    except TarefaPerdida:
+        execucoes_total.inc(tipo, "perdida")
+        logger.warning("Tarefa %s (%s) assumida por outro worker", tarefa["id"], tipo)
+    except asyncio.CancelledError:
+        # Desligamento: devolve a tarefa sem gastar a tentativa
+        await asyncio.shield(andamento.encerrar({
+            "$set": {"status": PENDENTE, "executarEm": _agora()},
+            "$unset": {"trabalhador": "", "bloqueadaAte": ""},
+            "$inc": {"tentativas": -1},
+        }))
+        raise
+    except Exception as erro:
+        await _falhar(tarefa, andamento, erro, definitivo=funcao is None)
+    else:
+        execucoes_total.inc(tipo, CONCLUIDA)
+        await andamento.encerrar({
+            "$set": {"status": CONCLUIDA, "resultado": resultado, "concluidaEm": _agora(), "erro": None},
+            "$unset": {"trabalhador": "", "bloqueadaAte": ""},
+        })
+        logger.info("Tarefa %s (%s) concluída: %s", tarefa["id"], tipo, resultado)
+    finally:
+        manter.cancel()
+        em_execucao.dec()
+        duracao_segundos.observar(time.perf_counter() - inicio, tipo)
+
+
+async def _falhar(tarefa: dict, andamento: Andamento, erro: Exception, definitivo: bool = False):
+    tipo, tentativas = tarefa["tipo"], tarefa["tentativas"]
+    mensagem = f"{type(erro).__name__}: {erro}"
+    if definitivo or tentativas >= tarefa.get("maxTentativas", TAREFAS_TENTATIVAS):
+        execucoes_total.inc(tipo, FALHOU)
+        logger.error("Tarefa %s (%s) falhou após %d tentativa(s): %s", tarefa["id"], tipo, tentativas, mensagem)
+        atualizacao = {"status": FALHOU, "erro": mensagem, "concluidaEm": _agora()}
+    else:
+        espera = espera_tentativa(tentativas)
+        execucoes_total.inc(tipo, "repetida")
+        logger.warning("Tarefa %s (%s) falhou (tentativa %d), nova tentativa em %.0fs: %s",
+                       tarefa["id"], tipo, tentativas, espera, mensagem)
+        atualizacao = {"status": PENDENTE, "erro": mensagem, "executarEm": _agora() + timedelta(seconds=espera)}
+    await andamento.encerrar({"$set": atualizacao, "$unset": {"trabalhador": "", "bloqueadaAte": ""}})
+
+
+async def _esperar():
+    try:
+        await asyncio.wait_for(_sinal.wait(), TAREFAS_INTERVALO_S)
+    except asyncio.TimeoutError:
+        await _recuperar_expiradas()
+    _sinal.clear()
+
+
+async def _trabalhar(trabalhador: str):
+    while True:
+        try:
+            tarefa = await _pegar(trabalhador)
+            if tarefa is None:
+                await _esperar()
+                continue
+            await executar(tarefa, trabalhador)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Mongo fora do ar, por exemplo: tenta de novo no próximo ciclo
+            logger.exception("Falha no worker de tarefas %s", trabalhador)
+            await asyncio.sleep(TAREFAS_INTERVALO_S)
+
+
+_workers = []
+
+
+def iniciar(workers: int = TAREFAS_WORKERS):
+    global _sinal
+    if _workers or workers <= 0:
+        return
+    _sinal = asyncio.Event()
+    prefixo = f"{socket.gethostname()}:{os.getpid()}"
+    for n in range(workers):
+        _workers.append(asyncio.create_task(_trabalhar(f"{prefixo}:{n}")))
+
+
+async def encerrar():
+    for worker in _workers:
+        worker.cancel()
+    for worker in _workers:
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+    _workers.clear()
+
+
+async def _main(argv):
+    import manutencao  # noqa: F401 (registra os tipos de tarefa)
+
+    if argv[:1] == ["trabalhar"]:
+        iniciar(max(1, TAREFAS_WORKERS))
+        await asyncio.gather(*_workers)
+    elif argv[:1] == ["enfileirar"] and len(argv) in (2, 3):
+        parametros = json.loads(argv[2]) if len(argv) == 3 else {}
+        tarefa = await enfileirar(argv[1], parametros)
+        print(tarefa["id"])
+    else:
+        print(__doc__)
+        print("Tipos:", ", ".join(sorted(TIPOS)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # Pelo módulo importado, onde `manutencao` registra os tipos (não em __main__)
+    import tarefas
+    sys.exit(asyncio.run(tarefas._main(sys.argv[1:])))
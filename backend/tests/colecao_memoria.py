@@ -0,0 +1,396 @@
+"""Coleção do Motor em memória, com o subconjunto da API que os testes usam.
+
+Cobre os filtros ($in, $lt/$gt..., $ne, $exists, $or/$and, arrays, caminhos
+com ponto), as atualizações ($set, $unset, $inc, $push, $min, $max,
+$addToSet, $setOnInsert) com upsert, bulk_write, find_one_and_update e os
+estágios de aggregate usados pelos repositórios ($match, $sort, $limit,
+$skip, $project, $unwind, $replaceRoot). Não é um Mongo: serve para testar a
+lógica em volta das consultas, não as consultas contra o servidor.
+"""
+import copy
+from itertools import count
+from types import SimpleNamespace
+
+from pymongo import ReturnDocument
+
+AUSENTE = object()
+
+
+# ==================== CAMPOS ====================
+
+def pegar(doc, caminho: str):
+    """Valor do caminho com ponto; em arrays de documentos, a lista dos valores."""
+    valor = doc
+    for parte in caminho.split("."):
+        if isinstance(valor, dict):
+            valor = valor.get(parte, AUSENTE)
+        elif isinstance(valor, list):
+            valores = [v.get(parte, AUSENTE) for v in valor if isinstance(v, dict)]
+            valor = [v for v in valores if v is not AUSENTE] or AUSENTE
+        else:
+            return AUSENTE
+        if valor is AUSENTE:
+            return AUSENTE
+    return valor
+
+
+def _definir(doc: dict, caminho: str, valor):
+    *partes, ultima = caminho.split(".")
+    for parte in partes:
+        doc = doc.setdefault(parte, {})
+    doc[ultima] = valor
+
+
+def _remover(doc: dict, caminho: str):
+    *partes, ultima = caminho.split(".")
+    for parte in partes:
+        doc = doc.get(parte)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(ultima, None)
+
+
+# ==================== FILTROS ====================
+
+def _comparar(a, b, operador) -> bool:
+    if a is AUSENTE or a is None or b is None:
+        return False
+    try:
+        return operador(a, b)
+    except TypeError:
+        return False
+
+
+OPERADORES = {
+    "$gt": lambda a, b: _comparar(a, b, lambda x, y: x > y),
+    "$gte": lambda a, b: _comparar(a, b, lambda x, y: x >= y),
+    "$lt": lambda a, b: _comparar(a, b, lambda x, y: x < y),
+    "$lte": lambda a, b: _comparar(a, b, lambda x, y: x <= y),
+    "$eq": lambda a, b: a == b or (a is AUSENTE and b is None),
+    "$in": lambda a, b: any(OPERADORES["$eq"](a, v) for v in b),
+}
+
+
+def _casa_valor(valor, condicao) -> bool:
+    if isinstance(condicao, dict) and condicao and all(k.startswith("$") for k in condicao):
+        return all(_casa_operador(valor, op, arg) for op, arg in condicao.items())
+    return _casa_operador(valor, "$eq", condicao)
+
+
+def _casa_operador(valor, op: str, arg) -> bool:
+    if op == "$ne":
+        return not _casa_operador(valor, "$eq", arg)
+    if op == "$nin":
+        return not _casa_operador(valor, "$in", arg)
+    if op == "$exists":
+        return (valor is not AUSENTE) == bool(arg)
+    if op == "$not":
+        return not _casa_valor(valor, arg)
+    funcao = OPERADORES[op]
+    if isinstance(valor, list) and funcao(valor, arg):
+        return True
+    # Um array casa quando algum dos elementos casa
+    candidatos = valor if isinstance(valor, list) else [valor]
+    return any(funcao(v, arg) for v in candidatos)
+
+
+def casa(doc: dict, filtro: dict) -> bool:
+    for campo, condicao in (filtro or {}).items():
+        if campo == "$or":
+            if not any(casa(doc, f) for f in condicao):
+                return False
+        elif campo == "$and":
+            if not all(casa(doc, f) for f in condicao):
+                return False
+        elif campo == "$nor":
+            if any(casa(doc, f) for f in condicao):
+                return False
+        elif not _casa_valor(pegar(doc, campo), condicao):
+            return False
+    return True
+
+
+# ==================== ORDENAÇÃO E PROJEÇÃO ====================
+
+def _chaves_ordem(ordem, direcao=None) -> list:
+    if isinstance(ordem, str):
+        return [(ordem, direcao or 1)]
+    if isinstance(ordem, dict):
+        return list(ordem.items())
+    return list(ordem)
+
+
+def ordenar(docs: list, ordem) -> list:
+    docs = list(docs)
+    # Ordenações estáveis do último critério para o primeiro; ausente/None vêm antes
+    for campo, direcao in reversed(_chaves_ordem(ordem)):
+        def chave(doc, campo=campo):
+            valor = pegar(doc, campo)
+            return (0, None) if valor is AUSENTE or valor is None else (1, valor)
+        docs.sort(key=chave, reverse=direcao == -1)
+    return docs
+
+
+def _incluir(doc, caminhos: list):
+    if isinstance(doc, list):
+        return [_incluir(item, caminhos) for item in doc if isinstance(item, dict)]
+    resultado = {}
+    for caminho in caminhos:
+        primeiro, _, resto = caminho.partition(".")
+        if primeiro not in doc:
+            continue
+        if resto and isinstance(doc[primeiro], (dict, list)):
+            parcial = _incluir(doc[primeiro], [resto])
+            atual = resultado.get(primeiro)
+            if isinstance(atual, dict):
+                atual.update(parcial)
+            elif isinstance(atual, list):
+                for existente, novo in zip(atual, parcial):
+                    existente.update(novo)
+            else:
+                resultado[primeiro] = parcial
+        elif not resto:
+            resultado[primeiro] = copy.deepcopy(doc[primeiro])
+    return resultado
+
+
+def projetar(doc: dict, projecao) -> dict:
+    if not projecao:
+        return copy.deepcopy(doc)
+    incluidos = [c for c, v in projecao.items() if v and c != "_id"]
+    if incluidos:
+        resultado = _incluir(doc, incluidos)
+        if projecao.get("_id", 1) and "_id" in doc:
+            resultado["_id"] = doc["_id"]
+        return resultado
+    resultado = copy.deepcopy(doc)
+    for campo in projecao:
+        _remover(resultado, campo)
+    return resultado
+
+
+# ==================== ATUALIZAÇÃO ====================
+
+def aplicar(doc: dict, atualizacao: dict, inserindo: bool = False):
+    for op, campos in atualizacao.items():
+        if op == "$setOnInsert" and not inserindo:
+            continue
+        for campo, valor in campos.items():
+            atual = pegar(doc, campo)
+            if op in ("$set", "$setOnInsert"):
+                _definir(doc, campo, copy.deepcopy(valor))
+            elif op == "$unset":
+                _remover(doc, campo)
+            elif op == "$inc":
+                _definir(doc, campo, (0 if atual is AUSENTE else atual) + valor)
+            elif op == "$push":
+                _definir(doc, campo, (list(atual) if atual is not AUSENTE else []) + [copy.deepcopy(valor)])
+            elif op == "$addToSet":
+                lista = list(atual) if atual is not AUSENTE else []
+                if valor not in lista:
+                    lista.append(copy.deepcopy(valor))
+                _definir(doc, campo, lista)
+            elif op == "$min":
+                if atual is AUSENTE or atual is None or valor < atual:
+                    _definir(doc, campo, valor)
+            elif op == "$max":
+                if atual is AUSENTE or atual is None or (valor is not None and valor > atual):
+                    _definir(doc, campo, valor)
+            else:
+                raise NotImplementedError(op)
+
+
+def _semente(filtro: dict) -> dict:
+    """Campos de igualdade do filtro, que o upsert copia para o documento novo."""
+    doc = {}
+    for campo, condicao in filtro.items():
+        if campo.startswith("$"):
+            continue
+        if isinstance(condicao, dict) and all(k.startswith("$") for k in condicao):
+            if "$eq" in condicao:
+                _definir(doc, campo, condicao["$eq"])
+            continue
+        _definir(doc, campo, copy.deepcopy(condicao))
+    return doc
+
+
+# ==================== CURSOR E COLEÇÃO ====================
+
+class CursorMemoria:
+    def __init__(self, gerar, projecao=None):
+        self._gerar = gerar
+        self._projecao = projecao
+        self._ordem = None
+        self._limite = 0
+        self._pular = 0
+
+    def sort(self, ordem, direcao=None):
+        self._ordem = _chaves_ordem(ordem, direcao)
+        return self
+
+    def limit(self, limite: int):
+        self._limite = limite
+        return self
+
+    def skip(self, pular: int):
+        self._pular = pular
+        return self
+
+    def batch_size(self, _):
+        return self
+
+    def _docs(self) -> list:
+        docs = self._gerar()
+        if self._ordem:
+            docs = ordenar(docs, self._ordem)
+        docs = docs[self._pular:]
+        docs = docs[:self._limite] if self._limite else docs
+        # Como no servidor, a projeção vem depois da ordenação
+        return [projetar(doc, self._projecao) for doc in docs]
+
+    async def to_list(self, tamanho=None):
+        docs = self._docs()
+        return docs[:tamanho] if tamanho else docs
+
+    def __aiter__(self):
+        return self._iterar()
+
+    async def _iterar(self):
+        for doc in self._docs():
+            yield doc
+
+
+class ColecaoMemoria:
+    def __init__(self, docs=()):
+        self._ids = count(1)
+        self.docs = []
+        for doc in docs:
+            self._inserir(doc)
+
+    def _inserir(self, doc: dict):
+        doc.setdefault("_id", next(self._ids))
+        self.docs.append(copy.deepcopy(doc))
+        return doc["_id"]
+
+    def _casados(self, filtro) -> list:
+        return [doc for doc in self.docs if casa(doc, filtro)]
+
+    # Leitura
+
+    def find(self, filtro=None, projecao=None, **kwargs):
+        projecao = projecao or kwargs.get("projection")
+        cursor = CursorMemoria(lambda: self._casados(filtro), projecao)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        return cursor
+
+    async def find_one(self, filtro=None, projecao=None, **kwargs):
+        docs = await self.find(filtro, projecao, **kwargs).limit(1).to_list(None)
+        return docs[0] if docs else None
+
+    async def count_documents(self, filtro):
+        return len(self._casados(filtro))
+
+    async def distinct(self, campo: str, filtro=None):
+        valores = []
+        for doc in self._casados(filtro):
+            valor = pegar(doc, campo)
+            for v in valor if isinstance(valor, list) else [valor]:
+                if v is not AUSENTE and v not in valores:
+                    valores.append(v)
+        return valores
+
+    # Escrita
+
+    async def insert_one(self, doc: dict):
+        return SimpleNamespace(inserted_id=self._inserir(doc))
+
+    async def insert_many(self, docs: list, ordered: bool = True):
+        return SimpleNamespace(inserted_ids=[self._inserir(doc) for doc in docs])
+
+    def _atualizar(self, filtro, atualizacao, upsert=False, varios=False, ordem=None):
+        casados = self._casados(filtro)
+        if ordem:
+            casados = [d for d in ordenar(casados, ordem)]
+        if not varios:
+            casados = casados[:1]
+        modificados = 0
+        for doc in casados:
+            antes = copy.deepcopy(doc)
+            aplicar(doc, atualizacao)
+            modificados += doc != antes
+        upserted_id = None
+        if not casados and upsert:
+            novo = _semente(filtro)
+            aplicar(novo, atualizacao, inserindo=True)
+            upserted_id = self._inserir(novo)
+        return SimpleNamespace(
+            matched_count=len(casados), modified_count=modificados, upserted_id=upserted_id, docs=casados
+        )
+
+    async def update_one(self, filtro, atualizacao, upsert=False):
+        return self._atualizar(filtro, atualizacao, upsert)
+
+    async def update_many(self, filtro, atualizacao, upsert=False):
+        return self._atualizar(filtro, atualizacao, upsert, varios=True)
+
+    async def find_one_and_update(self, filtro, atualizacao, projection=None, sort=None,
+                                  upsert=False, return_document=ReturnDocument.BEFORE):
+        casados = ordenar(self._casados(filtro), sort) if sort else self._casados(filtro)
+        if not casados and not upsert:
+            return None
+        antes = projetar(casados[0], projection) if casados else None
+        if casados:
+            aplicar(casados[0], atualizacao)
+            depois = casados[0]
+        else:
+            depois = _semente(filtro)
+            aplicar(depois, atualizacao, inserindo=True)
+            self._inserir(depois)
+            depois = self.docs[-1]
+        return projetar(depois, projection) if return_document == ReturnDocument.AFTER else antes
+
+    async def bulk_write(self, operacoes: list, ordered: bool = True):
+        for operacao in operacoes:
+            if hasattr(operacao, "_filter"):
+                self._atualizar(operacao._filter, operacao._doc, operacao._upsert)
+            else:
+                self._inserir(operacao._doc)
+        return SimpleNamespace(acknowledged=True)
+
+    async def delete_one(self, filtro):
+        casados = self._casados(filtro)[:1]
+        self.docs = [doc for doc in self.docs if all(doc is not c for c in casados)]
+        return SimpleNamespace(deleted_count=len(casados))
+
+    async def delete_many(self, filtro):
+        antes = len(self.docs)
+        self.docs = [doc for doc in self.docs if not casa(doc, filtro)]
+        return SimpleNamespace(deleted_count=antes - len(self.docs))
+
+    # Aggregate
+
+    def aggregate(self, pipeline: list, **kwargs):
+        def gerar():
+            docs = [copy.deepcopy(doc) for doc in self.docs]
+            for estagio in pipeline:
+                (nome, arg), = estagio.items()
+                if nome == "$match":
+                    docs = [doc for doc in docs if casa(doc, arg)]
+                elif nome == "$sort":
+                    docs = ordenar(docs, arg)
+                elif nome == "$limit":
+                    docs = docs[:arg]
+                elif nome == "$skip":
+                    docs = docs[arg:]
+                elif nome == "$project":
+                    docs = [projetar(doc, arg) for doc in docs]
+                elif nome == "$unwind":
+                    campo = (arg if isinstance(arg, str) else arg["path"])[1:]
+                    docs = [{**doc, campo: item} for doc in docs for item in pegar(doc, campo) or []]
+                elif nome == "$replaceRoot":
+                    docs = [copy.deepcopy(pegar(doc, arg["newRoot"][1:])) for doc in docs]
+                else:
+                    raise NotImplementedError(nome)
+            return docs
+        return CursorMemoria(gerar)
@@ -0,0 +1,165 @@
+"""RedisBackend contra um servidor RESP mínimo em asyncio (sem Redis instalado).
+
+Na pasta backend/:
+    python -m unittest discover -s tests -t .
+"""
+import asyncio
+import unittest
+
+from cache import RedisBackend
+
+
+class ServidorRESP:
+    """Fala o suficiente do protocolo do Redis para o RedisBackend: GET, SET, DEL, AUTH e SELECT."""
+
+    def __init__(self, senha: str = None):
+        self.senha = senha
+        self.dados = {}
+        self.expiracoes = {}
+        self.comandos = []
+        self.conexoes = 0
+        self.erro_em = None  # nome de comando que responde com erro
+        self._servidor = None
+        self._atendimentos = set()
+
+    async def iniciar(self) -> int:
+        self._servidor = await asyncio.start_server(self._atender, "127.0.0.1", 0)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def parar(self):
+        if not self._servidor.is_serving():
+            return
+        self._servidor.close()
+        await self._servidor.wait_closed()
+        # Encerra as conexões abertas e espera os atendimentos terminarem
+        for atendimento in self._atendimentos:
+            atendimento.cancel()
+        await asyncio.gather(*self._atendimentos, return_exceptions=True)
+
+    async def _ler_comando(self, reader) -> list:
+        linha = await reader.readline()
+        if not linha:
+            return None
+        assert linha.startswith(b"*"), linha
+        args = []
+        for _ in range(int(linha[1:-2])):
+            tamanho = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(tamanho + 2))[:-2])
+        return args
+
+    async def _atender(self, reader, writer):
+        self._atendimentos.add(asyncio.current_task())
+        self.conexoes += 1
+        autenticado = self.senha is None
+        try:
+            while True:
+                args = await self._ler_comando(reader)
+                if args is None:
+                    break
+                nome = args[0].decode().upper()
+                self.comandos.append([nome, *args[1:]])
+                writer.write(self._responder(nome, args[1:], autenticado))
+                if nome == "AUTH" and args[1].decode() == self.senha:
+                    autenticado = True
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def _responder(self, nome: str, args: list, autenticado: bool) -> bytes:
+        if nome == self.erro_em:
+            return b"-ERR falha simulada\r\n"
+        if nome == "AUTH":
+            return b"+OK\r\n" if args[0].decode() == self.senha else b"-WRONGPASS senha invalida\r\n"
+        if not autenticado:
+            return b"-NOAUTH Authentication required.\r\n"
+        if nome == "SELECT":
+            return b"+OK\r\n"
+        if nome == "GET":
+            valor = self.dados.get(args[0])
+            return b"$-1\r\n" if valor is None else b"$%d\r\n%s\r\n" % (len(valor), valor)
+        if nome == "SET":
+            self.dados[args[0]] = args[1]
+            if len(args) >= 4 and args[2].upper() == b"EX":
+                self.expiracoes[args[0]] = int(args[3])
+            return b"+OK\r\n"
+        if nome == "DEL":
+            removidas = sum(1 for chave in args if self.dados.pop(chave, None) is not None)
+            return b":%d\r\n" % removidas
+        return b"-ERR unknown command\r\n"
+
+
+class RedisBackendTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.servidor = ServidorRESP()
+        self.porta = await self.servidor.iniciar()
+        self.backend = RedisBackend(f"redis://127.0.0.1:{self.porta}/0", ttl=120)
+
+    async def asyncTearDown(self):
+        self.backend._fechar()
+        await self.servidor.parar()
+
+    async def test_set_e_get_em_json_com_ttl(self):
+        valor = {"id": "T1", "nome": "Treino A\r\nB", "exercicios": [{"series": 4}]}
+        await self.backend.set("treino:T1", valor)
+
+        self.assertEqual(await self.backend.get("treino:T1"), valor)
+        self.assertEqual(self.servidor.expiracoes[b"treino:T1"], 120)
+
+    async def test_chave_ausente(self):
+        self.assertIsNone(await self.backend.get("treino:nao-existe"))
+
+    async def test_delete_varias_chaves_num_comando(self):
+        await self.backend.set("a", 1)
+        await self.backend.set("b", 2)
+
+        await self.backend.delete("a", "b")
+
+        self.assertIsNone(await self.backend.get("a"))
+        self.assertIsNone(await self.backend.get("b"))
+        self.assertIn(["DEL", b"a", b"b"], self.servidor.comandos)
+
+    async def test_reusa_a_conexao(self):
+        for i in range(5):
+            await self.backend.set(f"k{i}", i)
+        self.assertEqual(self.servidor.conexoes, 1)
+
+    async def test_chamadas_concorrentes_sao_serializadas(self):
+        await asyncio.gather(*(self.backend.set(f"k{i}", i) for i in range(20)))
+        valores = await asyncio.gather(*(self.backend.get(f"k{i}") for i in range(20)))
+        self.assertEqual(valores, list(range(20)))
+
+    async def test_erro_do_servidor_vira_ausencia_e_reconecta(self):
+        await self.backend.set("k", "v")
+        self.servidor.erro_em = "GET"
+        self.assertIsNone(await self.backend.get("k"))
+
+        self.servidor.erro_em = None
+        self.assertEqual(await self.backend.get("k"), "v")
+        self.assertEqual(self.servidor.conexoes, 2)
+
+    async def test_servidor_fora_do_ar_nao_levanta(self):
+        await self.servidor.parar()
+        backend = RedisBackend(f"redis://127.0.0.1:{self.porta}/0", timeout=0.2)
+
+        self.assertIsNone(await backend.get("k"))
+        await backend.set("k", "v")
+        await backend.delete("k")
+
+
+class RedisBackendAutenticacaoTest(unittest.IsolatedAsyncioTestCase):
+    async def test_auth_e_select_da_url(self):
+        servidor = ServidorRESP(senha="segredo")
+        porta = await servidor.iniciar()
+        backend = RedisBackend(f"redis://:segredo@127.0.0.1:{porta}/3")
+        try:
+            await backend.set("k", [1, 2])
+            self.assertEqual(await backend.get("k"), [1, 2])
+            self.assertEqual(servidor.comandos[0], ["AUTH", b"segredo"])
+            self.assertEqual(servidor.comandos[1], ["SELECT", b"3"])
+        finally:
+            backend._fechar()
+            await servidor.parar()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""Formato de execuções em buckets: virada de bucket em MAX_POR_BUCKET e ordem da leitura.
+
+As coleções são trocadas por `ColecaoMemoria`; os dois formatos do
+repositório rodam sobre os mesmos dados e precisam devolver as mesmas páginas.
+
+Na pasta backend/:
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+from unittest import mock
+
+import execucoes
+from execucoes import ExecucoesBuckets, ExecucoesDocumentos, montar_buckets, migrar_para_buckets
+from tests.colecao_memoria import ColecaoMemoria
+
+
+def execucao(n: int, data: str, aluno: str = "ALN1", atribuicao: str = "ATR1", duracao: int = 30) -> dict:
+    return {
+        "id": f"EXE{n:03d}",
+        "idAluno": aluno,
+        "idAtribuicao": atribuicao,
+        "dataExecucao": data,
+        "duracao": duracao,
+        "exercicios": [],
+        "modificadoEm": data,
+    }
+
+
+class BucketsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.repositorio = ExecucoesBuckets()
+        self.repositorio.collection = ColecaoMemoria()
+        self.chaves = ColecaoMemoria()
+        for alvo in (
+            mock.patch.object(execucoes, "MAX_POR_BUCKET", 3),
+            mock.patch.object(execucoes, "execucoes_chaves_collection", self.chaves),
+        ):
+            alvo.start()
+            self.addCleanup(alvo.stop)
+
+    def buckets(self) -> list:
+        return sorted(self.repositorio.collection.docs, key=lambda b: (b["mes"], b["inicio"]))
+
+    async def test_bucket_cheio_abre_outro_no_mesmo_mes(self):
+        for n in range(7):
+            await self.repositorio.inserir(execucao(n, f"2026-03-{n + 1:02d}T10:00:00"))
+
+        buckets = self.buckets()
+        self.assertEqual([b["quantidade"] for b in buckets], [3, 3, 1])
+        self.assertEqual({b["mes"] for b in buckets}, {"2026-03"})
+        self.assertEqual([len(b["execucoes"]) for b in buckets], [3, 3, 1])
+        self.assertEqual(buckets[0]["tempoTotal"], 90)
+        self.assertEqual((buckets[1]["inicio"], buckets[1]["fim"]), ("2026-03-04T10:00:00", "2026-03-06T10:00:00"))
+
+    async def test_lote_ordenado_vira_bucket_no_meio(self):
+        itens = [(i, execucao(i, f"2026-03-{i + 1:02d}T10:00:00")) for i in range(5)]
+
+        resultados = await self.repositorio.inserir_lote(itens)
+
+        self.assertEqual([r["status"] for r in resultados.values()], ["criado"] * 5)
+        self.assertEqual([b["quantidade"] for b in self.buckets()], [3, 2])
+
+    async def test_mes_novo_abre_bucket_mesmo_com_espaco(self):
+        await self.repositorio.inserir(execucao(1, "2026-03-30T10:00:00"))
+        await self.repositorio.inserir(execucao(2, "2026-04-01T10:00:00"))
+
+        self.assertEqual([(b["mes"], b["quantidade"]) for b in self.buckets()], [("2026-03", 1), ("2026-04", 1)])
+
+    async def test_buckets_sobrepostos_sao_intercalados_na_ordem(self):
+        # Escritas concorrentes podem deixar dois buckets do mesmo mês com datas cruzadas
+        datas = ["2026-03-01", "2026-03-20", "2026-03-05", "2026-03-25", "2026-03-10", "2026-03-15", "2026-02-28"]
+        for n, data in enumerate(datas):
+            await self.repositorio.inserir(execucao(n, f"{data}T10:00:00"))
+
+        docs, proximo = await self.repositorio.pagina({"idAluno": "ALN1"}, limit=10)
+
+        self.assertIsNone(proximo)
+        self.assertEqual([d["dataExecucao"][:10] for d in docs], sorted(datas, reverse=True))
+
+    async def test_paginas_seguem_o_cursor_sem_repetir_nem_pular(self):
+        for n in range(11):
+            # Mesma data em pares: o desempate é pelo id
+            await self.repositorio.inserir(execucao(n, f"2026-03-{10 - n // 2:02d}T10:00:00"))
+
+        vistos, after = [], None
+        while True:
+            docs, after = await self.repositorio.pagina({"idAluno": "ALN1"}, after=after, limit=3)
+            vistos += [d["id"] for d in docs]
+            if not after:
+                break
+
+        esperados = [
+            e["id"] for e in sorted(
+                (execucao(n, f"2026-03-{10 - n // 2:02d}T10:00:00") for n in range(11)),
+                key=lambda e: (e["dataExecucao"], e["id"]),
+                reverse=True,
+            )
+        ]
+        self.assertEqual(vistos, esperados)
+
+    async def test_filtro_por_atribuicao_le_so_os_buckets_dela(self):
+        for n in range(6):
+            await self.repositorio.inserir(execucao(n, f"2026-03-{n + 1:02d}T10:00:00", atribuicao=f"ATR{n % 2}"))
+
+        docs = [d async for d in self.repositorio.iterar({"idAtribuicao": "ATR1"}, {"id": 1})]
+
+        self.assertEqual(docs, [{"id": "EXE005"}, {"id": "EXE003"}, {"id": "EXE001"}])
+
+
+class MigracaoBucketsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.documentos = ColecaoMemoria()
+        self.buckets = ColecaoMemoria()
+        self.chaves = ColecaoMemoria()
+        for alvo in (
+            mock.patch.object(execucoes, "MAX_POR_BUCKET", 3),
+            mock.patch.object(execucoes, "execucoes_collection", self.documentos),
+            mock.patch.object(execucoes, "execucoes_buckets_collection", self.buckets),
+            mock.patch.object(execucoes, "execucoes_chaves_collection", self.chaves),
+        ):
+            alvo.start()
+            self.addCleanup(alvo.stop)
+
+    def test_montar_buckets_ordena_e_vira_em_max(self):
+        datas = ["2026-03-09", "2026-02-01", "2026-03-01", "2026-03-05", "2026-03-02", "2026-03-07"]
+        buckets = montar_buckets("ALN1", [execucao(n, f"{d}T10:00:00") for n, d in enumerate(datas)])
+
+        self.assertEqual([(b["mes"], b["quantidade"]) for b in buckets], [("2026-02", 1), ("2026-03", 3), ("2026-03", 2)])
+        self.assertEqual(
+            [e["dataExecucao"][:10] for b in buckets for e in b["execucoes"]],
+            sorted(datas),
+        )
+        self.assertEqual((buckets[1]["inicio"][:10], buckets[1]["fim"][:10]), ("2026-03-01", "2026-03-05"))
+
+    async def test_migracao_le_igual_ao_formato_documentos(self):
+        for n in range(8):
+            aluno = "ALN1" if n % 3 else "ALN2"
+            doc = execucao(n, f"2026-0{2 + n % 2}-{20 - n:02d}T10:00:00", aluno=aluno)
+            if n == 4:
+                doc["chaveIdempotencia"] = "k4"
+            await self.documentos.insert_one(doc)
+
+        resumo = await migrar_para_buckets()
+
+        self.assertEqual(resumo["alunos"], 2)
+        self.assertEqual(len(self.chaves.docs), 1)
+        documentos = ExecucoesDocumentos()
+        documentos.collection = self.documentos
+        buckets = ExecucoesBuckets()
+        buckets.collection = self.buckets
+        for aluno in ("ALN1", "ALN2"):
+            esperado, _ = await documentos.pagina({"idAluno": aluno}, {"_id": 0, "id": 1}, limit=50)
+            obtido, _ = await buckets.pagina({"idAluno": aluno}, {"id": 1}, limit=50)
+            self.assertEqual(obtido, esperado)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,246 @@
+"""Atribuição dos comandos do Mongo à requisição, com o Motor contra um servidor mínimo em asyncio.
+
+O `ComandosMongo` roda nas threads do executor do Motor; a atribuição depende
+de o contexto da requisição (o ContextVar) chegar até lá. Estes testes passam
+pelo caminho real: MetricasMiddleware -> Motor -> pymongo -> listener.
+
+Na pasta backend/:
+    python -m unittest discover -s tests -t .
+"""
+import asyncio
+import struct
+import unittest
+from datetime import datetime, timezone
+
+import bson
+from bson.int64 import Int64
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from metricas import ComandosMongo, MetricasMiddleware, mongo_comandos_total, requisicao_mongo_comandos
+
+OP_REPLY = 1
+OP_QUERY = 2004
+OP_MSG = 2013
+
+
+class ServidorMongo:
+    """Fala o suficiente do protocolo do MongoDB para o pymongo: hello, find e getMore."""
+
+    def __init__(self, documentos=()):
+        self.documentos = list(documentos)
+        self.comandos = []
+        self._cursores = {}
+        self._proximo_cursor = 1
+        self._servidor = None
+        self._atendimentos = set()
+
+    async def iniciar(self) -> int:
+        self._servidor = await asyncio.start_server(self._atender, "127.0.0.1", 0)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def parar(self):
+        if not self._servidor.is_serving():
+            return
+        self._servidor.close()
+        await self._servidor.wait_closed()
+        for atendimento in self._atendimentos:
+            atendimento.cancel()
+        await asyncio.gather(*self._atendimentos, return_exceptions=True)
+
+    async def _atender(self, reader, writer):
+        self._atendimentos.add(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    cabecalho = await reader.readexactly(16)
+                except asyncio.IncompleteReadError:
+                    break
+                tamanho, id_requisicao, _, op = struct.unpack("<iiii", cabecalho)
+                corpo = await reader.readexactly(tamanho - 16)
+                if op == OP_QUERY:
+                    # Só o handshake usa OP_QUERY: flags, "admin.$cmd", skip, limit, comando
+                    fim_nome = corpo.index(b"\x00", 4)
+                    comando = bson.decode_all(corpo[fim_nome + 9:])[0]
+                    writer.write(self._op_reply(id_requisicao, self._responder(comando)))
+                elif op == OP_MSG:
+                    writer.write(self._op_msg(id_requisicao, self._responder(self._ler_op_msg(corpo))))
+                await writer.drain()
+        except asyncio.CancelledError:
+            pass  # parar() encerra as conexões que o pymongo ainda mantém abertas
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _ler_op_msg(corpo: bytes) -> dict:
+        flags = struct.unpack("<I", corpo[:4])[0]
+        fim = len(corpo) - (4 if flags & 1 else 0)
+        comando, posicao = {}, 4
+        while posicao < fim:
+            tipo = corpo[posicao]
+            posicao += 1
+            tamanho = struct.unpack("<i", corpo[posicao:posicao + 4])[0]
+            if tipo == 0:
+                comando.update(bson.decode(corpo[posicao:posicao + tamanho]))
+            else:
+                fim_nome = corpo.index(b"\x00", posicao + 4)
+                nome = corpo[posicao + 4:fim_nome].decode()
+                comando[nome] = bson.decode_all(corpo[fim_nome + 1:posicao + tamanho])
+            posicao += tamanho
+        return comando
+
+    @staticmethod
+    def _op_reply(responde_a: int, doc: dict) -> bytes:
+        corpo = struct.pack("<iqii", 0, 0, 0, 1) + bson.encode(doc)
+        return struct.pack("<iiii", 16 + len(corpo), 0, responde_a, OP_REPLY) + corpo
+
+    @staticmethod
+    def _op_msg(responde_a: int, doc: dict) -> bytes:
+        corpo = struct.pack("<I", 0) + b"\x00" + bson.encode(doc)
+        return struct.pack("<iiii", 16 + len(corpo), 0, responde_a, OP_MSG) + corpo
+
+    def _responder(self, comando: dict) -> dict:
+        nome = next(iter(comando))
+        if nome.lower() in ("hello", "ismaster"):
+            return {
+                "ismaster": True,
+                "helloOk": True,
+                "maxWireVersion": 17,
+                "minWireVersion": 0,
+                "maxBsonObjectSize": 16 * 1024 * 1024,
+                "maxMessageSizeBytes": 48_000_000,
+                "maxWriteBatchSize": 100_000,
+                "localTime": datetime.now(timezone.utc),
+                "logicalSessionTimeoutMinutes": 30,
+                "ok": 1,
+            }
+        self.comandos.append(nome)
+        if nome == "find":
+            ns = f"{comando['$db']}.{comando['find']}"
+            tamanho = comando.get("batchSize") or len(self.documentos)
+            if comando.get("limit"):
+                tamanho = min(tamanho, comando["limit"])
+            lote, resto = self.documentos[:tamanho], self.documentos[tamanho:]
+            id_cursor = 0
+            if resto and not comando.get("singleBatch"):
+                id_cursor = self._proximo_cursor
+                self._proximo_cursor += 1
+                self._cursores[id_cursor] = resto
+            return {"cursor": {"id": Int64(id_cursor), "ns": ns, "firstBatch": lote}, "ok": 1}
+        if nome == "getMore":
+            ns = f"{comando['$db']}.{comando['collection']}"
+            resto = self._cursores.pop(comando["getMore"], [])
+            return {"cursor": {"id": Int64(0), "ns": ns, "nextBatch": resto}, "ok": 1}
+        return {"ok": 1}
+
+
+class Rota:
+    def __init__(self, path: str, endpoint):
+        self.path = path
+        self.endpoint = endpoint
+
+
+class AppRotas:
+    """ASGI mínimo: como o router do Starlette, grava o endpoint no scope antes de chamá-lo."""
+
+    def __init__(self, *rotas):
+        self.routes = list(rotas)
+        self._por_path = {rota.path: rota for rota in rotas}
+
+    async def __call__(self, scope, receive, send):
+        rota = self._por_path[scope["path"]]
+        scope["endpoint"] = rota.endpoint
+        await rota.endpoint()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def _comandos_na_rota(rota: str, comando: str) -> float:
+    return requisicao_mongo_comandos._valores.get(("GET", rota, comando), 0)
+
+
+class ComandosMongoPorRequisicaoTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.servidor = ServidorMongo([{"_id": i, "n": i} for i in range(5)])
+        porta = await self.servidor.iniciar()
+        self.client = AsyncIOMotorClient(
+            f"mongodb://127.0.0.1:{porta}/?directConnection=true",
+            event_listeners=[ComandosMongo()],
+            serverSelectionTimeoutMS=2000,
+        )
+        self.colecao = self.client.teste.itens
+
+    async def asyncTearDown(self):
+        # O close manda endSessions e espera a resposta: não pode bloquear o loop onde o servidor roda
+        await asyncio.get_running_loop().run_in_executor(None, self.client.close)
+        await self.servidor.parar()
+
+    async def _requisicao(self, app, path: str):
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "GET", "path": path, "app": app, "headers": []}
+        await MetricasMiddleware(app)(scope, receive, send)
+
+    async def test_find_na_requisicao_conta_na_rota(self):
+        async def ler():
+            await self.colecao.find_one({"n": 1})
+
+        app = AppRotas(Rota("/api/teste/um", ler))
+        antes = _comandos_na_rota("/api/teste/um", "find")
+
+        await self._requisicao(app, "/api/teste/um")
+
+        self.assertIn("find", self.servidor.comandos)
+        self.assertEqual(_comandos_na_rota("/api/teste/um", "find"), antes + 1)
+
+    async def test_get_more_do_cursor_tambem_e_atribuido(self):
+        async def listar():
+            self.assertEqual(len([doc async for doc in self.colecao.find({}, batch_size=2)]), 5)
+
+        app = AppRotas(Rota("/api/teste/cursor", listar))
+        antes = _comandos_na_rota("/api/teste/cursor", "getMore")
+
+        await self._requisicao(app, "/api/teste/cursor")
+
+        self.assertIn("getMore", self.servidor.comandos)
+        self.assertEqual(_comandos_na_rota("/api/teste/cursor", "getMore"), antes + 1)
+
+    async def test_requisicoes_concorrentes_nao_se_misturam(self):
+        async def uma():
+            await self.colecao.find_one({})
+
+        async def tres():
+            for _ in range(3):
+                await self.colecao.find_one({})
+
+        app = AppRotas(Rota("/api/teste/a", uma), Rota("/api/teste/b", tres))
+        antes_a = _comandos_na_rota("/api/teste/a", "find")
+        antes_b = _comandos_na_rota("/api/teste/b", "find")
+
+        await asyncio.gather(*(
+            self._requisicao(app, path) for path in ["/api/teste/a", "/api/teste/b"] * 4
+        ))
+
+        self.assertEqual(_comandos_na_rota("/api/teste/a", "find"), antes_a + 4)
+        self.assertEqual(_comandos_na_rota("/api/teste/b", "find"), antes_b + 12)
+
+    async def test_fora_de_requisicao_so_conta_no_total(self):
+        antes_total = mongo_comandos_total._valores.get(("find", "sucesso"), 0)
+        antes_rotas = sum(
+            valor for (_, _, comando), valor in requisicao_mongo_comandos._valores.items() if comando == "find"
+        )
+
+        await self.colecao.find_one({})
+
+        self.assertEqual(mongo_comandos_total._valores.get(("find", "sucesso"), 0), antes_total + 1)
+        self.assertEqual(
+            sum(valor for (_, _, comando), valor in requisicao_mongo_comandos._valores.items() if comando == "find"),
+            antes_rotas,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
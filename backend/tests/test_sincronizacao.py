@@ -0,0 +1,223 @@
+"""/api/sync: tokens de continuação das execuções e entrega das lápides.
+
+As coleções são trocadas por `ColecaoMemoria` e o relógio é controlado pelo
+teste; as escritas passam por `carimbar` como no servidor.
+
+Na pasta backend/:
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from fastapi import HTTPException
+
+import sincronizacao
+from execucoes import ExecucoesDocumentos
+from paginacao import codificar_cursor
+from sincronizacao import CAMPOS_TOKEN_ANTIGO, carimbar, registrar_remocao, registrar_remocoes, sincronizar
+from tests.colecao_memoria import ColecaoMemoria
+
+PERSONAL = {"id": "PER1", "nome": "Personal", "email": "p@x.com", "tipo": "personal", "dataCriacao": "2026-01-01"}
+ALUNO = {"id": "ALN1", "nome": "Aluno", "email": "a@x.com", "tipo": "aluno", "codigoPersonal": "PER1", "dataCriacao": "2026-01-01"}
+OUTRO_ALUNO = {"id": "ALN2", "nome": "Outro", "email": "o@x.com", "tipo": "aluno", "codigoPersonal": "PER1", "dataCriacao": "2026-01-01"}
+
+
+class SincronizacaoTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.agora = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+        self.colecoes = {
+            nome: ColecaoMemoria()
+            for nome in ("contadores", "remocoes", "usuarios", "treinos", "atribuicoes", "execucoes")
+        }
+        repositorio = ExecucoesDocumentos()
+        repositorio.collection = self.colecoes["execucoes"]
+        for alvo in (
+            mock.patch.object(sincronizacao, "_agora", lambda: self.agora),
+            mock.patch.object(sincronizacao, "SYNC_LIMITE_EXECUCOES", 3),
+            mock.patch.object(sincronizacao, "repositorio_execucoes", repositorio),
+            *(
+                mock.patch.object(sincronizacao, f"{nome}_collection", colecao)
+                for nome, colecao in self.colecoes.items() if nome != "execucoes"
+            ),
+        ):
+            alvo.start()
+            self.addCleanup(alvo.stop)
+
+        for usuario in (PERSONAL, ALUNO, OUTRO_ALUNO):
+            await self.gravar("usuarios", dict(usuario))
+        await self.gravar("treinos", {
+            "id": "TRE1", "idPersonal": "PER1", "nome": "A", "tipo": "forca", "duracao": 60, "nivel": "iniciante",
+            "exercicios": [], "dataCriacao": "2026-01-01", "dataUltimaEdicao": "2026-01-01",
+        })
+        for aluno in ("ALN1", "ALN2"):
+            await self.gravar("atribuicoes", {
+                "id": f"ATR{aluno}", "idAluno": aluno, "idTreino": "TRE1", "idPersonal": "PER1",
+                "dataInicio": "2026-01-01", "diasSemana": ["segunda"], "status": "ativo", "dataCriacao": "2026-01-01",
+            })
+        self.execucoes = 0
+
+    def avancar(self, segundos: float):
+        self.agora += timedelta(seconds=segundos)
+
+    def assentar(self):
+        """Passa da sobreposição: o que já foi escrito não volta repetido no próximo delta."""
+        self.avancar(sincronizacao.SYNC_SOBREPOSICAO_S + 1)
+
+    async def gravar(self, colecao: str, doc: dict):
+        await carimbar(doc)
+        await self.colecoes[colecao].insert_one(doc)
+
+    async def executar(self, quantidade: int, aluno: str = "ALN1") -> list:
+        ids = []
+        for _ in range(quantidade):
+            self.execucoes += 1
+            self.avancar(1)
+            ids.append(f"EXE{self.execucoes:03d}")
+            await self.gravar("execucoes", {
+                "id": ids[-1], "idAluno": aluno, "idAtribuicao": f"ATR{aluno}",
+                "dataExecucao": self.agora.isoformat(), "duracao": 30, "exercicios": [],
+            })
+        return ids
+
+    async def ler_tudo(self, usuario: dict, token=None) -> tuple:
+        """Segue as continuações até `mais` = false: (respostas, último token)."""
+        respostas = [await sincronizar(usuario, token)]
+        while respostas[-1]["mais"]:
+            respostas.append(await sincronizar(usuario, respostas[-1]["token"]))
+        return respostas, respostas[-1]["token"]
+
+    @staticmethod
+    def ids(respostas: list, colecao: str = "execucoes") -> list:
+        return [doc["id"] for resposta in respostas for doc in resposta[colecao]]
+
+    # ==================== CONTINUAÇÃO ====================
+
+    async def test_completa_pagina_as_execucoes_ate_mais_false(self):
+        criadas = await self.executar(7)
+
+        respostas, token = await self.ler_tudo(ALUNO)
+
+        self.assertEqual([len(r["execucoes"]) for r in respostas], [3, 3, 1])
+        self.assertEqual([r["mais"] for r in respostas], [True, True, False])
+        self.assertTrue(respostas[0]["completo"])
+        self.assertEqual(self.ids(respostas), criadas[::-1])  # dataExecucao decrescente
+        # Só a primeira resposta traz as outras coleções; a continuação traz só execuções
+        self.assertEqual(len(respostas[0]["atribuicoes"]), 1)
+        self.assertEqual([r["atribuicoes"] for r in respostas[1:]], [[], []])
+        self.assertEqual(sincronizacao._ler_token(token)["execucoes"], None)
+
+    async def test_continuacao_mantem_a_versao_da_primeira_leitura(self):
+        await self.executar(4)
+
+        primeira = await sincronizar(ALUNO)
+        self.avancar(60)
+        segunda = await sincronizar(ALUNO, primeira["token"])
+
+        inicio, fim = sincronizacao._ler_token(primeira["token"]), sincronizacao._ler_token(segunda["token"])
+        self.assertEqual((fim["versao"], fim["lidoEm"]), (inicio["versao"], inicio["lidoEm"]))
+        self.assertIsNotNone(inicio["execucoes"])
+        self.assertIsNone(fim["execucoes"])
+
+    async def test_delta_paginado_inclui_o_que_foi_escrito_entre_as_paginas(self):
+        await self.executar(2)
+        self.assentar()
+        _, token = await self.ler_tudo(ALUNO)
+        novas = await self.executar(6)
+
+        primeira = await sincronizar(ALUNO, token)
+        novas += await self.executar(1)  # escrita durante a leitura paginada
+        respostas, token = await self.ler_tudo(ALUNO, primeira["token"])
+        respostas = [primeira, *respostas]
+
+        self.assertFalse(primeira["completo"])
+        self.assertEqual([len(r["execucoes"]) for r in respostas], [3, 3, 1])
+        self.assertEqual(self.ids(respostas), novas)  # modificadoEm crescente, sem repetir
+        self.assertEqual(respostas[-1]["mais"], False)
+
+    async def test_nada_mudou_depois_da_leitura_assentada(self):
+        await self.executar(2)
+        _, token = await self.ler_tudo(ALUNO)
+        self.assentar()
+        _, token = await self.ler_tudo(ALUNO, token)  # esta leitura já começa assentada
+        self.avancar(5)
+
+        resposta = await sincronizar(ALUNO, token)
+
+        self.assertEqual(
+            (resposta["execucoes"], resposta["usuarios"], resposta["removidos"], resposta["mais"]), ([], [], [], False)
+        )
+
+    async def test_token_antigo_sem_paginacao_continua_valido(self):
+        await self.executar(1)
+        self.assentar()
+        _, token = await self.ler_tudo(ALUNO)
+        valores = sincronizacao._ler_token(token)
+        antigo = codificar_cursor(valores, CAMPOS_TOKEN_ANTIGO)
+        novas = await self.executar(1)
+
+        resposta = await sincronizar(ALUNO, antigo)
+
+        self.assertEqual(self.ids([resposta]), novas)
+
+    async def test_token_mais_velho_que_a_retencao_recebe_410(self):
+        _, token = await self.ler_tudo(ALUNO)
+        self.avancar(timedelta(days=sincronizacao.SYNC_RETENCAO_DIAS + 1).total_seconds())
+
+        with self.assertRaises(HTTPException) as erro:
+            await sincronizar(ALUNO, token)
+        self.assertEqual(erro.exception.status_code, 410)
+
+    # ==================== LÁPIDES ====================
+
+    async def test_lapide_chega_so_para_os_escopos(self):
+        _, token_aluno = await self.ler_tudo(ALUNO)
+        _, token_outro = await self.ler_tudo(OUTRO_ALUNO)
+        _, token_personal = await self.ler_tudo(PERSONAL)
+        self.avancar(60)
+
+        await registrar_remocao("treinos", "TRE9", ["PER1", "ALN1", "ALN1"])
+
+        aluno = await sincronizar(ALUNO, token_aluno)
+        outro = await sincronizar(OUTRO_ALUNO, token_outro)
+        personal = await sincronizar(PERSONAL, token_personal)
+        self.assertEqual([(r["colecao"], r["id"]) for r in aluno["removidos"]], [("treinos", "TRE9")])
+        self.assertEqual([r["id"] for r in personal["removidos"]], ["TRE9"])
+        self.assertEqual(outro["removidos"], [])
+        self.assertEqual(self.colecoes["remocoes"].docs[0]["escopos"], ["ALN1", "PER1"])
+
+    async def test_lapides_em_lote_descartam_escopos_vazios(self):
+        _, token = await self.ler_tudo(ALUNO)
+        self.avancar(60)
+
+        await registrar_remocoes("execucoes", [("EXE100", ["ALN1", None]), ("EXE101", ["ALN2"])])
+
+        resposta = await sincronizar(ALUNO, token)
+        self.assertEqual([r["id"] for r in resposta["removidos"]], ["EXE100"])
+        self.assertEqual(self.colecoes["remocoes"].docs[0]["escopos"], ["ALN1"])
+        versoes = [lapide["versaoSync"] for lapide in self.colecoes["remocoes"].docs]
+        self.assertEqual(len(set(versoes)), 2)
+
+    async def test_sincronizacao_completa_nao_traz_lapides(self):
+        await registrar_remocao("treinos", "TRE9", ["ALN1"])
+
+        respostas, _ = await self.ler_tudo(ALUNO)
+
+        self.assertTrue(respostas[0]["completo"])
+        self.assertEqual(respostas[0]["removidos"], [])
+
+    async def test_lapide_antes_do_token_dentro_da_sobreposicao_e_repetida(self):
+        # Uma lápide gravada pouco antes da leitura volta na próxima (o cliente ignora repetidas)
+        await registrar_remocao("treinos", "TRE9", ["ALN1"])
+        self.avancar(1)
+        _, token = await self.ler_tudo(ALUNO)
+        self.avancar(2)
+        await self.executar(1)
+
+        resposta = await sincronizar(ALUNO, token)
+
+        self.assertEqual([r["id"] for r in resposta["removidos"]], ["TRE9"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""Fila de tarefas: bloqueio que expira, novas tentativas e espera exponencial.
+
+`tarefas` é trocada por uma `ColecaoMemoria` e o relógio é controlado pelo
+teste; os workers não são iniciados, as funções da fila são chamadas direto.
+
+Na pasta backend/:
+    python -m unittest discover -s tests -t .
+"""
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import tarefas
+from tarefas import (
+    CONCLUIDA, EXECUTANDO, FALHOU, PENDENTE, TAREFAS_BLOQUEIO_S, TAREFAS_ESPERA_MAX_S, TAREFAS_ESPERA_S,
+    Andamento, TarefaPerdida, enfileirar, espera_tentativa, executar, _pegar, _recuperar_expiradas,
+)
+from tests.colecao_memoria import ColecaoMemoria
+
+
+class EsperaTentativaTest(unittest.TestCase):
+    def test_dobra_a_cada_tentativa_ate_o_maximo(self):
+        with mock.patch.object(tarefas.random, "uniform", lambda a, b: b):
+            esperas = [espera_tentativa(n) for n in range(1, 12)]
+
+        esperado = [min(TAREFAS_ESPERA_MAX_S, TAREFAS_ESPERA_S * 2 ** (n - 1)) for n in range(1, 12)]
+        self.assertEqual(esperas, esperado)
+        self.assertEqual(esperas[-1], TAREFAS_ESPERA_MAX_S)
+
+    def test_variacao_fica_entre_75_e_100_por_cento(self):
+        for tentativas in (1, 3, 20):
+            base = min(TAREFAS_ESPERA_MAX_S, TAREFAS_ESPERA_S * 2 ** (tentativas - 1))
+            for _ in range(50):
+                self.assertTrue(0.75 * base <= espera_tentativa(tentativas) <= base)
+
+
+class FilaTarefasTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.agora = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+        self.colecao = ColecaoMemoria()
+        self.chamadas = []
+        for alvo in (
+            mock.patch.object(tarefas, "tarefas_collection", self.colecao),
+            mock.patch.object(tarefas, "_agora", lambda: self.agora),
+            mock.patch.object(tarefas, "_sinal", None),
+            mock.patch.object(tarefas.random, "uniform", lambda a, b: b),
+            mock.patch.object(tarefas.logger, "disabled", True),
+            mock.patch.dict(tarefas.TIPOS, {
+                "ok": self.tipo_ok,
+                "falha": self.tipo_falha,
+                "longa": self.tipo_longa,
+            }),
+        ):
+            alvo.start()
+            self.addCleanup(alvo.stop)
+        self.liberar = asyncio.Event()
+
+    async def tipo_ok(self, parametros, andamento):
+        self.chamadas.append(("ok", parametros))
+        await andamento.registrar(processados=3)
+        return {"total": 3}
+
+    async def tipo_falha(self, parametros, andamento):
+        self.chamadas.append(("falha", parametros))
+        raise RuntimeError("banco indisponível")
+
+    async def tipo_longa(self, parametros, andamento):
+        self.chamadas.append(("longa", parametros))
+        await self.liberar.wait()
+        await andamento.registrar(fim=True)
+        return {}
+
+    def avancar(self, segundos: float):
+        self.agora += timedelta(seconds=segundos)
+
+    def documento(self, id: str) -> dict:
+        return next(doc for doc in self.colecao.docs if doc["id"] == id)
+
+    # ==================== BLOQUEIO ====================
+
+    async def test_pega_a_mais_antiga_pronta_e_bloqueia(self):
+        primeira = await enfileirar("ok", {"n": 1})
+        self.avancar(1)
+        segunda = await enfileirar("ok", {"n": 2})
+        self.documento(segunda["id"])["executarEm"] = self.agora + timedelta(hours=1)
+
+        pega = await _pegar("w1")
+
+        self.assertEqual(pega["id"], primeira["id"])
+        self.assertEqual((pega["status"], pega["tentativas"], pega["trabalhador"]), (EXECUTANDO, 1, "w1"))
+        self.assertEqual(pega["bloqueadaAte"], self.agora + timedelta(seconds=TAREFAS_BLOQUEIO_S))
+        self.assertIsNone(await _pegar("w2"))  # a outra ainda não está na hora
+
+    async def test_bloqueio_expirado_volta_para_a_fila_e_outro_worker_assume(self):
+        tarefa = await enfileirar("ok")
+        await _pegar("w1")
+        self.avancar(TAREFAS_BLOQUEIO_S - 1)
+        await _recuperar_expiradas()
+        self.assertEqual(self.documento(tarefa["id"])["status"], EXECUTANDO)
+
+        self.avancar(2)
+        await _recuperar_expiradas()
+
+        doc = self.documento(tarefa["id"])
+        self.assertEqual((doc["status"], doc["erro"]), (PENDENTE, "Bloqueio expirado"))
+        self.assertNotIn("trabalhador", doc)
+        pega = await _pegar("w2")
+        self.assertEqual((pega["trabalhador"], pega["tentativas"]), ("w2", 2))  # a tentativa perdida conta
+
+    async def test_worker_que_perdeu_o_bloqueio_nao_sobrescreve_o_novo(self):
+        tarefa = await enfileirar("longa")
+        antiga = await _pegar("w1")
+        execucao = asyncio.create_task(executar(antiga, "w1"))
+        await asyncio.sleep(0)
+
+        self.avancar(TAREFAS_BLOQUEIO_S + 1)
+        await _recuperar_expiradas()
+        await _pegar("w2")
+        self.liberar.set()
+        await execucao
+
+        doc = self.documento(tarefa["id"])
+        self.assertEqual((doc["status"], doc["trabalhador"]), (EXECUTANDO, "w2"))
+        self.assertNotIn("fim", doc["progresso"])
+
+    async def test_registrar_renova_o_bloqueio(self):
+        tarefa = await enfileirar("ok")
+        pega = await _pegar("w1")
+        andamento = Andamento(pega, "w1")
+        self.avancar(TAREFAS_BLOQUEIO_S - 5)
+
+        await andamento.registrar(processados=10)
+        self.avancar(10)
+        await _recuperar_expiradas()
+
+        doc = self.documento(tarefa["id"])
+        self.assertEqual((doc["status"], doc["progresso"]), (EXECUTANDO, {"processados": 10}))
+        self.assertEqual(doc["bloqueadaAte"], self.agora - timedelta(seconds=10) + timedelta(seconds=TAREFAS_BLOQUEIO_S))
+
+    async def test_registrar_depois_de_perder_levanta(self):
+        await enfileirar("ok")
+        andamento = Andamento(await _pegar("w1"), "w1")
+        self.avancar(TAREFAS_BLOQUEIO_S + 1)
+        await _recuperar_expiradas()
+
+        with self.assertRaises(TarefaPerdida):
+            await andamento.registrar(processados=1)
+        self.assertTrue(andamento.perdida)
+
+    # ==================== TENTATIVAS ====================
+
+    async def test_sucesso_grava_resultado_e_libera(self):
+        tarefa = await enfileirar("ok", {"x": 1})
+
+        await executar(await _pegar("w1"), "w1")
+
+        doc = self.documento(tarefa["id"])
+        self.assertEqual((doc["status"], doc["resultado"], doc["progresso"]), (CONCLUIDA, {"total": 3}, {"processados": 3}))
+        self.assertNotIn("bloqueadaAte", doc)
+        self.assertEqual(self.chamadas, [("ok", {"x": 1})])
+
+    async def test_falha_volta_com_espera_exponencial_ate_desistir(self):
+        tarefa = await enfileirar("falha", max_tentativas=3)
+
+        esperas = []
+        for tentativa in (1, 2, 3):
+            pega = await _pegar("w1")
+            self.assertEqual(pega["tentativas"], tentativa)
+            await executar(pega, "w1")
+            doc = self.documento(tarefa["id"])
+            if doc["status"] == PENDENTE:
+                esperas.append((doc["executarEm"] - self.agora).total_seconds())
+                self.assertIsNone(await _pegar("w1"))  # ainda esperando
+                self.agora = doc["executarEm"]
+
+        doc = self.documento(tarefa["id"])
+        self.assertEqual(esperas, [TAREFAS_ESPERA_S, TAREFAS_ESPERA_S * 2])
+        self.assertEqual((doc["status"], doc["erro"]), (FALHOU, "RuntimeError: banco indisponível"))
+        self.assertIn("concluidaEm", doc)
+        self.assertEqual(len(self.chamadas), 3)
+
+    async def test_tipo_desconhecido_falha_sem_repetir(self):
+        tarefa = await enfileirar("ok")
+        self.documento(tarefa["id"])["tipo"] = "removido"
+
+        await executar(await _pegar("w1"), "w1")
+
+        doc = self.documento(tarefa["id"])
+        self.assertEqual((doc["status"], doc["tentativas"]), (FALHOU, 1))
+
+    async def test_desligamento_devolve_sem_gastar_a_tentativa(self):
+        tarefa = await enfileirar("longa")
+        execucao = asyncio.create_task(executar(await _pegar("w1"), "w1"))
+        await asyncio.sleep(0)
+
+        execucao.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await execucao
+
+        doc = self.documento(tarefa["id"])
+        self.assertEqual((doc["status"], doc["tentativas"]), (PENDENTE, 0))
+        self.assertNotIn("trabalhador", doc)
+
+    async def test_enfileirar_tipo_desconhecido(self):
+        with self.assertRaises(ValueError):
+            await enfileirar("nao_existe")
+
+
+if __name__ == "__main__":
+    unittest.main()
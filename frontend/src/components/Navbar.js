@@ -1,5 +1,6 @@
 import { useAuth } from '../contexts/AuthContext';
 import { useNavigate } from 'react-router-dom';
+import { resolverMidia } from '../services/api';
 
 const Navbar = () => {
   const { user, logout } = useAuth();
@@ -43,7 +44,7 @@ const Navbar = () => {
             <div className="flex items-center space-x-3">
               {user.avatar ? (
                 <img
-                  src={user.avatar}
+                  src={resolverMidia(user.avatar)}
                   alt={user.nome}
                   className="w-10 h-10 rounded-full object-cover border-2 border-blue-200 dark:border-blue-600"
                 />
@@ -1,4 +1,5 @@
 import { useState } from 'react';
+import { resolverMidia } from '../services/api';
 
 const VideoPlayer = ({ videoUrl, videoLocal, className = "" }) => {
   const [error, setError] = useState(false);
@@ -83,7 +84,7 @@ const VideoPlayer = ({ videoUrl, videoLocal, className = "" }) => {
         controls
         onError={() => setError(true)}
       >
-        <source src={videoLocal} type="video/mp4" />
+        <source src={resolverMidia(videoLocal)} type="video/mp4" />
         Seu navegador não suporta a reprodução de vídeos.
       </video>
     );
@@ -3,7 +3,7 @@ import { useAuth } from '../../contexts/AuthContext';
 import { useTheme } from '../../contexts/ThemeContext';
 import { useNavigate } from 'react-router-dom';
 import Navbar from '../../components/Navbar';
-import { atualizarUsuario } from '../../services/api';
+import { atualizarUsuario, resolverMidia } from '../../services/api';
 import { fileToBase64 } from '../../utils/localStorage';
 import { toast } from 'sonner';
 
@@ -100,7 +100,7 @@ const Configuracoes = () => {
                   {avatar ? (
                     <div className="relative">
                       <img 
-                        src={avatar} 
+                        src={resolverMidia(avatar)} 
                         alt="Avatar" 
                         className="w-32 h-32 rounded-full object-cover border-4 border-blue-200 dark:border-blue-700 shadow-lg" 
                       />
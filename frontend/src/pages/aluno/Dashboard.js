@@ -3,9 +3,9 @@ import { useAuth } from '../../contexts/AuthContext';
 import { useNavigate } from 'react-router-dom';
 import Navbar from '../../components/Navbar';
 import {
-  listarAtribuicoesPorAluno,
-  buscarTreinoPorId,
-  listarExecucoesPorAluno
+  listarAgendaAluno,
+  listarExecucoesPorAluno,
+  buscarEstatisticasAluno
 } from '../../services/api';
 
 const AlunoDashboard = () => {
@@ -13,6 +13,7 @@ const AlunoDashboard = () => {
   const navigate = useNavigate();
   const [atribuicoes, setAtribuicoes] = useState([]);
   const [execucoes, setExecucoes] = useState([]);
+  const [totalTreinos, setTotalTreinos] = useState(0);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -24,13 +25,16 @@ const AlunoDashboard = () => {
     
     setLoading(true);
     try {
-      const [atribuicoesData, execucoesData] = await Promise.all([
-        listarAtribuicoesPorAluno(user.id),
-        listarExecucoesPorAluno(user.id)
+      // Só as últimas execuções; o total vem das estatísticas, sem baixar o histórico
+      const [atribuicoesData, execucoesData, estatisticasData] = await Promise.all([
+        listarAgendaAluno(user.id),
+        listarExecucoesPorAluno(user.id, { limit: 5 }),
+        buscarEstatisticasAluno(user.id)
       ]);
       
-      setAtribuicoes(atribuicoesData.filter(a => a.status === 'ativo'));
+      setAtribuicoes(atribuicoesData);
       setExecucoes(execucoesData);
+      setTotalTreinos(estatisticasData.totalTreinos);
     } catch (error) {
       console.error('Erro ao carregar dados:', error);
     } finally {
@@ -38,13 +42,10 @@ const AlunoDashboard = () => {
     }
   };
 
-  const getTreino = async (idTreino) => {
-    try {
-      return await buscarTreinoPorId(idTreino);
-    } catch (error) {
-      console.error('Erro ao buscar treino:', error);
-      return null;
-    }
+  // A agenda já traz o treino embutido em cada atribuição
+  const getTreino = (idTreino) => {
+    const atr = atribuicoes.find(a => a.idTreino === idTreino);
+    return atr?.treino || null;
   };
 
   const getDiaHoje = () => {
@@ -58,9 +59,8 @@ const AlunoDashboard = () => {
     atr.diasSemana.includes(diaHoje)
   );
 
-  const ultimasExecucoes = execucoes
-    .sort((a, b) => new Date(b.dataExecucao) - new Date(a.dataExecucao))
-    .slice(0, 5);
+  // A API já devolve só as 5 mais recentes
+  const ultimasExecucoes = execucoes;
 
   return (
     <div className="min-h-screen bg-gray-50 dark:bg-gray-900 transition-colors duration-300">
@@ -105,7 +105,7 @@ const AlunoDashboard = () => {
             <div className="flex items-center justify-between">
               <div>
                 <p className="text-white text-opacity-90 text-sm font-medium mb-1">Concluídos</p>
-                <p className="text-5xl font-bold">{execucoes.length}</p>
+                <p className="text-5xl font-bold">{totalTreinos}</p>
               </div>
               <div className="w-16 h-16 bg-white bg-opacity-20 rounded-full flex items-center justify-center">
                 <svg className="w-9 h-9 text-white" fill="none" stroke="currentColor" viewBox="0 0 24 24">
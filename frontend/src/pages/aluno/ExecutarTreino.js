@@ -4,8 +4,7 @@ import { useAuth } from '../../contexts/AuthContext';
 import Navbar from '../../components/Navbar';
 import VideoPlayer from '../../components/VideoPlayer';
 import {
-  listarAtribuicoesPorAluno,
-  buscarTreinoPorId,
+  listarAgendaAluno,
   criarExecucao
 } from '../../services/api';
 import { toast } from 'sonner';
@@ -51,12 +50,12 @@ const ExecutarTreino = () => {
     if (!user) return;
     
     try {
-      const atribuicoes = await listarAtribuicoesPorAluno(user.id);
-      const atr = atribuicoes.find(a => a.id === id);
+      const agenda = await listarAgendaAluno(user.id);
+      const atr = agenda.find(a => a.id === id);
       
       if (atr) {
-        setAtribuicao(atr);
-        const treinoData = await buscarTreinoPorId(atr.idTreino);
+        const { treino: treinoData, ...atribuicaoData } = atr;
+        setAtribuicao(atribuicaoData);
         setTreino(treinoData);
         setInicioTreino(new Date());
         
@@ -6,7 +6,9 @@ import {
   buscarUsuarioPorId,
   listarExecucoesPorAluno,
   listarAtribuicoesPorAluno,
-  buscarTreinoPorId
+  buscarTreinoPorId,
+  buscarProgressoAluno,
+  listarMedidas
 } from '../../services/api';
 import { LineChart, Line, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Legend } from 'recharts';
 
@@ -17,6 +19,8 @@ const MeuProgresso = () => {
   const [execucoes, setExecucoes] = useState([]);
   const [atribuicoes, setAtribuicoes] = useState([]);
   const [treinos, setTreinos] = useState({});
+  const [progresso, setProgresso] = useState(null);
+  const [medidas, setMedidas] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -28,13 +32,17 @@ const MeuProgresso = () => {
     
     setLoading(true);
     try {
-      const [alunoData, execucoesData, atribuicoesData] = await Promise.all([
+      const [alunoData, execucoesData, atribuicoesData, progressoData, medidasData] = await Promise.all([
         buscarUsuarioPorId(user.id),
-        listarExecucoesPorAluno(user.id),
-        listarAtribuicoesPorAluno(user.id)
+        listarExecucoesPorAluno(user.id, { limit: 10 }),
+        listarAtribuicoesPorAluno(user.id),
+        buscarProgressoAluno(user.id, { granularidade: 'semana', janela: 4 }),
+        listarMedidas(user.id)
       ]);
       
       setAluno(alunoData);
+      setProgresso(progressoData);
+      setMedidas(medidasData);
       setExecucoes(execucoesData);
       setAtribuicoes(atribuicoesData);
       
@@ -72,56 +80,27 @@ const MeuProgresso = () => {
     return (peso / (altura * altura)).toFixed(1);
   };
 
-  const dadosGraficoPeso = aluno.historicoMedidas?.map(m => ({
+  const dadosGraficoPeso = medidas.map(m => ({
     data: new Date(m.data).toLocaleDateString('pt-BR', { day: '2-digit', month: '2-digit' }),
     peso: m.peso,
     imc: calcularIMC(m.peso, m.altura)
-  })) || [];
+  }));
 
-  const ultimas4Semanas = () => {
-    const hoje = new Date();
-    const semanas = [];
-    
-    for (let i = 3; i >= 0; i--) {
-      const inicioSemana = new Date(hoje);
-      inicioSemana.setDate(hoje.getDate() - (i * 7) - hoje.getDay());
-      
-      const fimSemana = new Date(inicioSemana);
-      fimSemana.setDate(inicioSemana.getDate() + 6);
-      
-      const treinosDaSemana = execucoes.filter(exec => {
-        const dataExec = new Date(exec.dataExecucao);
-        return dataExec >= inicioSemana && dataExec <= fimSemana;
-      });
-      
-      semanas.push({
-        semana: `Sem ${4 - i}`,
-        treinos: treinosDaSemana.length,
-        tempoTotal: treinosDaSemana.reduce((acc, t) => acc + (t.duracao || 0), 0)
-      });
-    }
-    
-    return semanas;
-  };
-
-  const dadosGraficoSemanal = ultimas4Semanas();
+  const dadosGraficoSemanal = (progresso?.periodos || []).map((p, i) => ({
+    semana: `Sem ${i + 1}`,
+    treinos: p.treinos,
+    tempoTotal: p.tempoTotal
+  }));
 
   const estatisticas = {
-    totalTreinos: execucoes.length,
-    tempoTotal: execucoes.reduce((acc, exec) => acc + (exec.duracao || 0), 0),
-    mediaTempoTreino: execucoes.length > 0 
-      ? Math.round(execucoes.reduce((acc, exec) => acc + (exec.duracao || 0), 0) / execucoes.length) 
-      : 0,
-    ultimaSemana: execucoes.filter(exec => {
-      const hoje = new Date();
-      const umaSemanaAtras = new Date(hoje.setDate(hoje.getDate() - 7));
-      return new Date(exec.dataExecucao) >= umaSemanaAtras;
-    }).length
+    totalTreinos: progresso?.totalTreinos || 0,
+    tempoTotal: progresso?.tempoTotal || 0,
+    mediaTempoTreino: progresso?.mediaTempoTreino || 0,
+    ultimaSemana: progresso?.ultimaSemana || 0
   };
 
-  const ultimosTreinos = execucoes
-    .sort((a, b) => new Date(b.dataExecucao) - new Date(a.dataExecucao))
-    .slice(0, 10);
+  // A API já devolve só as 10 mais recentes
+  const ultimosTreinos = execucoes;
 
   return (
     <div className="min-h-screen bg-gray-50 dark:bg-gray-900 transition-colors duration-300">
@@ -3,10 +3,11 @@ import { useAuth } from '../../contexts/AuthContext';
 import { useNavigate } from 'react-router-dom';
 import Navbar from '../../components/Navbar';
 import {
-  listarAlunosPorPersonal,
-  listarTreinosPorPersonal,
-  listarAtribuicoesPorPersonal
+  buscarResumoPersonal,
+  assinarEventos,
+  resolverMidia
 } from '../../services/api';
+import { toast } from 'sonner';
 
 const PersonalDashboard = () => {
   const { user } = useAuth();
@@ -22,43 +23,60 @@ const PersonalDashboard = () => {
     carregarStats();
   }, [user]);
 
+  // Aplica os eventos do servidor ao resumo em vez de baixar tudo de novo
   useEffect(() => {
-    const handleDataChanged = () => {
-      carregarStats();
-    };
-
-    window.addEventListener('dataChanged', handleDataChanged);
-    window.addEventListener('storage', handleDataChanged);
+    if (!user) return;
 
-    return () => {
-      window.removeEventListener('dataChanged', handleDataChanged);
-      window.removeEventListener('storage', handleDataChanged);
+    const aoReceber = ({ tipo, dados }) => {
+      switch (tipo) {
+        case 'aluno.criado':
+          setStats((atual) => ({ ...atual, totalAlunos: atual.totalAlunos + 1 }));
+          setAlunos((atuais) => [dados, ...atuais].slice(0, 4));
+          break;
+        case 'usuario.atualizado':
+          setAlunos((atuais) => atuais.map((aluno) => (aluno.id === dados.id ? { ...aluno, ...dados } : aluno)));
+          break;
+        case 'usuario.removido':
+          if (dados.id === user.id) break;
+          setStats((atual) => ({ ...atual, totalAlunos: Math.max(atual.totalAlunos - 1, 0) }));
+          setAlunos((atuais) => atuais.filter((aluno) => aluno.id !== dados.id));
+          break;
+        case 'treino.criado':
+          setStats((atual) => ({ ...atual, totalTreinos: atual.totalTreinos + 1 }));
+          break;
+        case 'treino.removido':
+          setStats((atual) => ({ ...atual, totalTreinos: Math.max(atual.totalTreinos - 1, 0) }));
+          break;
+        case 'execucao.criada':
+          toast.success('Um aluno concluiu um treino');
+          break;
+        case 'atribuicao.criada':
+        case 'atribuicao.atualizada':
+        case 'ressincronizar':
+          // Alunos ativos dependem de todas as atribuições: o servidor recalcula
+          carregarStats();
+          break;
+        default:
+          break;
+      }
     };
+
+    return assinarEventos(aoReceber);
   }, [user]);
 
   const carregarStats = async () => {
     if (!user) return;
 
     try {
-      const [alunosData, treinosData, atribuicoesData] = await Promise.all([
-        listarAlunosPorPersonal(user.id),
-        listarTreinosPorPersonal(user.id),
-        listarAtribuicoesPorPersonal(user.id)
-      ]);
-
-      const alunosAtivosSet = new Set(
-        atribuicoesData
-          .filter(a => a.status === 'ativo')
-          .map(a => a.idAluno)
-      );
+      const resumo = await buscarResumoPersonal(user.id);
 
       setStats({
-        totalAlunos: alunosData.length,
-        totalTreinos: treinosData.length,
-        alunosAtivos: alunosAtivosSet.size
+        totalAlunos: resumo.totalAlunos,
+        totalTreinos: resumo.totalTreinos,
+        alunosAtivos: resumo.alunosAtivos
       });
 
-      setAlunos(alunosData.slice(0, 4));
+      setAlunos(resumo.alunosRecentes);
     } catch (error) {
       console.error('Erro ao carregar dados:', error);
     }
@@ -223,7 +241,7 @@ const PersonalDashboard = () => {
                     <div className="flex items-center space-x-3">
                       {aluno.avatar ? (
                         <img
-                          src={aluno.avatar}
+                          src={resolverMidia(aluno.avatar)}
                           alt={aluno.nome}
                           className="w-12 h-12 rounded-full object-cover"
                         />
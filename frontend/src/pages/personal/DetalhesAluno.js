@@ -9,7 +9,9 @@ import {
   listarAtribuicoesPorAluno,
   criarAtribuicao,
   buscarTreinoPorId,
-  listarExecucoesPorAluno
+  listarExecucoesPorAluno,
+  listarMedidas,
+  resolverMidia
 } from '../../services/api';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
 import { toast } from 'sonner';
@@ -22,6 +24,7 @@ const DetalhesAluno = () => {
   const [treinos, setTreinos] = useState([]);
   const [atribuicoes, setAtribuicoes] = useState([]);
   const [execucoes, setExecucoes] = useState([]);
+  const [medidas, setMedidas] = useState([]);
   const [mostrarAdicionarMedida, setMostrarAdicionarMedida] = useState(false);
   const [novoPeso, setNovoPeso] = useState('');
   const [novaAltura, setNovaAltura] = useState('');
@@ -41,13 +44,15 @@ const DetalhesAluno = () => {
       setAluno(alunoData);
       
       if (alunoData) {
-        const [treinosData, atribuicoesData, execucoesData] = await Promise.all([
+        const [treinosData, atribuicoesData, execucoesData, medidasData] = await Promise.all([
           listarTreinosPorPersonal(user.id),
           listarAtribuicoesPorAluno(id),
-          listarExecucoesPorAluno(id)
+          listarExecucoesPorAluno(id),
+          listarMedidas(id)
         ]);
         
         setTreinos(treinosData);
+        setMedidas(medidasData);
         setAtribuicoes(atribuicoesData);
         setExecucoes(execucoesData);
         
@@ -117,10 +122,10 @@ const DetalhesAluno = () => {
     return <div>Carregando...</div>;
   }
 
-  const dadosGrafico = aluno.historicoMedidas?.map(m => ({
+  const dadosGrafico = medidas.map(m => ({
     data: new Date(m.data).toLocaleDateString('pt-BR', { day: '2-digit', month: '2-digit' }),
     peso: m.peso
-  })) || [];
+  }));
 
   const calcularIMC = (peso, altura) => {
     if (!peso || !altura) return 0;
@@ -145,7 +150,7 @@ const DetalhesAluno = () => {
           <div className="card lg:col-span-1">
             <div className="text-center mb-6">
               {aluno.avatar ? (
-                <img src={aluno.avatar} alt={aluno.nome} className="w-32 h-32 rounded-full object-cover mx-auto mb-4 border-4 border-blue-200" />
+                <img src={resolverMidia(aluno.avatar)} alt={aluno.nome} className="w-32 h-32 rounded-full object-cover mx-auto mb-4 border-4 border-blue-200" />
               ) : (
                 <div className="w-32 h-32 rounded-full bg-blue-100 flex items-center justify-center mx-auto mb-4">
                   <span className="text-blue-600 font-bold text-4xl">{aluno.nome?.charAt(0).toUpperCase()}</span>
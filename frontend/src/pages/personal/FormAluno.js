@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useAuth } from '../../contexts/AuthContext';
 import Navbar from '../../components/Navbar';
-import { criarAlunoPeloPersonal, buscarUsuarioPorId, atualizarUsuario } from '../../services/api';
+import { criarAlunoPeloPersonal, buscarUsuarioPorId, atualizarUsuario, resolverMidia } from '../../services/api';
 import { fileToBase64 } from '../../utils/localStorage';
 import { toast } from 'sonner';
 
@@ -136,7 +136,7 @@ const FormAluno = () => {
               <div className="flex items-center space-x-6">
                 {avatar ? (
                   <div className="relative">
-                    <img src={avatar} alt="Avatar" className="w-24 h-24 rounded-full object-cover border-4 border-blue-200 shadow-md" />
+                    <img src={resolverMidia(avatar)} alt="Avatar" className="w-24 h-24 rounded-full object-cover border-4 border-blue-200 shadow-md" />
                     <button
                       type="button"
                       onClick={() => setAvatar(null)}
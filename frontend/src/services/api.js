@@ -24,6 +24,30 @@ apiClient.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+// 429/503 do controle de admissão: repete uma vez as leituras após o Retry-After
+apiClient.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const { config, response } = error;
+    const status = response?.status;
+    if (config && !config._repetida && config.method === 'get' && (status === 429 || status === 503)) {
+      config._repetida = true;
+      const segundos = Number(response.headers['retry-after']) || 1;
+      await new Promise((resolve) => setTimeout(resolve, segundos * 1000));
+      return apiClient(config);
+    }
+    return Promise.reject(error);
+  }
+);
+
+// Mídias são gravadas como referência relativa (/api/midias/<id>)
+export const resolverMidia = (url) => {
+  if (url && url.startsWith('/api/')) {
+    return `${API_URL}${url}`;
+  }
+  return url;
+};
+
 // ==================== AUTENTICAÇÃO ====================
 
 export const cadastrarPersonal = async (dados) => {
@@ -75,6 +99,17 @@ export const listarAlunosPorPersonal = async (idPersonal) => {
   return response.data;
 };
 
+// Busca paginada: params = { q, objetivo, ativo, after, limit }
+export const buscarAlunos = async (idPersonal, params = {}) => {
+  const response = await apiClient.get(`/personal/${idPersonal}/alunos/busca`, { params });
+  return { itens: response.data, proximo: response.headers['x-next-cursor'] || null };
+};
+
+export const buscarResumoPersonal = async (idPersonal) => {
+  const response = await apiClient.get(`/personal/${idPersonal}/resumo`);
+  return response.data;
+};
+
 export const criarAlunoPeloPersonal = async (dados) => {
   const response = await apiClient.post('/alunos', dados);
   return response.data;
@@ -85,6 +120,7 @@ export const atualizarUsuario = async (id, dados) => {
   return response.data;
 };
 
+// A resposta traz o idTarefa da remoção do histórico, que segue em segundo plano
 export const deletarUsuario = async (id) => {
   const response = await apiClient.delete(`/usuarios/${id}`);
   return response.data;
@@ -95,6 +131,12 @@ export const adicionarMedida = async (id, dados) => {
   return response.data;
 };
 
+// params: { de, ate, limit } (datas ISO); medidas em ordem cronológica
+export const listarMedidas = async (id, params = {}) => {
+  const response = await apiClient.get(`/usuarios/${id}/medidas`, { params });
+  return response.data;
+};
+
 // ==================== TREINOS ====================
 
 export const criarTreino = async (dados) => {
@@ -122,6 +164,30 @@ export const deletarTreino = async (id) => {
   return response.data;
 };
 
+// ==================== CATÁLOGO DE EXERCÍCIOS ====================
+
+// params: { q, after, limit }
+export const listarCatalogoExercicios = async (idPersonal, params = {}) => {
+  const response = await apiClient.get(`/personal/${idPersonal}/exercicios`, { params });
+  return { itens: response.data, proximo: response.headers['x-next-cursor'] || null };
+};
+
+export const criarExercicioCatalogo = async (dados) => {
+  const response = await apiClient.post('/exercicios', dados);
+  return response.data;
+};
+
+// A edição vale para todos os treinos que usam o exercício
+export const atualizarExercicioCatalogo = async (id, dados) => {
+  const response = await apiClient.put(`/exercicios/${id}`, dados);
+  return response.data;
+};
+
+export const deletarExercicioCatalogo = async (id) => {
+  const response = await apiClient.delete(`/exercicios/${id}`);
+  return response.data;
+};
+
 // ==================== ATRIBUIÇÕES ====================
 
 export const criarAtribuicao = async (dados) => {
@@ -129,11 +195,23 @@ export const criarAtribuicao = async (dados) => {
   return response.data;
 };
 
+export const criarAtribuicoesEmLote = async (itens) => {
+  const response = await apiClient.post('/atribuicoes/lote', { itens });
+  return response.data;
+};
+
 export const listarAtribuicoesPorAluno = async (idAluno) => {
   const response = await apiClient.get(`/alunos/${idAluno}/atribuicoes`);
   return response.data;
 };
 
+export const listarAgendaAluno = async (idAluno, dia) => {
+  const response = await apiClient.get(`/alunos/${idAluno}/agenda`, {
+    params: dia ? { dia } : {}
+  });
+  return response.data;
+};
+
 export const listarAtribuicoesPorPersonal = async (idPersonal) => {
   const response = await apiClient.get(`/personal/${idPersonal}/atribuicoes`);
   return response.data;
@@ -151,8 +229,109 @@ export const criarExecucao = async (dados) => {
   return response.data;
 };
 
-export const listarExecucoesPorAluno = async (idAluno) => {
-  const response = await apiClient.get(`/alunos/${idAluno}/execucoes`);
+export const criarExecucoesEmLote = async (itens) => {
+  const response = await apiClient.post('/execucoes/lote', { itens });
+  return response.data;
+};
+
+// params: { after, limit }; da execução mais recente para a mais antiga
+export const listarExecucoesPorAluno = async (idAluno, params = {}) => {
+  const response = await apiClient.get(`/alunos/${idAluno}/execucoes`, { params });
+  return response.data;
+};
+
+export const buscarProgressoAluno = async (idAluno, params = {}) => {
+  const response = await apiClient.get(`/alunos/${idAluno}/progresso`, { params });
+  return response.data;
+};
+
+export const buscarEstatisticasAluno = async (idAluno) => {
+  const response = await apiClient.get(`/alunos/${idAluno}/estatisticas`);
+  return response.data;
+};
+
+export const buscarEstatisticasPersonal = async (idPersonal) => {
+  const response = await apiClient.get(`/personal/${idPersonal}/estatisticas`);
+  return response.data;
+};
+
+// ==================== EVENTOS ====================
+
+// Assina /api/eventos (Server-Sent Events). Usa fetch em vez de EventSource
+// para poder enviar o header Authorization. Reconecta sozinho; ao reconectar
+// entrega um evento 'ressincronizar', pois eventos podem ter se perdido.
+// Retorna uma função que encerra a assinatura.
+export const assinarEventos = (aoReceber) => {
+  let controller = null;
+  let encerrado = false;
+  let espera = 1000;
+
+  const conectar = async (reconexao) => {
+    controller = new AbortController();
+    try {
+      const response = await fetch(`${API}/eventos`, {
+        headers: { Authorization: `Bearer ${getToken()}` },
+        signal: controller.signal,
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      if (reconexao) aoReceber({ tipo: 'ressincronizar', dados: {} });
+      espera = 1000;
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const blocos = buffer.split('\n\n');
+        buffer = blocos.pop();
+        for (const bloco of blocos) {
+          const dados = bloco
+            .split('\n')
+            .filter((linha) => linha.startsWith('data: '))
+            .map((linha) => linha.slice(6))
+            .join('\n');
+          if (dados) aoReceber(JSON.parse(dados));
+        }
+      }
+    } catch (error) {
+      if (encerrado) return;
+      console.error('Conexão de eventos interrompida:', error);
+    }
+    if (!encerrado) {
+      setTimeout(() => conectar(true), espera);
+      espera = Math.min(espera * 2, 30000);
+    }
+  };
+
+  conectar(false);
+  return () => {
+    encerrado = true;
+    controller?.abort();
+  };
+};
+
+// `since` é o token da sincronização anterior; sem ele vem tudo
+export const sincronizar = async (since) => {
+  const response = await apiClient.get('/sync', { params: since ? { since } : {} });
+  return response.data;
+};
+
+export const buscarProgressaoExercicio = async (idAluno, idExercicio, params = {}) => {
+  const response = await apiClient.get(`/alunos/${idAluno}/exercicios/${idExercicio}/progressao`, { params });
+  return response.data;
+};
+
+// Baixa o histórico de execuções dos alunos como arquivo (params: { formato, de, ate })
+export const exportarExecucoes = async (idPersonal, params = {}) => {
+  const response = await apiClient.get(`/personal/${idPersonal}/exportar`, { params, responseType: 'blob' });
+  return response.data;
+};
+
+// Status de uma tarefa em segundo plano: { status, progresso, resultado, erro }
+export const buscarTarefa = async (id) => {
+  const response = await apiClient.get(`/tarefas/${id}`);
   return response.data;
 };
 
@@ -161,4 +340,15 @@ export const listarExecucoesPorAtribuicao = async (idAtribuicao) => {
   return response.data;
 };
 
+// ==================== MÍDIAS ====================
+
+export const uploadMidia = async (arquivo) => {
+  const formData = new FormData();
+  formData.append('arquivo', arquivo);
+  const response = await apiClient.post('/midias', formData, {
+    headers: { 'Content-Type': 'multipart/form-data' }
+  });
+  return response.data;
+};
+
 export default apiClient;